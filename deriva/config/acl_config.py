@@ -1,11 +1,9 @@
 import sys
 import json
 import re
-from deriva.core import ErmrestCatalog, AttrDict, ermrest_config, get_credential, __version__ as VERSION, \
-    format_exception, urlquote
+from deriva.core import AttrDict, ermrest_config, get_credential, __version__ as VERSION, format_exception, urlquote
 from deriva.core.ermrest_config import CatalogColumn, CatalogForeignKey
 from deriva.config.base_config import BaseSpec, BaseSpecList, ConfigUtil, ConfigBaseCLI
-from requests.exceptions import HTTPError
 from uuid import UUID
 
 
@@ -59,6 +57,8 @@ class AclConfig:
         self.server = server
         self.catalog_id = catalog_id
 
+        # imported here so that the command-line help does not wait for the HTTP stack to load
+        from deriva.core import ErmrestCatalog
         old_catalog = ErmrestCatalog('https', self.server, self.catalog_id, credentials)
         self.saved_toplevel_config = ConfigUtil.find_toplevel_node(old_catalog.getCatalogConfig(), schema_name,
                                                                    table_name)
@@ -436,6 +436,7 @@ class Table(AttrDict):
         return self.base_entity_url
 
     def upsertRows(self, catalog, rows):
+        from requests.exceptions import HTTPError
         try:
             self.insertRows(catalog, rows)
         except HTTPError as err:
@@ -492,6 +493,7 @@ class Table(AttrDict):
         return default_cols
 
     def upsertRow(self, catalog, row):
+        from requests.exceptions import HTTPError
         try:
             return self.insertRows(catalog, [row])
         except HTTPError as err:
@@ -527,6 +529,7 @@ class AclCLI(ConfigBaseCLI):
 def main():
     cli = AclCLI()
     args = cli.parse_cli()
+    from requests.exceptions import HTTPError
     table_name = cli.get_table_arg(args)
     schema_names = cli.get_schema_arg_list(args)
     credentials = get_credential(args.host, args.credential_file)
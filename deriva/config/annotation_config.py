@@ -1,7 +1,7 @@
 import sys
 import json
 import re
-from deriva.core import ErmrestCatalog, AttrDict, ermrest_config, get_credential
+from deriva.core import AttrDict, ermrest_config, get_credential
 from deriva.config.base_config import BaseSpec, BaseSpecList, ConfigUtil, ConfigBaseCLI
 
 if sys.version_info > (3,):
@@ -81,6 +81,8 @@ class AttrConfig:
         self.server = server
         self.catalog_id = catalog_id
         self.verbose = verbose
+        # imported here so that the command-line help does not wait for the HTTP stack to load
+        from deriva.core import ErmrestCatalog
         old_catalog = ErmrestCatalog('https', self.server, self.catalog_id, credentials)
         self.saved_toplevel_config = ConfigUtil.find_toplevel_node(old_catalog.getCatalogConfig(), schema_name,
                                                                    table_name)
@@ -1,7 +1,7 @@
 import sys
 import json
 import re
-from deriva.core import ErmrestCatalog, AttrDict, get_credential
+from deriva.core import AttrDict, get_credential
 from deriva.config.base_config import BaseSpec, BaseSpecList, ConfigUtil, ConfigBaseCLI
 from deriva.config.annotation_config import AttrSpec, AttrSpecList
 
@@ -43,6 +43,8 @@ class Annotations:
         for k in self.managed_attributes:
             if k in self.annotations_to_delete:
                 raise ValueError("{k} is both 'managed' and 'to_delete'".format(k=k))
+        # imported here so that the command-line help does not wait for the HTTP stack to load
+        from deriva.core import ErmrestCatalog
         self.catalog = ErmrestCatalog('https', server, catalog, credentials)
         self.catalog_config = self.catalog.getCatalogConfig()
         if self.catalog_config.annotations is not None:
@@ -6,10 +6,8 @@ import errno
 import json
 import platform
 import logging
-import requests
+import importlib
 from collections import OrderedDict
-from distutils.util import strtobool
-from pkg_resources import parse_version, get_distribution, DistributionNotFound
 
 __version__ = "0.5.1"
 
@@ -44,6 +42,10 @@ DEFAULT_CHUNK_SIZE = 2400 ** 2  # == 5760000 which is above the minimum 5MB chun
 Kilobyte = 1024
 Megabyte = 1024 ** 2
 
+DEFAULT_CACHE_SIZE = 64 * Megabyte  # byte budget of the default in-memory GET response cache
+
+DEFAULT_MAX_WORKERS = 8  # default number of concurrent requests in batch operations
+
 
 class NotModified (ValueError):
     pass
@@ -54,10 +56,16 @@ class ConcurrentUpdate (ValueError):
 
 
 def stob(string):
-    return bool(strtobool(str(string)))
+    value = str(string).lower()
+    if value in ('y', 'yes', 't', 'true', 'on', '1'):
+        return True
+    elif value in ('n', 'no', 'f', 'false', 'off', '0'):
+        return False
+    raise ValueError("invalid truth value %r" % (string,))
 
 
 def format_exception(e):
+    import requests
     exc = "".join(("[", type(e).__name__, "] "))
     if isinstance(e, requests.HTTPError):
         resp = " - Server responded: %s" % e.response.text.strip().replace('\n', ': ')
@@ -116,11 +124,20 @@ def init_logging(level=logging.INFO,
 DEFAULT_CONFIG_PATH = os.path.join(os.path.expanduser('~'), '.deriva')
 DEFAULT_CREDENTIAL_FILE = os.path.join(DEFAULT_CONFIG_PATH, 'credential.json')
 DEFAULT_CONFIG_FILE = os.path.join(DEFAULT_CONFIG_PATH, 'config.json')
+DEFAULT_CACHE_FILE = os.path.join(DEFAULT_CONFIG_PATH, 'response_cache.sqlite')
 DEFAULT_SESSION_CONFIG = {
     "retry_connect": 5,
     "retry_read": 5,
     "retry_backoff_factor": 1.0,
-    "retry_status_forcelist": [500, 502, 503, 504]
+    "retry_status_forcelist": [500, 502, 503, 504],
+    "pool_connections": 10,
+    "pool_maxsize": 10,
+    "pool_block": False,
+    "adaptive_concurrency": False,
+    "hedging": False,
+    "schema_revalidate_interval": 60,
+    "result_cache_size": 0,
+    "snaptime_revalidate_interval": 5
 }
 DEFAULT_CONFIG = {
     "server":
@@ -179,22 +196,23 @@ def read_config(config_file=DEFAULT_CONFIG_FILE, create_default=False, default=D
     return json.loads(config, object_pairs_hook=OrderedDict)
 
 
-PORTALOCKER = None
-try:
-    PORTALOCKER = get_distribution("portalocker")
-    from portalocker import Lock, LOCK_EX, LOCK_SH
-except DistributionNotFound:
-    pass
+def _takes_truncate(lock_class):
+    """Returns whether a portalocker Lock class takes the truncate argument, as releases up to 0.6.1 do."""
+    import inspect
+    # getargspec was removed in Python 3.11
+    getargspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
+    return 'truncate' in getargspec(lock_class.__init__).args
 
 
 def lock_file(file, mode, exclusive=True):
-    if PORTALOCKER:
-        if parse_version(PORTALOCKER.version) > parse_version("0.6.1"):
-            return Lock(file, mode, timeout=60, flags=LOCK_EX if exclusive else LOCK_SH)
-        else:
-            return Lock(file, mode, timeout=60, flags=LOCK_EX if exclusive else LOCK_SH, truncate=None)
-    else:
+    try:
+        from portalocker import Lock, LOCK_EX, LOCK_SH
+    except ImportError:
         return io.open(file, mode)
+    if not _takes_truncate(Lock):
+        return Lock(file, mode, timeout=60, flags=LOCK_EX if exclusive else LOCK_SH)
+    else:
+        return Lock(file, mode, timeout=60, flags=LOCK_EX if exclusive else LOCK_SH, truncate=None)
 
 
 def write_credential(credential_file=DEFAULT_CREDENTIAL_FILE, credential=DEFAULT_CREDENTIAL):
@@ -268,11 +286,57 @@ def get_transfer_summary(total_bytes, elapsed_time):
     return summary
 
 
-from deriva.core.base_cli import BaseCLI, KeyValuePairArgs
-from deriva.core.deriva_binding import DerivaBinding, DerivaPathError
-from deriva.core.deriva_server import DerivaServer
-from deriva.core.ermrest_catalog import ErmrestCatalog, ErmrestSnapshot, ErmrestCatalogMutationError
-from deriva.core.ermrest_config import AttrDict, CatalogConfig
-from deriva.core.polling_ermrest_catalog import PollingErmrestCatalog
-from deriva.core.hatrac_store import HatracStore, HatracHashMismatch, HatracJobPaused, HatracJobAborted, \
-    HatracJobTimeout
+# Public classes are imported from their modules on first use, so that importing deriva.core, e.g. by a command-line
+# tool, does not load the HTTP, model and message queue stacks until they are needed.
+_lazy_attributes = {
+    'BaseCLI': 'base_cli',
+    'KeyValuePairArgs': 'base_cli',
+    'ConcurrencyGovernor': 'concurrency_governor',
+    'HedgingPolicy': 'request_hedging',
+    'JSONCodec': 'json_codec',
+    'get_json_codec': 'json_codec',
+    'set_json_codec': 'json_codec',
+    'ResponseCache': 'response_cache',
+    'MemoryResponseCache': 'response_cache',
+    'SqliteResponseCache': 'response_cache',
+    'DerivaBinding': 'deriva_binding',
+    'DerivaPathError': 'deriva_binding',
+    'DerivaServer': 'deriva_server',
+    'ErmrestCatalog': 'ermrest_catalog',
+    'ErmrestSnapshot': 'ermrest_catalog',
+    'ErmrestCatalogMutationError': 'ermrest_catalog',
+    'AttrDict': 'ermrest_config',
+    'CatalogConfig': 'ermrest_config',
+    'PollingErmrestCatalog': 'polling_ermrest_catalog',
+    'HatracStore': 'hatrac_store',
+    'HatracHashMismatch': 'hatrac_store',
+    'HatracJobPaused': 'hatrac_store',
+    'HatracJobAborted': 'hatrac_store',
+    'HatracJobTimeout': 'hatrac_store',
+}
+
+_lazy_submodules = frozenset([
+    'async_bindings', 'base_cli', 'concurrency_governor', 'datapath', 'deriva_binding', 'deriva_server',
+    'ermrest_catalog', 'ermrest_config', 'ermrest_model', 'hatrac_cli', 'hatrac_store', 'json_codec',
+    'polling_ermrest_catalog', 'request_hedging', 'request_metrics', 'response_cache', 'utils'
+])
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        value = getattr(importlib.import_module('%s.%s' % (__name__, _lazy_attributes[name])), name)
+        globals()[name] = value
+        return value
+    if name in _lazy_submodules:
+        return importlib.import_module('%s.%s' % (__name__, name))
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is unavailable, so import eagerly
+    for _name in _lazy_attributes:
+        __getattr__(_name)
@@ -0,0 +1,753 @@
+"""Asynchronous (asyncio) counterparts of the DerivaBinding, ErmrestCatalog and HatracStore classes.
+
+This module requires Python 3 and the optional 'aiohttp' package. The bindings mirror the method surface of their
+synchronous counterparts, except that the network methods are coroutines. Responses are returned as fully
+retrieved requests.Response objects, so callers may use the familiar status, headers, json() and raise_for_status()
+interfaces, and the same ETag caching as well as 304 (NotModified) and 412 (ConcurrentUpdate) semantics apply.
+
+Many requests may be in flight on a single event loop; the number of concurrent requests per binding is bounded by
+its max_concurrency setting.
+
+    async def main():
+        async with AsyncErmrestCatalog('https', 'example.org', 1) as catalog:
+            responses = await asyncio.gather(*[catalog.get(path) for path in paths])
+"""
+import os
+import time
+import asyncio
+import logging
+import datetime
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from . import DEFAULT_HEADERS, DEFAULT_SESSION_CONFIG, DEFAULT_CHUNK_SIZE, NotModified, Megabyte, \
+    format_exception, get_transfer_summary, urlsplit
+from .deriva_binding import DerivaBinding, _response_raise_for_status, _get_governor
+from .concurrency_governor import parse_retry_after
+from .ermrest_catalog import ErmrestCatalog, ErmrestCatalogMutationError
+from .request_metrics import RequestMetrics
+from .hatrac_store import HatracHashMismatch, HatracJobAborted, HatracJobPaused, HatracJobTimeout
+from .utils import hash_utils as hu, mime_utils as mu
+
+DEFAULT_ASYNC_CONCURRENCY = 100
+
+
+async def _acquire_governor(governor):
+    """Wait until the governor lets another request be sent, without blocking the event loop.
+
+       The governor may be shared with threads and other event loops, so
+       its releases wake this coroutine through a thread-safe callback.
+       While a Retry-After hold is in effect, the wait also ends when the
+       hold expires, as no release may follow it.
+    """
+    loop = asyncio.get_event_loop()
+
+    def wake(future):
+        if not future.done():
+            future.set_result(None)
+
+    while True:
+        released = loop.create_future()
+
+        def listener(future=released):
+            try:
+                loop.call_soon_threadsafe(wake, future)
+            except RuntimeError:
+                pass  # the event loop was closed while waiting
+
+        if governor.try_acquire(listener):
+            return
+        hold = governor.hold_time()
+        try:
+            await asyncio.wait_for(released, hold or None)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _build_response(resp, content):
+    """Returns a requests.Response object holding the status, headers and content of an aiohttp response."""
+    r = requests.Response()
+    r.url = str(resp.url)
+    r.status_code = resp.status
+    r.reason = resp.reason
+    r.headers = CaseInsensitiveDict(resp.headers)
+    r.encoding = get_encoding_from_headers(r.headers)
+    r._content = content
+    r._content_consumed = True
+    return r
+
+
+class AsyncDerivaBinding (object):
+    """This is a base-class for implementation purposes. Not useful for clients."""
+
+    def __init__(self, scheme, server, credentials=None, caching=True, session_config=None,
+                 max_concurrency=DEFAULT_ASYNC_CONCURRENCY):
+        """Create asynchronous HTTP(S) server binding.
+
+           Arguments:
+             scheme: 'http' or 'https'
+             server: server FQDN string
+             credentials: credential secrets, e.g. cookie
+             caching: whether to retain a GET response cache, or
+               a ResponseCache instance to use as the cache
+             session_config: retry settings as for DerivaBinding
+             max_concurrency: maximum number of requests in flight
+
+           The underlying HTTP session is opened on first use from
+           within the running event loop and should be released with
+           close() or by using the binding as an async context manager.
+
+        """
+        if aiohttp is None:
+            raise ImportError("The 'aiohttp' package is required for asynchronous bindings.")
+
+        self._base_server_uri = "%s://%s" % (
+            scheme,
+            server
+        )
+        self._server_uri = self._base_server_uri
+
+        self._session_config = session_config if session_config else DEFAULT_SESSION_CONFIG
+        self._compress_threshold = self._session_config.get('compress_request_threshold')
+        self._governor = _get_governor(self._base_server_uri, self._session_config)
+        self._hedging = None  # hedging is not supported by the asynchronous bindings
+        self._max_concurrency = max_concurrency
+        self._session = None
+        self._semaphore = None
+        self._cookies = {}
+        self._login_credentials = None
+
+        self._credentials_state = (0, None)
+        self._in_flight = dict()
+        self.set_credentials(credentials, server)
+
+        self._caching = caching
+        self._cache = DerivaBinding._make_cache(caching)
+        self._metrics = RequestMetrics()
+        if self._governor is not None:
+            self._metrics.add_governor(self._governor)
+
+        self._response_raise_for_status = _response_raise_for_status
+
+    # share the protocol logic of the synchronous binding
+    get_server_uri = DerivaBinding.get_server_uri
+    metrics = DerivaBinding.metrics
+    governor = DerivaBinding.governor
+    stats = DerivaBinding.stats
+    get_cached_response = DerivaBinding.get_cached_response
+    _cache_key = DerivaBinding._cache_key
+    _pre_get = DerivaBinding._pre_get
+    _pre_mutate = DerivaBinding._pre_mutate
+    _encode_body = DerivaBinding._encode_body
+    _compressed_content_types = DerivaBinding._compressed_content_types
+    check_path = DerivaBinding.__dict__['check_path']
+    _credential_identity = DerivaBinding.__dict__['_credential_identity']
+    _raise_for_status_304 = DerivaBinding.__dict__['_raise_for_status_304']
+    _raise_for_status_412 = DerivaBinding.__dict__['_raise_for_status_412']
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying HTTP session and its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get_session(self):
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._session = aiohttp.ClientSession(
+                cookies=self._cookies,
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                connector=aiohttp.TCPConnector(limit=self._max_concurrency)
+            )
+            if self._login_credentials:
+                await self.post_authn_session(self._login_credentials)
+        return self._session
+
+    def set_credentials(self, credentials, server):
+        """Set credentials to use for subsequent requests.
+
+           A username and password login is deferred until the
+           session is opened.
+        """
+        generation, identity = self._credentials_state
+        if credentials and ('cookie' in credentials):
+            cname, cval = credentials['cookie'].split('=', 1)
+            self._cookies[cname] = cval
+            if self._session is not None:
+                self._session.cookie_jar.update_cookies({cname: cval})
+            identity = self._credential_identity(server, credentials['cookie'])
+        elif credentials and ('username' in credentials and 'password' in credentials):
+            self._login_credentials = credentials
+            identity = self._credential_identity(server, credentials['username'])
+        self._credentials_state = (generation + 1, identity)
+
+    async def _request(self, method, url, headers=None, data=None, json=None, reader=None):
+        """Perform a request with retries, returning a requests.Response object.
+
+           If given, the reader coroutine is called with the aiohttp
+           response and returns the content to retain in the result,
+           e.g. after streaming the body elsewhere. Retries on
+           connection errors and on the configured retry status codes
+           follow the session_config retry settings.
+        """
+        session = await self._get_session()
+        retry_connect = self._session_config.get('retry_connect', 0)
+        retry_status = self._session_config.get('retry_read', 0)
+        backoff_factor = self._session_config.get('retry_backoff_factor', 0)
+        status_forcelist = self._session_config.get('retry_status_forcelist', [])
+        position = data.tell() if hasattr(data, 'seek') else None
+        connect_errors = status_errors = 0
+        path = urlsplit(url).path
+        start = time.time()
+
+        async with self._semaphore:
+            while True:
+                if position is not None:
+                    data.seek(position)
+                governor = self._governor
+                if governor is not None:
+                    await _acquire_governor(governor)
+                attempt_start = time.time()
+                status = retry_after = None
+                try:
+                    async with session.request(method, url, headers=headers, data=data, json=json) as resp:
+                        status = resp.status
+                        retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+                        if resp.status in status_forcelist and status_errors < retry_status:
+                            status_errors += 1
+                        else:
+                            content = await (reader(resp) if reader else resp.read())
+                            r = _build_response(resp, content)
+                            self._metrics.record(method, path, time.time() - start, r, stream=reader is not None,
+                                                 retries=connect_errors + status_errors)
+                            return r
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    if connect_errors >= retry_connect:
+                        self._metrics.record(method, path, time.time() - start, error=True,
+                                             retries=connect_errors + status_errors)
+                        raise
+                    connect_errors += 1
+                    logging.debug("Retrying %s %s after error: %s" % (method, url, format_exception(e)))
+                finally:
+                    if governor is not None:
+                        governor.release(time.time() - attempt_start, status, error=status is None,
+                                         retry_after=retry_after)
+                attempt = connect_errors + status_errors
+                await asyncio.sleep(backoff_factor * (2 ** (attempt - 1)) if attempt > 1 else 0)
+
+    async def get_authn_session(self):
+        r = await self._request('GET', self._base_server_uri + "/authn/session")
+        _response_raise_for_status(r)
+        return r
+
+    async def post_authn_session(self, credentials):
+        r = await self._request('POST', self._base_server_uri + "/authn/session", data=credentials)
+        _response_raise_for_status(r)
+        return r
+
+    async def head(self, path, headers=DEFAULT_HEADERS, raise_not_modified=False):
+        """Perform HEAD request, returning response object.
+
+           Same semantics as DerivaBinding.head().
+        """
+        url, headers, prev_response = self._pre_get(path, headers)
+        return self._raise_for_status_304(
+            await self._request('HEAD', url, headers=headers),
+            prev_response,
+            raise_not_modified
+        )
+
+    async def get(self, path, headers=DEFAULT_HEADERS, raise_not_modified=False):
+        """Perform GET request, returning response object.
+
+           Same semantics as DerivaBinding.get().
+        """
+        if headers is None:
+            headers = {}
+        credentials_state = self._credentials_state
+        url, headers, prev_response = self._pre_get(path, headers, credentials_state)
+        cache_key = self._cache_key(url, credentials_state)
+
+        async def fetch():
+            r = self._raise_for_status_304(
+                await self._request('GET', url, headers=headers),
+                prev_response,
+                raise_not_modified
+            )
+            # unless the credentials changed while the request was in flight
+            if self._cache is not None and self._credentials_state == credentials_state:
+                self._cache.put(cache_key, r)
+            return r
+
+        key = (credentials_state, url, tuple(sorted(headers.items())), bool(raise_not_modified))
+        return await self._single_flight(key, fetch)
+
+    async def _single_flight(self, key, fn):
+        """Await coroutine fn(), sharing its result or error with concurrent callers using the same key."""
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            # shield the shared future from the cancellation of any one waiter
+            return await asyncio.shield(flight)
+        flight = self._in_flight[key] = asyncio.get_event_loop().create_future()
+        try:
+            result = await fn()
+            flight.set_result(result)
+            return result
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()  # mark as retrieved in case there are no waiters
+            raise
+        finally:
+            del self._in_flight[key]
+            if not flight.done():
+                flight.cancel()
+
+    async def post(self, path, data=None, json=None, headers=DEFAULT_HEADERS):
+        """Perform POST request, returning response object.
+
+           Same semantics as DerivaBinding.post().
+        """
+        url, headers = self._pre_mutate(path, headers)
+        data, json, headers = self._encode_body(data, json, headers)
+        r = await self._request('POST', url, headers=headers, data=data, json=json)
+        return self._raise_for_status_412(r)
+
+    async def put(self, path, data=None, json=None, headers=DEFAULT_HEADERS, guard_response=None):
+        """Perform PUT request, returning response object.
+
+           Same semantics as DerivaBinding.put().
+        """
+        url, headers = self._pre_mutate(path, headers, guard_response)
+        data, json, headers = self._encode_body(data, json, headers)
+        r = await self._request('PUT', url, headers=headers, data=data, json=json)
+        return self._raise_for_status_412(r)
+
+    async def delete(self, path, headers=DEFAULT_HEADERS, guard_response=None):
+        """Perform DELETE request, returning response object.
+
+           Same semantics as DerivaBinding.delete().
+        """
+        url, headers = self._pre_mutate(path, headers, guard_response)
+        r = await self._request('DELETE', url, headers=headers)
+        return self._raise_for_status_412(r)
+
+    async def _get_as_file(self, url, headers, destfilename, chunk_size, stage, callback=None):
+        """Stream the content of url into destfilename, returning the response or None if cancelled by callback."""
+        cancelled = []
+
+        async def reader(resp):
+            if resp.status >= 400:
+                return await resp.read()
+            total = 0
+            start = datetime.datetime.now()
+            logging.debug("Transferring file %s to %s" % (url, destfilename))
+            with open(destfilename, 'w+b') as destfile:
+                async for buf in resp.content.iter_chunked(chunk_size):
+                    destfile.write(buf)
+                    total += len(buf)
+                    if callback:
+                        if not callback(progress="Downloading: %.2f MB transferred" % (float(total) / float(Megabyte))):
+                            cancelled.append(True)
+                            return b''
+            elapsed = datetime.datetime.now() - start
+            self._metrics.record_transfer(stage, total, elapsed.total_seconds())
+            summary = get_transfer_summary(total, elapsed)
+            logging.info("File [%s] transfer successful. %s" % (destfilename, summary))
+            if callback:
+                callback(summary=summary, file_path=destfilename)
+            return b''
+
+        r = await self._request('GET', url, headers=headers, reader=reader)
+        self._response_raise_for_status(r)
+        return None if cancelled else r
+
+
+class AsyncErmrestCatalog (AsyncDerivaBinding):
+    """Asynchronous handle for an ERMrest catalog.
+
+       Provides basic REST client for HTTP methods on arbitrary
+       paths, like ErmrestCatalog, using asyncio coroutines.
+    """
+    _compressed_content_types = ErmrestCatalog._compressed_content_types
+
+    def __init__(self, scheme, server, catalog_id, credentials=None, caching=True, session_config=None,
+                 max_concurrency=DEFAULT_ASYNC_CONCURRENCY):
+        """Create asynchronous ERMrest catalog binding.
+
+           Arguments:
+             scheme: 'http' or 'https'
+             server: server FQDN string
+             catalog_id: e.g. '1'
+             credentials: credential secrets, e.g. cookie
+             caching: whether to retain a GET response cache
+             session_config: retry settings as for DerivaBinding
+             max_concurrency: maximum number of requests in flight
+
+        """
+        super(AsyncErmrestCatalog, self).__init__(scheme, server, credentials, caching, session_config,
+                                                  max_concurrency)
+        self._server_uri = "%s/ermrest/catalog/%s" % (
+            self._server_uri,
+            catalog_id
+        )
+        self._scheme, self._server, self._catalog_id, self._credentials = scheme, server, catalog_id, credentials
+
+    async def latest_snapshot(self):
+        """Gets a handle to this catalog's latest snapshot.
+        """
+        r = await self.get('/')
+        r.raise_for_status()
+        return AsyncErmrestSnapshot(self._scheme, self._server, self._catalog_id, r.json()['snaptime'],
+                                    self._credentials, self._caching, self._session_config, self._max_concurrency)
+
+    async def getCatalogSchema(self):
+        r = await self.get('/schema')
+        r.raise_for_status()
+        return r.json()
+
+    async def getAsFile(self, path, destfilename, headers=DEFAULT_HEADERS, callback=None):
+        """
+           Retrieve catalog data streamed to destination file.
+           Caller is responsible to clean up file even on error, when the file may or may not be exist.
+
+        """
+        self.check_path(path)
+        return await self._get_as_file(self._server_uri + path, headers.copy(), destfilename,
+                                       DEFAULT_CHUNK_SIZE, 'ermrest_download', callback)
+
+
+class AsyncErmrestSnapshot (AsyncErmrestCatalog):
+    """Asynchronous handle for an ERMrest catalog snapshot.
+    """
+    def __init__(self, scheme, server, catalog_id, snaptime, credentials=None, caching=True, session_config=None,
+                 max_concurrency=DEFAULT_ASYNC_CONCURRENCY):
+        """Create asynchronous ERMrest catalog snapshot binding.
+
+           Arguments:
+             scheme: 'http' or 'https'
+             server: server FQDN string
+             catalog_id: e.g., '1'
+             snaptime: e.g., '2PM-DGYP-56Z4'
+             credentials: credential secrets, e.g. cookie
+             caching: whether to retain a GET response cache
+             session_config: retry settings as for DerivaBinding
+             max_concurrency: maximum number of requests in flight
+        """
+        super(AsyncErmrestSnapshot, self).__init__(scheme, server, catalog_id, credentials, caching, session_config,
+                                                   max_concurrency)
+        self._server_uri = "%s@%s" % (
+            self._server_uri,
+            snaptime
+        )
+        self._snaptime = snaptime
+
+    @property
+    def snaptime(self):
+        """The snaptime for this catalog snapshot instance."""
+        return self._snaptime
+
+    def _pre_mutate(self, path, headers, guard_response=None):
+        """Override and disable mutation operations.
+        """
+        raise ErmrestCatalogMutationError('Catalog snapshot is immutable')
+
+
+class AsyncHatracStore (AsyncDerivaBinding):
+    """Asynchronous Hatrac object store binding."""
+
+    def __init__(self, scheme, server, credentials=None, session_config=None,
+                 max_concurrency=DEFAULT_ASYNC_CONCURRENCY):
+        """Create asynchronous Hatrac server binding.
+
+           Arguments:
+             scheme: 'http' or 'https'
+             server: server FQDN string
+             credentials: credential secrets, e.g. cookie
+             session_config: retry settings as for DerivaBinding
+             max_concurrency: maximum number of requests in flight
+
+        """
+        super(AsyncHatracStore, self).__init__(scheme, server, credentials, caching=False,
+                                               session_config=session_config, max_concurrency=max_concurrency)
+
+    async def content_equals(self, path, filename=None, md5=None, sha256=None):
+        """
+        Check if a remote object's content is equal to the content of the at least one of the specified input file,
+        input md5, or input sha256 by comparing MD5 hashes. See HatracStore.content_equals().
+        """
+        self.check_path(path)
+
+        assert filename or md5 or sha256
+        if filename:
+            hashes = hu.compute_file_hashes(filename, hashes=['md5', 'sha256'])
+            md5 = hashes['md5'][1]
+            sha256 = hashes['sha256'][1]
+
+        r = await self.head(path)
+        r.raise_for_status()
+        return r.status_code == 200 and \
+            bool(md5 and r.headers.get('Content-MD5') == md5 or sha256 and r.headers.get('Content-SHA256') == sha256)
+
+    async def get_obj(self, path, headers=DEFAULT_HEADERS, destfilename=None, callback=None):
+        """Retrieve resource optionally streamed to destination file.
+
+           Same semantics as HatracStore.get_obj(), including hash
+           verification of downloaded files.
+        """
+        self.check_path(path)
+
+        headers = headers.copy()
+        if not any(k.lower() == 'accept-encoding' for k in headers):
+            # retrieve the stored object bytes so that they match the object checksums
+            headers['Accept-Encoding'] = 'identity'
+        url = self._server_uri + path
+
+        if destfilename is None:
+            r = await self._request('GET', url, headers=headers)
+            self._response_raise_for_status(r)
+            return r
+
+        r = await self._get_as_file(url, headers, destfilename, Megabyte, 'hatrac_download', callback)
+        if r is None:
+            os.remove(destfilename)
+            return None
+
+        with open(destfilename, 'rb') as destfile:
+            if 'Content-SHA256' in r.headers:
+                logging.info("Verifying checksum for file [%s]" % destfilename)
+                fsha256 = hu.compute_hashes(destfile, hashes=['sha256'])['sha256'][1]
+                rsha256 = r.headers.get('Content-SHA256')
+                if fsha256 != rsha256:
+                    raise HatracHashMismatch('Content-SHA256 %s != computed sha256 %s' % (rsha256, fsha256))
+            elif 'Content-MD5' in r.headers:
+                logging.info("Verifying checksum for file [%s]" % destfilename)
+                fmd5 = hu.compute_hashes(destfile, hashes=['md5'])['md5'][1]
+                rmd5 = r.headers.get('Content-MD5')
+                if fmd5 != rmd5:
+                    raise HatracHashMismatch('Content-MD5 %s != computed MD5 %s' % (rmd5, fmd5))
+        return r
+
+    async def put_obj(self, path, data, headers=DEFAULT_HEADERS, md5=None, sha256=None, parents=True):
+        """Idempotent upload of object, returning object location URI.
+
+           Same semantics as HatracStore.put_obj().
+        """
+        self.check_path(path)
+
+        headers = headers.copy()
+
+        if hasattr(data, 'read') and hasattr(data, 'seek'):
+            f = data
+        else:
+            f = open(data, 'rb')
+
+        try:
+            if not (md5 or sha256):
+                md5 = hu.compute_hashes(f, hashes=['md5'])['md5'][1]
+            f.seek(0, 0)
+
+            try:
+                r = await self.head(path)
+                if r.status_code == 200 and \
+                        (md5 and r.headers.get('Content-MD5') == md5 or
+                         sha256 and r.headers.get('Content-SHA256') == sha256):
+                    # object already has same content so skip upload
+                    return r.headers.get('Content-Location')
+            except requests.HTTPError:
+                pass
+
+            if md5:
+                headers['Content-MD5'] = md5
+            if sha256:
+                headers['Content-SHA256'] = sha256
+
+            url = self._server_uri + path
+            url = '%s%s' % (url.rstrip("/") if url.endswith("/") else url,
+                            "" if not parents else "?parents=%s" % str(parents).lower())
+            r = await self._request('PUT', url, headers=headers, data=f)
+            self._response_raise_for_status(r)
+            loc = r.text.strip() or r.url
+            if loc.startswith(self._server_uri):
+                loc = loc[len(self._server_uri):]
+            return loc
+        finally:
+            f.close()
+
+    async def del_obj(self, path):
+        """Delete an object.
+        """
+        self.check_path(path)
+        resp = await self.delete(path)
+        resp.raise_for_status()
+        logging.debug('Deleted object "%s%s".' % (self._server_uri, path))
+
+    async def put_loc(self,
+                      path,
+                      file_path,
+                      headers=DEFAULT_HEADERS,
+                      md5=None,
+                      sha256=None,
+                      content_type=None,
+                      content_disposition=None,
+                      chunked=False,
+                      chunk_size=DEFAULT_CHUNK_SIZE,
+                      create_parents=True,
+                      allow_versioning=True,
+                      callback=None,
+                      concurrency=4):
+        """Upload a file, optionally as a chunked upload job. See HatracStore.put_loc().
+
+           Chunks of a chunked upload are transferred with up to
+           concurrency requests in flight.
+        """
+        self.check_path(path)
+
+        if not chunked:
+            return await self.put_obj(path, file_path, headers, md5, sha256)
+
+        if not (md5 or sha256):
+            md5 = hu.compute_file_hashes(file_path, hashes=['md5'])['md5'][1]
+
+        try:
+            r = await self.head(path)
+            if r.status_code == 200 and (md5 and r.headers.get('Content-MD5') == md5 or
+                                         sha256 and r.headers.get('Content-SHA256') == sha256):
+                # object already has same content so skip upload
+                return r.headers.get('Content-Location')
+            elif not allow_versioning:
+                raise NotModified("The file [%s] cannot be uploaded because content already exists for this object "
+                                  "and multiple versions are not allowed." % file_path)
+        except requests.HTTPError as e:
+            if e.response.status_code != 404:
+                logging.debug("HEAD request failed: %s" % format_exception(e))
+
+        try:
+            job_id = await self.create_upload_job(path, file_path, md5, sha256,
+                                                  content_type=content_type,
+                                                  content_disposition=content_disposition,
+                                                  create_parents=create_parents,
+                                                  chunk_size=chunk_size)
+            await self.put_obj_chunked(path, file_path, job_id, chunk_size, callback, concurrency=concurrency)
+            return await self.finalize_upload_job(path, job_id)
+        except (asyncio.TimeoutError, aiohttp.ServerTimeoutError) as e:
+            raise HatracJobTimeout(e)
+
+    async def put_obj_chunked(self, path, file_path, job_id, chunk_size=DEFAULT_CHUNK_SIZE, callback=None,
+                              start_chunk=0, concurrency=4):
+        """Transfer the chunks of an upload job with up to concurrency requests in flight.
+
+           Same callback protocol as HatracStore.put_obj_chunked(): a
+           callback return value of 0 cancels the job and -1 pauses it.
+        """
+        self.check_path(path)
+
+        job_info = (await self.get_upload_job(path, job_id)).json()
+        file_size = os.path.getsize(file_path)
+        chunks = (file_size + chunk_size - 1) // chunk_size
+        limit = asyncio.Semaphore(concurrency)
+        state = {'completed': start_chunk}
+
+        async def put_chunk(chunk):
+            async with limit:
+                with open(file_path, 'rb') as f:
+                    f.seek(chunk * chunk_size)
+                    data = f.read(chunk_size)
+                url = '%s;upload/%s/%d' % (path, job_id, chunk)
+                headers = {'Content-Type': 'application/octet-stream', 'Content-Length': '%d' % len(data)}
+                r = await self.put(url, data=data, headers=headers)
+                r.raise_for_status()
+                state['completed'] += 1
+                if callback:
+                    ret = callback(job_info=job_info,
+                                   completed=state['completed'],
+                                   total=chunks,
+                                   file_path=file_path,
+                                   host=self._server_uri)
+                    if ret == 0:
+                        raise HatracJobAborted("Upload in-progress cancelled by user.")
+                    elif ret == -1:
+                        raise HatracJobPaused("Upload in-progress paused by user.")
+                return len(data)
+
+        start = datetime.datetime.now()
+        logging.debug("Transferring file %s to %s%s" % (file_path, self._server_uri, path))
+        tasks = [asyncio.ensure_future(put_chunk(chunk)) for chunk in range(start_chunk, chunks)]
+        try:
+            total = sum(await asyncio.gather(*tasks))
+        except HatracJobPaused:
+            for task in tasks:
+                task.cancel()
+            raise
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            try:
+                await self.cancel_upload_job(path, job_id)
+            except Exception:
+                pass
+            raise
+        elapsed = datetime.datetime.now() - start
+        self._metrics.record_transfer('hatrac_chunked_upload', total, elapsed.total_seconds())
+        summary = get_transfer_summary(total, elapsed)
+        logging.info("File [%s] upload successful. %s" % (file_path, summary))
+        if callback:
+            callback(summary=summary, file_path=file_path)
+
+    async def create_upload_job(self,
+                                path,
+                                file_path,
+                                md5,
+                                sha256,
+                                create_parents=True,
+                                chunk_size=DEFAULT_CHUNK_SIZE,
+                                content_type=None,
+                                content_disposition=None):
+        self.check_path(path)
+
+        url = '%s;upload%s' % (path, "" if not create_parents else "?parents=%s" % str(create_parents).lower())
+        obj = {"chunk-length": chunk_size,
+               "content-length": os.path.getsize(file_path)}
+        if md5:
+            obj["content-md5"] = md5
+        if sha256:
+            obj["content-sha256"] = sha256
+        if content_disposition:
+            obj['content-disposition'] = content_disposition
+        obj['content-type'] = content_type if content_type else mu.guess_content_type(file_path)
+        r = await self.post(url, json=obj, headers={'Content-Type': 'application/json'})
+        job_id = r.text.split('/')[-1][:-1]
+        logging.debug('Created job_id "%s" for url "%s".' % (job_id, url))
+        return job_id
+
+    async def get_upload_job(self, path, job_id):
+        self.check_path(path)
+        url = '%s;upload/%s' % (path, job_id)
+        r = await self.get(url, headers={})
+        r.raise_for_status()
+        return r
+
+    async def finalize_upload_job(self, path, job_id):
+        self.check_path(path)
+        url = '%s;upload/%s' % (path, job_id)
+        r = await self.post(url, headers={})
+        r.raise_for_status()
+        return r.text.strip()
+
+    async def cancel_upload_job(self, path, job_id):
+        self.check_path(path)
+        url = '%s;upload/%s' % (path, job_id)
+        r = await self.delete(url, headers={})
+        r.raise_for_status()
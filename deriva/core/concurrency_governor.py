@@ -0,0 +1,174 @@
+import time
+import threading
+
+DEFAULT_THROTTLE_STATUS = (429, 503)
+"""Response status codes by which a server signals that it is overloaded"""
+
+MIN_LATENCY_SAMPLES = 20
+"""Number of responses observed before latency is regarded as a congestion signal"""
+
+
+def parse_retry_after(value):
+    """Returns the number of seconds of a Retry-After header value, or None if absent or given as an HTTP date."""
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ConcurrencyGovernor (object):
+    """Adaptive limit on the number of concurrent requests to a server.
+
+       The limit follows an additive-increase/multiplicative-decrease
+       (AIMD) policy. Each healthy response grows the limit by
+       1/limit, i.e. by about one request per round of responses, up
+       to max_limit. A throttling response (429 or 503 status), a
+       connection error, or a short-term average latency exceeding the
+       long-term average latency by more than latency_tolerance times
+       shrinks the limit by backoff_ratio, down to min_limit, at most
+       once per average round-trip time. A Retry-After header on a
+       throttling response also holds back new requests for the
+       indicated time.
+
+       Arguments:
+         name: label of the governor in metrics, e.g. the server URI
+         initial_limit: initial number of concurrent requests
+         min_limit: lower bound of the limit
+         max_limit: upper bound of the limit
+         backoff_ratio: factor applied to the limit on congestion
+         latency_tolerance: ratio of short-term to long-term average
+           latency regarded as congestion, or None to ignore latency
+         throttle_status: response status codes regarded as throttling
+
+       The governor is safe for concurrent use by multiple threads and
+       may be shared by all bindings to one server.
+    """
+
+    def __init__(self, name=None, initial_limit=8, min_limit=1, max_limit=64, backoff_ratio=0.5,
+                 latency_tolerance=2.0, throttle_status=DEFAULT_THROTTLE_STATUS):
+        assert 1 <= min_limit <= initial_limit <= max_limit
+        assert 0 < backoff_ratio < 1
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.throttle_status = frozenset(throttle_status)
+        self._cond = threading.Condition(threading.Lock())
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self._listeners = []
+        self._latency = None  # fast moving average of response latency
+        self._baseline = None  # slow moving average of response latency
+        self._samples = 0
+        self._hold_until = 0
+        self._last_decrease = 0
+        self.requests = 0
+        self.throttled = 0
+        self.decreases = 0
+
+    @property
+    def limit(self):
+        """The current limit on concurrent requests."""
+        with self._cond:
+            return int(self._limit)
+
+    def _available(self, now):
+        return self._in_flight < int(self._limit) and now >= self._hold_until
+
+    def acquire(self, timeout=None):
+        """Wait until another request may be sent, returning False if timeout seconds elapsed first."""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.time()
+                    if self._available(now):
+                        self._in_flight += 1
+                        return True
+                    wait = self._hold_until - now if now < self._hold_until else None
+                    if deadline is not None:
+                        if now >= deadline:
+                            return False
+                        wait = min(wait, deadline - now) if wait is not None else deadline - now
+                    self._cond.wait(wait)
+            finally:
+                self._waiting -= 1
+
+    def try_acquire(self, listener=None):
+        """Claim a request slot without waiting, returning whether one was available.
+
+           Arguments:
+             listener: function called without arguments on the next
+               release, if no slot was available
+
+           The listener lets callers which cannot block on the governor,
+           e.g. coroutines, wait for a release without polling. It is
+           called once, on the releasing thread, and should only
+           schedule work elsewhere.
+        """
+        with self._cond:
+            if self._available(time.time()):
+                self._in_flight += 1
+                return True
+            if listener is not None:
+                self._listeners.append(listener)
+            return False
+
+    def hold_time(self):
+        """Return the seconds for which a Retry-After response still holds back new requests."""
+        with self._cond:
+            return max(0.0, self._hold_until - time.time())
+
+    def release(self, seconds, status=None, error=False, retry_after=None):
+        """Release a request slot and adapt the limit to the outcome of the request.
+
+           Arguments:
+             seconds: elapsed time of the request
+             status: response status code, if any
+             error: whether the request failed without a response
+             retry_after: seconds the server asked clients to wait
+        """
+        with self._cond:
+            now = time.time()
+            self._in_flight -= 1
+            self.requests += 1
+            throttled = error or status in self.throttle_status
+            if throttled:
+                self.throttled += 1
+                if retry_after:
+                    self._hold_until = max(self._hold_until, now + retry_after)
+            else:
+                self._samples += 1
+                self._latency = seconds if self._latency is None else 0.8 * self._latency + 0.2 * seconds
+                self._baseline = seconds if self._baseline is None else 0.98 * self._baseline + 0.02 * seconds
+            slow = self.latency_tolerance is not None and self._samples >= MIN_LATENCY_SAMPLES \
+                and self._latency > self._baseline * self.latency_tolerance
+            if throttled or slow:
+                # shrink at most once per round trip, so one burst of congestion signals counts once
+                if now - self._last_decrease >= (self._latency or seconds):
+                    self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+            listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            listener()
+
+    def stats(self):
+        """Return a dictionary of the governor state and counters."""
+        with self._cond:
+            return {
+                'limit': int(self._limit),
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'latency': self._latency,
+                'baseline_latency': self._baseline,
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'decreases': self.decreases,
+            }
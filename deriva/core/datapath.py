@@ -1,20 +1,43 @@
-from . import urlquote
+from . import urlquote, IS_PY3, DEFAULT_MAX_WORKERS
+from .json_codec import response_json, json_dumps
+from .utils.concurrent_utils import map_concurrently
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+import copy
 import logging
 import re
 from requests import HTTPError
 
-try:
-    from pandas import DataFrame as _DataFrame
-except ImportError:
-    _DataFrame = None
-
 logger = logging.getLogger(__name__)
 """Logger for this module"""
 
 _system_defaults = {'RID', 'RCT', 'RMT', 'RCB', 'RMT', 'RMB'}
 """Set of system default column names"""
 
+DEFAULT_PAGE_SIZE = 10000
+"""Default number of entities per page of EntitySet.iter_pages"""
+
+DEFAULT_MAX_URL_LENGTH = 4096
+"""Default maximum length of the URLs of requests for entity sets filtered by Column.in_"""
+
+_URL_OPTIONS_LENGTH = 32
+"""Length reserved in URLs for query options such as '?limit=1000'"""
+
+_unichr = chr if IS_PY3 else unichr  # noqa: F821
+
+_numpy_dtypes = {
+    'int2': 'int16', 'int4': 'int32', 'int8': 'int64',
+    'serial2': 'int16', 'serial4': 'int32', 'serial8': 'int64',
+    'float4': 'float32', 'float8': 'float64',
+    'boolean': 'bool'
+}
+"""Map of ERMrest column type names to NumPy dtypes of typed columnar arrays"""
+
 
 def _kwargs(**kwargs):
     """Helper for extending datapath with sub-types for the whole model tree."""
@@ -32,7 +55,60 @@ def from_catalog(catalog):
     :param catalog: an ErmrestCatalog object
     :return: a datapath.Catalog object
     """
-    return Catalog(catalog.getCatalogSchema(), **_kwargs(catalog=catalog))
+    # the memoized schema document of the catalog binding, which the model objects only read
+    return Catalog(catalog.getCatalogSchema(memoized=True), **_kwargs(catalog=catalog))
+
+
+_quoted_names = {}
+_QUOTED_NAMES_MAX = 100000
+
+_PARAMETER = re.compile(r'\{([_A-Za-z][_A-Za-z0-9]*)\}')
+"""Pattern of the placeholders of Parameters in compiled paths, in which literal braces are always quoted"""
+
+
+def _quote_name(name):
+    """Returns the url encoded model element name, memoized since the same names are quoted over and over.
+    This function is intended for internal usage within this module.
+    """
+    try:
+        return _quoted_names[name]
+    except KeyError:
+        if len(_quoted_names) >= _QUOTED_NAMES_MAX:
+            _quoted_names.clear()
+        quoted = _quoted_names[name] = urlquote(name)
+        return quoted
+
+
+class _LazyMapping (Mapping):
+    """Read-only mapping of names to model objects, each created from its document on first access.
+    This class is intended for internal usage within this module.
+    """
+    __slots__ = ('_docs', '_factory', '_values')
+
+    def __init__(self, docs, factory):
+        """Initializes the mapping.
+        :param docs: a mapping of names to documents
+        :param factory: a function of a name and its document returning the model object
+        """
+        self._docs = docs
+        self._factory = factory
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            # a concurrent first access may create the object twice, but all callers get the same one
+            return self._values.setdefault(key, self._factory(key, self._docs[key]))
+
+    def __contains__(self, key):
+        return key in self._docs
+
+    def __iter__(self):
+        return iter(self._docs)
+
+    def __len__(self):
+        return len(self._docs)
 
 
 def _isidentifier(a):
@@ -52,6 +128,153 @@ def _http_error_message(e):
     return '\n'.join(e.response.text.splitlines()[1:]) + '\n' + str(e)
 
 
+def _split_points(lo, hi, n):
+    """Returns up to n distinct values evenly spaced strictly between lo and hi.
+    Numbers are interpolated arithmetically, other values as strings compared by code point.
+    This function is intended for internal usage within this module.
+    :param lo: the lower bound
+    :param hi: the upper bound
+    :param n: the number of values
+    """
+    numeric = (int, float)
+    if isinstance(lo, numeric) and isinstance(hi, numeric) and not isinstance(lo, bool):
+        points = [lo + (hi - lo) * i / float(n + 1) for i in range(1, n + 1)]
+        if isinstance(lo, int) and isinstance(hi, int):
+            points = [int(p) for p in points]
+    else:
+        lo, hi = str(lo), str(hi)
+        # digits are offsets within the range of characters of the bounds, and 0 pads the shorter bound
+        first = min(ord(c) for c in lo + hi) - 1
+        base = max(ord(c) for c in lo + hi) - first + 1
+        width = max(len(lo), len(hi)) + 1
+
+        def to_int(value):
+            v = 0
+            for i in range(width):
+                v = v * base + (ord(value[i]) - first if i < len(value) else 0)
+            return v
+
+        def to_str(v):
+            digits = []
+            for i in range(width):
+                v, d = divmod(v, base)
+                digits.append(d)
+            while digits and digits[0] == 0:
+                digits.pop(0)
+            return ''.join(_unichr(first + max(d, 1)) for d in reversed(digits))
+
+        a, b = to_int(lo), to_int(hi)
+        points = [to_str(a + (b - a) * i // (n + 1)) for i in range(1, n + 1)]
+    return sorted(set(p for p in points if lo < p < hi))
+
+
+def _iter_rows(catalog, path):
+    """Yields the entities at the path as they arrive, without retaining them in the response cache.
+    :param catalog: an ErmrestCatalog object
+    :param path: the path within the catalog
+    """
+    logger.debug("Fetching " + path)
+    try:
+        for row in catalog.get_rows(path):
+            yield row
+    except HTTPError as e:
+        logger.error(e.response.text)
+        if 400 <= e.response.status_code < 500:
+            raise DataPathException(_http_error_message(e), e)
+        else:
+            raise e
+
+
+def _get_rows(catalog, path):
+    """Returns the list of entities at the path, parsed as they arrive and not retained in the response cache.
+    :param catalog: an ErmrestCatalog object
+    :param path: the path within the catalog
+    """
+    return list(_iter_rows(catalog, path))
+
+
+def _distinct(rows):
+    """Returns the list of distinct entities, identified by their RID.
+    This function is intended for internal usage within this module.
+    """
+    seen = set()
+    results = []
+    for row in rows:
+        key = row['RID']
+        if key not in seen:
+            seen.add(key)
+            results.append(row)
+    return results
+
+
+def _table_doc(model_doc, sname, tname):
+    """Returns the definition of a table in a catalog model document.
+    This function is intended for internal usage within this module.
+    """
+    try:
+        return model_doc['schemas'][sname]['tables'][tname]
+    except KeyError:
+        raise DataPathException("Table %s:%s not found in the catalog model." % (sname, tname))
+
+
+def _foreign_key_ends(fkey_doc):
+    """Returns the (sname, tname) of the referencing and of the referenced table of a foreign key document.
+    This function is intended for internal usage within this module.
+    """
+    fkc, pkc = fkey_doc['foreign_key_columns'][0], fkey_doc['referenced_columns'][0]
+    return (fkc['schema_name'], fkc['table_name']), (pkc['schema_name'], pkc['table_name'])
+
+
+def _foreign_key(model_doc, table, related):
+    """Returns the foreign key document relating a table to a related table, or given by its constraint name.
+    This function is intended for internal usage within this module.
+    :param model_doc: the catalog model document.
+    :param table: the (sname, tname) of the table.
+    :param related: a Table related to the table by exactly one foreign key, or a foreign key given by its constraint
+    name as a [schema_name, constraint_name] pair or by an object with such `names`.
+    """
+    if isinstance(related, Table):
+        related = (related._base.sname, related._base.name)
+        candidates = [
+            fkey for fkey in _table_doc(model_doc, *table).get('foreign_keys', [])
+            if _foreign_key_ends(fkey)[1] == related
+        ] + [
+            fkey for fkey in _table_doc(model_doc, *related).get('foreign_keys', [])
+            if _foreign_key_ends(fkey)[1] == table and related != table  # self-references are listed once
+        ]
+        if len(candidates) != 1:
+            raise DataPathException("%s foreign keys relate %s:%s to %s:%s. Specify the foreign key by its constraint "
+                                    "name instead." % (len(candidates) or "No", table[0], table[1], related[0],
+                                                       related[1]))
+        return candidates[0]
+
+    names = getattr(related, 'names', [related])
+    for sdoc in model_doc.get('schemas', {}).values():
+        for tdoc in sdoc.get('tables', {}).values():
+            for fkey in tdoc.get('foreign_keys', []):
+                if any(list(name) in fkey.get('names', []) for name in names):
+                    if table not in _foreign_key_ends(fkey):
+                        raise DataPathException("Foreign key %s does not relate to table %s:%s."
+                                                % (list(names[0]), table[0], table[1]))
+                    return fkey
+    raise DataPathException("Foreign key %s not found in the catalog model." % list(names[0]))
+
+
+def _numpy_dtype_name(column_type):
+    """Returns the NumPy dtype name for values of a column type document, or '' if not of a numeric or boolean type.
+    """
+    while column_type.get('base_type') and not column_type.get('is_array'):
+        column_type = column_type['base_type']  # the type underlying a domain
+    return _numpy_dtypes.get(column_type.get('typename'), '')
+
+
+def _numpy_dtype(column):
+    """Returns the NumPy dtype name for the values of a Column or aggregate function, or None if they are not of a
+    numeric or boolean type.
+    """
+    return _numpy_dtype_name(column.type if column is not None else {}) or None
+
+
 class DataPathException (Exception):
     """DataPath exception
     """
@@ -67,27 +290,34 @@ class DataPathException (Exception):
 
 class Catalog (object):
     """Handle to a Catalog.
+    The schemas of the catalog are created on first access.
     """
+    __slots__ = ('schemas',)
+
     def __init__(self, model_doc, **kwargs):
         """Creates the Catalog.
         :param model_doc: the schema document for the catalog
         """
         super(Catalog, self).__init__()
-        self.schemas = {
-            sname: kwargs.get('schema_class', Schema)(sname, sdoc, **kwargs)
-            for sname, sdoc in model_doc.get('schemas', {}).items()
-        }
+        schema_class = kwargs.get('schema_class', Schema)
+        self.schemas = _LazyMapping(model_doc.get('schemas', {}),
+                                    lambda sname, sdoc: schema_class(sname, sdoc, **kwargs))
 
     def __dir__(self):
         return list(super(Catalog, self).__dir__()) + [key for key in self.schemas if _isidentifier(key)]
 
     def __getattr__(self, a):
+        if a.startswith('__'):
+            raise AttributeError(a)  # e.g., '__dict__' looked up for instances with slots
         return self.schemas[a]
 
 
 class Schema (object):
     """Represents a Schema.
+    The tables of the schema are created on first access.
     """
+    __slots__ = ('name', 'tables')
+
     def __init__(self, sname, schema_doc, **kwargs):
         """Creates the Schema.
         :param sname: the schema's name
@@ -95,23 +325,24 @@ class Schema (object):
         """
         super(Schema, self).__init__()
         self.name = sname
-        self.tables = {
-            tname: kwargs.get('table_class', Table)(sname, tname, tdoc, **kwargs)
-            for tname, tdoc in schema_doc.get('tables', {}).items()
-        }
+        table_class = kwargs.get('table_class', Table)
+        self.tables = _LazyMapping(schema_doc.get('tables', {}),
+                                   lambda tname, tdoc: table_class(sname, tname, tdoc, **kwargs))
 
     def __dir__(self):
         return list(super(Schema, self).__dir__()) + [key for key in self.tables if _isidentifier(key)]
 
     def __getattr__(self, a):
+        if a.startswith('__'):
+            raise AttributeError(a)  # e.g., '__dict__' looked up for instances with slots
         return self.tables[a]
 
     def __repr__(self):
         s = "Schema name: '%s'\nList of tables:\n" % self.name
-        if len(self.table_names) == 0:
+        if len(self.tables) == 0:
             s += "none"
         else:
-            s += "\n".join("  '%s'" % tname for tname in self.table_names)
+            s += "\n".join("  '%s'" % tname for tname in self.tables)
         return s
 
 
@@ -247,39 +478,359 @@ class DataPath (object):
         """
         return self._entities(attributes, renamed_attributes)
 
-    def _entities(self, attributes, renamed_attributes, context=None):
-        """Returns the entity set computed by this data path from the perspective of the given 'context'.
+    def aggregates(self, **renamed_aggregates):
+        """Returns the entity set of aggregates computed over this data path by the catalog.
+        The entity set has a single entity with an attribute for each keyword parameter, e.g.,
+        `path.aggregates(n=Cnt(table), newest=Max(table.RCT))`.
+        :param renamed_aggregates: a list of renamed aggregate functions.
+        :return: an entity set
+        """
+        return self._aggregates(renamed_aggregates)
+
+    def _aggregates(self, renamed_aggregates, context=None):
+        """Returns the entity set of aggregates computed over this data path from the perspective of the given
+        'context'.
+        """
+        if not renamed_aggregates:
+            raise DataPathException("At least one aggregate function is required.")
+        if not all(isinstance(agg, AggregateFunction) for agg in renamed_aggregates.values()):
+            raise DataPathException("Aggregates must be aggregate functions such as Cnt(column).")
+        return self._entities((), renamed_aggregates, context, AggregateProject)
+
+    def groupby(self, *keys, **renamed_keys):
+        """Groups the entities of this data path by the values of the given keys.
+        The attributes of the groups are then chosen with the `attributes` method of the returned object, e.g.,
+        `path.groupby(table.species).attributes(n=Cnt(table))`.
+        :param keys: a list of Columns.
+        :param renamed_keys: a list of renamed Columns.
+        :return: a GroupBy object
+        """
+        return GroupBy(self, keys, renamed_keys)
+
+    def prepare(self, *attributes, **renamed_attributes):
+        """Returns a prepared path for the entity set computed by this data path.
+        The attributes are as for the `entities` method. Filters of the path may compare columns with Parameters
+        instead of literal values. The path is compiled once, and the entity sets for given parameter values are
+        then obtained with the `bind` method of the prepared path.
         :param attributes: a list of Columns.
         :param renamed_attributes: a list of renamed Columns.
-        :param context: optional context for the entities.
-        :return: an entity set
+        :return: a PreparedPath object
         """
-        assert context is None or isinstance(context, TableAlias)
-        catalog = self._root.catalog
+        return self._prepare(attributes, renamed_attributes)
 
+    def _prepare(self, attributes, renamed_attributes, context=None):
+        return PreparedPath(self._root.catalog, self._base_uri, self._query(attributes, renamed_attributes, context))
+
+    def _query(self, attributes, renamed_attributes, context=None, projection=None, keys=(), renamed_keys=None):
+        """Returns the query of the entity set computed by this data path from the perspective of the given 'context'.
+        """
+        assert context is None or isinstance(context, TableAlias)
         expression = self._path_expression
         if context:
             expression = ResetContext(expression, context)
-        if attributes or renamed_attributes:
-            expression = Project(expression, attributes, renamed_attributes)
-        base_path = str(expression)
-
-        def fetcher(limit=None):
-            assert limit is None or isinstance(limit, int)
-            opts = '?limit=%d' % limit if limit else ''
-            path = base_path + opts
-            logger.debug("Fetching " + path)
-            try:
+        if projection is None and (attributes or renamed_attributes):
+            projection = Project
+        return _Query(expression, context or self._context, attributes, renamed_attributes, projection, keys,
+                      renamed_keys)
+
+    def _entities(self, attributes, renamed_attributes, context=None, projection=None, keys=(),
+                  renamed_keys=None):
+        """Returns the entity set computed by this data path from the perspective of the given 'context'.
+        :param attributes: a list of Columns.
+        :param renamed_attributes: a list of renamed Columns.
+        :param context: optional context for the entities.
+        :param projection: the class of the projection of attributes (default: Project, if any attributes).
+        :param keys: a list of group key Columns, for a GroupProject.
+        :param renamed_keys: a list of renamed group key Columns, for a GroupProject.
+        :return: an entity set
+        """
+        query = self._query(attributes, renamed_attributes, context, projection, keys, renamed_keys)
+        return _entity_set(self._root.catalog, self._base_uri, query)
+
+
+def _entity_set(catalog, base_uri, query):
+    """Returns the entity set of a query.
+    This function is intended for internal usage within this module.
+    """
+    base_path = query.path()
+
+    def fetcher(limit=None):
+        assert limit is None or isinstance(limit, int)
+        opts = '?limit=%d' % limit if limit else ''
+        paths = query.paths(len(base_uri))
+
+        def fetch():
+            if len(paths) == 1:
+                path = base_path + opts
+                logger.debug("Fetching " + path)
                 resp = catalog.get(path)
-                return resp.json()
-            except HTTPError as e:
-                logger.error(e.response.text)
-                if 400 <= e.response.status_code < 500:
-                    raise DataPathException(_http_error_message(e), e)
-                else:
-                    raise e
+                return response_json(resp)
+            # an in-list too long for one URL, fetched in chunks
+            logger.debug("Fetching %d chunks of %s" % (len(paths), base_path))
+            responses = catalog.map_get([path + opts for path in paths])
+            results = [row for path, resp in responses for row in response_json(resp)]
+            if query.projection is None:
+                # the same entity may be in the results of several chunks
+                results = _distinct(results)
+            return results[:limit] if limit else results
+
+        try:
+            # cached by the catalog if it is configured with a result cache
+            return catalog._cached_result(base_path + opts, fetch)
+        except HTTPError as e:
+            logger.error(e.response.text)
+            if 400 <= e.response.status_code < 500:
+                raise DataPathException(_http_error_message(e), e)
+            else:
+                raise e
 
-        return EntitySet(self._base_uri + base_path, fetcher)
+    return EntitySet(base_uri + base_path, fetcher, catalog, query)
+
+
+class PreparedPath (object):
+    """A data path compiled once for many entity sets that differ only in the values of its Parameters, e.g.,
+    `prepared = table.filter(table.RID == Parameter('rid')).prepare()` and then `prepared.bind(rid='1-ABCD')`.
+    """
+    def __init__(self, catalog, base_uri, query):
+        """Initializes the prepared path.
+        :param catalog: the catalog of the path.
+        :param base_uri: the uri of the catalog.
+        :param query: the query of the entity set.
+        """
+        self._catalog = catalog
+        self._base_uri = base_uri
+        self._query = query
+        self.parameters = query.parameters()
+
+    @property
+    def uri(self):
+        """The uri template of the path, with a placeholder for each parameter, e.g., '{rid}'."""
+        return self._base_uri + ''.join('{%s}' % piece if i % 2 else piece
+                                        for i, piece in enumerate(self._query.pieces()))
+
+    def bind(self, **values):
+        """Returns the entity set of the path for the given parameter values.
+        :param values: a value for each parameter, and for no other names.
+        :return: an entity set
+        """
+        missing = [name for name in self.parameters if name not in values]
+        if missing:
+            raise DataPathException("No values for parameters: %s" % ', '.join(missing))
+        unknown = sorted(name for name in values if name not in self.parameters)
+        if unknown:
+            raise DataPathException("Values for unknown parameters: %s" % ', '.join(unknown))
+        return _entity_set(self._catalog, self._base_uri, self._query.bind(values))
+
+
+class GroupBy (object):
+    """The groups of the entities of a data path, whose attributes are computed by the catalog."""
+    def __init__(self, path, keys, renamed_keys, context=None):
+        """Initializes the grouping.
+        :param path: the data path.
+        :param keys: a list of Columns.
+        :param renamed_keys: a list of renamed Columns.
+        :param context: optional context for the entities.
+        """
+        assert isinstance(path, DataPath)
+        if not (keys or renamed_keys):
+            raise DataPathException("At least one group key is required.")
+        self._path = path
+        self._keys = keys
+        self._renamed_keys = renamed_keys
+        self._context = context
+
+    def attributes(self, *attributes, **renamed_attributes):
+        """Returns the entity set of groups, with an entity for each distinct combination of key values.
+        The attributes may be Columns, whose value is taken from an arbitrary entity of the group, and renamed
+        aggregate functions computed over the entities of the group.
+        :param attributes: a list of Columns.
+        :param renamed_attributes: a list of renamed Columns or aggregate functions.
+        :return: an entity set
+        """
+        if any(isinstance(attr, AggregateFunction) for attr in attributes):
+            raise DataPathException("Aggregate functions must be renamed, e.g., n=Cnt(column).")
+        return self._path._entities(attributes, renamed_attributes, self._context, GroupProject, self._keys,
+                                    self._renamed_keys)
+
+
+class _Query (object):
+    """The path expression, context and projection of an entity set, from which paths of its subsets and aggregates
+    are compiled.
+    """
+    def __init__(self, expression, context, attributes=(), renamed_attributes=None, projection=None, keys=(),
+                 renamed_keys=None, values=None):
+        """Initializes the query.
+        :param expression: the path expression without the projection of attributes.
+        :param context: the table instance in the context of the expression.
+        :param attributes: a list of Columns.
+        :param renamed_attributes: a list of renamed Columns.
+        :param projection: None for whole entities, else the Project, AggregateProject or GroupProject class.
+        :param keys: a list of group key Columns, for a GroupProject.
+        :param renamed_keys: a list of renamed group key Columns, for a GroupProject.
+        :param values: the values bound to the Parameters of the expression.
+        """
+        assert isinstance(expression, PathOperator)
+        assert isinstance(context, TableAlias)
+        self.expression = expression
+        self.context = context
+        self.attributes = attributes
+        self.renamed_attributes = renamed_attributes or {}
+        self.projection = projection
+        self.keys = keys
+        self.renamed_keys = renamed_keys or {}
+        self.values = values
+        self._pieces = None
+        self._paths = {}
+
+    def bind(self, values):
+        """Returns a copy of the query with the given values bound to its Parameters, sharing its compiled path.
+        """
+        query = _Query(self.expression, self.context, self.attributes, self.renamed_attributes, self.projection,
+                       self.keys, self.renamed_keys, values)
+        query._pieces = self.pieces()
+        return query
+
+    def _filtered(self, formula):
+        return self.expression if formula is None else Filter(self.expression, formula)
+
+    def _compile(self, formula):
+        return self._project(self._filtered(formula))
+
+    def _project(self, expression):
+        if self.projection is GroupProject:
+            expression = GroupProject(expression, self.keys, self.renamed_keys, self.attributes,
+                                      self.renamed_attributes)
+        elif self.projection is not None:
+            expression = self.projection(expression, self.attributes, self.renamed_attributes)
+        return str(expression)
+
+    def pieces(self):
+        """Returns the compiled path of the entity set split into literal text and, in odd places, parameter names.
+        """
+        if self._pieces is None:
+            self._pieces = _PARAMETER.split(self._compile(None))
+        return self._pieces
+
+    def parameters(self):
+        """Returns the names of the Parameters of the query."""
+        names = []
+        for name in self.pieces()[1::2]:
+            if name not in names:
+                names.append(name)
+        return names
+
+    def _bind(self, pieces):
+        if len(pieces) == 1:
+            return pieces[0]
+        values = self.values or {}
+        try:
+            return ''.join(urlquote(str(values[piece])) if i % 2 else piece for i, piece in enumerate(pieces))
+        except KeyError as e:
+            raise DataPathException("No value bound to parameter '%s'" % e.args[0])
+
+    def _in_predicates(self):
+        """Returns the InPredicates of the filters of the expression which may be split into chunks, once for each
+        filter they are in. In-lists which are negated are never split. Entities are fetched once however many chunks
+        they are in, so their in-lists may also be in disjunctions, but projections are the concatenation of the
+        results of the chunks, so their in-lists must be in conjunctions only. Aggregates are never split.
+        """
+        if not self.partitionable:
+            return []
+        junctions = ('&', ';') if self.projection is None else ('&',)
+        predicates = []
+        stack = []
+        node = self.expression
+        while isinstance(node, PathOperator):
+            if isinstance(node, Filter):
+                stack.append(node._formula)
+            node = node._r
+        while stack:
+            predicate = stack.pop()
+            if isinstance(predicate, InPredicate):
+                predicates.append(predicate)
+            elif isinstance(predicate, JunctionPredicate) and predicate._op in junctions:
+                stack.extend((predicate._left, predicate._right))
+        return predicates
+
+    @staticmethod
+    def _substitute(node, predicate, chunk):
+        """Returns the path operator with the in-list predicate replaced by the chunk in its filters, sharing the
+        operators which do not depend on the predicate.
+        """
+        if isinstance(node, Predicate):
+            if node is predicate:
+                return chunk
+            if isinstance(node, JunctionPredicate):
+                left = _Query._substitute(node._left, predicate, chunk)
+                right = _Query._substitute(node._right, predicate, chunk)
+                if left is not node._left or right is not node._right:
+                    return JunctionPredicate(left, node._op, right)
+            return node
+        if not isinstance(node, PathOperator):
+            return node
+        r = _Query._substitute(node._r, predicate, chunk)
+        formula = _Query._substitute(node._formula, predicate, chunk) if isinstance(node, Filter) else None
+        if r is node._r and (formula is None or formula is node._formula):
+            return node
+        node = copy.copy(node)
+        node._r, node._compiled = r, None
+        if formula is not None:
+            node._formula = formula
+        return node
+
+    def paths(self, base_length):
+        """Returns the paths of requests for the entity set, which are several if the URL with an in-list filter would
+        be longer than its maximum URL length. Each path then has a chunk of the values of the longest such in-list.
+        The entity set is the union of the entities, or the concatenation of the projections, of the paths.
+        :param base_length: the length of the catalog uri preceding the paths.
+        """
+        paths = self._paths.get(base_length)
+        if paths is None:
+            path = self.path()
+            length = base_length + len(path) + _URL_OPTIONS_LENGTH
+            in_predicates = self._in_predicates()
+            predicates = [p for p in in_predicates if length > p.max_url_length]
+            if not predicates:
+                paths = [path]
+            else:
+                predicate = max(predicates, key=lambda p: len(str(p)))
+                occurrences = len([p for p in in_predicates if p is predicate])
+                budget = (predicate.max_url_length - length) // occurrences + len(str(predicate))
+                expressions = [self._substitute(self.expression, predicate, chunk)
+                               for chunk in predicate.chunks(budget)]
+                paths = [self._bind(_PARAMETER.split(self._project(expression))) for expression in expressions]
+            self._paths[base_length] = paths
+        return paths
+
+    def path(self, formula=None):
+        """Returns the path of the entity set, optionally restricted by a filter predicate on the context.
+        """
+        return self._bind(self.pieces() if formula is None else _PARAMETER.split(self._compile(formula)))
+
+    @property
+    def partitionable(self):
+        """Whether the entity set is the union of its subsets restricted by filters on the context."""
+        return self.projection in (None, Project)
+
+    def columns(self):
+        """Returns an OrderedDict of the names of the attributes of the entity set and their Columns or aggregates.
+        """
+        columns = OrderedDict()
+        for attr in list(self.keys) + list(self.attributes) if self.projection else [self.context]:
+            if isinstance(attr, Table):
+                columns.update(attr.column_definitions)
+            else:
+                columns[attr.name] = attr
+        for renamed in (self.renamed_keys, self.renamed_attributes):
+            for new_name in renamed:
+                columns[new_name] = renamed[new_name]
+        return columns
+
+    def aggregate_path(self, aggregates, formula=None):
+        """Returns the path of aggregates over the entity set, optionally restricted by a filter predicate.
+        :param aggregates: the aggregate projection, e.g., 'n:=cnt(*)'.
+        """
+        return self._bind(_PARAMETER.split('/aggregate/%s/%s' % (self._filtered(formula)._path, aggregates)))
 
 
 class EntitySet (object):
@@ -288,13 +839,19 @@ class EntitySet (object):
     container. If the EntitySet has not been fetched explicitly, on first use of container operations, it will
     be implicitly fetched from the catalog.
     """
-    def __init__(self, uri, fetcher_fn):
+    def __init__(self, uri, fetcher_fn, catalog=None, query=None):
         """Initializes the EntitySet.
         :param uri: the uri for the entity set in the catalog.
         :param fetcher_fn: a function that fetches the entities from the catalog.
+        :param catalog: optional catalog from which the entity set may be fetched in pages or partitions.
+        :param query: optional query of the entity set, required for fetches in pages or partitions.
         """
         assert fetcher_fn is not None
+        assert (catalog is None) == (query is None)
         self._fetcher_fn = fetcher_fn
+        self._catalog = catalog
+        self._query = query
+        self._base_length = len(uri) - len(query.path()) if query is not None else 0
         self._results_doc = None
         self._dataframe = None
         self.uri = uri
@@ -309,12 +866,153 @@ class EntitySet (object):
     def dataframe(self):
         """Pandas DataFrame representation of this path."""
         if not self._dataframe:
-            if _DataFrame:
-                self._dataframe = _DataFrame(self._results)
-            else:
+            try:
+                from pandas import DataFrame
+            except ImportError:
                 logger.debug("'pandas' package not installed")
+            else:
+                self._dataframe = DataFrame(self._results)
         return self._dataframe
 
+    @property
+    def _split(self):
+        """Whether the entity set is fetched by several requests for chunks of an in-list."""
+        return self._query is not None and len(self._query.paths(self._base_length)) > 1
+
+    def count(self):
+        """Returns the number of entities of the set, counted by the catalog unless the set has been fetched.
+        Groups, and entity sets filtered by in-lists too long for one request, cannot be counted without fetching
+        them.
+        """
+        if self._results_doc is not None or self._query is None or self._split:
+            return len(self._results)
+        if self._query.projection is AggregateProject:
+            return 1
+        if self._query.projection is GroupProject:
+            raise DataPathException("Groups cannot be counted without fetching them; use len() instead.")
+        return self._aggregate('n:=cnt(*)')['n']
+
+    def prefetch(self, related, name=None, max_url_length=DEFAULT_MAX_URL_LENGTH):
+        """Fetches the entities related to the entities of the set by a foreign key and attaches them to the entities.
+        The related entities are fetched by a few requests for batches of the key values of the set, which are sent
+        concurrently, instead of a request per entity. If the foreign key references the related table, each entity
+        gets the related entity it references, or None; if it references the table of the set, each entity gets the
+        list of related entities referencing it. A self-referencing foreign key given by name is followed from the
+        referencing columns.
+        :param related: a Table related to the table of the set by exactly one foreign key, or a foreign key given by
+        its constraint name as a [schema_name, constraint_name] pair or by an object with such `names`, e.g., an
+        ermrest_model.ForeignKey.
+        :param name: the key of the entities to which the related entities are attached, by default the name of the
+        related table.
+        :param max_url_length: maximum length of the URL of each request.
+        :return: self
+        """
+        if self._query is None or self._query.projection not in (None, Project):
+            raise DataPathException("Only entity sets of entities or attributes can prefetch related entities.")
+        context = self._query.context._base
+        table = (context.sname, context.name)
+        model_doc = self._catalog.getCatalogSchema(memoized=True)
+        fkey = _foreign_key(model_doc, table, related)
+        fk_columns = [c['column_name'] for c in fkey['foreign_key_columns']]
+        pk_columns = [c['column_name'] for c in fkey['referenced_columns']]
+        referencing, referenced = _foreign_key_ends(fkey)
+        outbound = referencing == table
+        if outbound:
+            related_table, keys, related_keys = referenced, fk_columns, pk_columns
+        else:
+            related_table, keys, related_keys = referencing, pk_columns, fk_columns
+        name = name or related_table[1]
+        if name in context.column_definitions:
+            raise DataPathException("Cannot attach related entities as '%s', which is a column of the entities." % name)
+
+        rows = self._results
+        if rows and any(key not in rows[0] for key in keys):
+            raise DataPathException("The entities must include the columns %s to prefetch related entities." % keys)
+        values = OrderedDict.fromkeys(tuple(row[key] for key in keys) for row in rows)
+        values = [value for value in values if None not in value]  # null keys reference nothing
+
+        # hash index of the related entities by the values of their key
+        index = {}
+        if values:
+            kwargs = context._kwargs
+            rtable = kwargs.get('table_class', Table)(related_table[0], related_table[1],
+                                                      _table_doc(model_doc, *related_table), **kwargs)
+            if len(related_keys) == 1:
+                predicate = InPredicate(rtable.column_definitions[related_keys[0]],
+                                        [value[0] for value in values], max_url_length)
+            else:
+                predicate = InPredicate(tuple(rtable.column_definitions[key] for key in related_keys),
+                                        values, max_url_length)
+            for entity in rtable.filter(predicate).entities():
+                index.setdefault(tuple(entity[key] for key in related_keys), []).append(entity)
+            logger.debug("Prefetched %d entities of %s:%s"
+                         % (sum(len(matches) for matches in index.values()), related_table[0], related_table[1]))
+
+        for row in rows:
+            matches = index.get(tuple(row[key] for key in keys), [])
+            row[name] = (matches[0] if matches else None) if outbound else matches
+        return self
+
+    def to_columns(self):
+        """Returns the entities in columnar form, as an OrderedDict of attribute names and lists of their values.
+        Columns are in the order of the table definition or projection. If the entity set has not been fetched, the
+        entities are streamed from the catalog and each is discarded as soon as its values have been appended to the
+        columns, so no list of entities is held in memory.
+        :return: an OrderedDict of lists of equal length
+        """
+        if self._results_doc is None and self._query is not None and not self._split:
+            rows = _iter_rows(self._catalog, self._query.path())
+        else:
+            rows = self._results
+        columns = OrderedDict((name, []) for name in (self._query.columns() if self._query else []))
+        count = 0
+        for row in rows:
+            if len(row) != len(columns) or any(name not in columns for name in row):
+                for name in row:
+                    if name not in columns:
+                        columns[name] = [None] * count
+            for name, values in columns.items():
+                values.append(row.get(name))
+            count += 1
+        return columns
+
+    def to_numpy(self):
+        """Returns the entities in columnar form, as an OrderedDict of attribute names and NumPy arrays.
+        Columns of integer, floating point and boolean types of the catalog model become typed arrays. Integer
+        columns including nulls become float64 arrays with NaN for null, and boolean columns including nulls and all
+        other columns become object arrays. Requires the 'numpy' package.
+        :return: an OrderedDict of one-dimensional arrays of equal length
+        """
+        import numpy
+
+        model_columns = self._query.columns() if self._query else {}
+        arrays = OrderedDict()
+        for name, values in self.to_columns().items():
+            dtype = _numpy_dtype(model_columns.get(name))
+            if dtype is not None and None in values:
+                dtype = None if dtype == 'bool' else 'float64'
+                values = [numpy.nan if v is None else v for v in values] if dtype else values
+            if dtype is not None:
+                arrays[name] = numpy.array(values, dtype=dtype)
+            else:
+                array = numpy.empty(len(values), dtype=object)
+                try:
+                    array[:] = values
+                except ValueError:
+                    # e.g., array values, which numpy would broadcast
+                    for i, value in enumerate(values):
+                        array[i] = value
+                arrays[name] = array
+        return arrays
+
+    def to_dataframe(self):
+        """Returns a Pandas DataFrame of the entities, built from the typed columns of to_numpy() rather than from a
+        list of entities. Requires the 'numpy' and 'pandas' packages.
+        """
+        from pandas import DataFrame
+
+        return DataFrame(self.to_numpy())
+
     def __len__(self):
         return len(self._results)
 
@@ -326,6 +1024,8 @@ class EntitySet (object):
 
     def fetch(self, limit=None):
         """Fetches the entities from the catalog.
+        The entities are served from the result cache of the catalog, if it is configured with one and the catalog
+        has not changed since they were cached.
         :param limit: maximum number of entities to fetch from the catalog.
         :return: self
         """
@@ -335,10 +1035,144 @@ class EntitySet (object):
         logger.debug("Fetched %d entities" % len(self._results_doc))
         return self
 
+    def iter_pages(self, page_size=DEFAULT_PAGE_SIZE, sort_key='RID'):
+        """Iterates over the entities of the set in pages.
+        Pages are fetched by keyset paging: each page is sorted by the sort key and starts after the sort key value
+        of the last entity of the previous page, so that arbitrarily large entity sets may be retrieved in bounded
+        memory. The next page is fetched in the background while the current page is consumed. The entities are not
+        retained by the EntitySet.
+        :param page_size: maximum number of entities per page.
+        :param sort_key: the name of a column, or a Column, whose values are unique and not null within the entity
+        set, which must be included in the projected attributes.
+        :return: a generator of lists of entities.
+        """
+        page_size = int(page_size)
+        assert page_size > 0
+        if self._query is None or self._split:
+            # e.g., the entities returned by an insert or update, or those of an in-list fetched in chunks
+            results = self._results
+            for i in range(0, len(results), page_size):
+                yield results[i:i + page_size]
+            return
+
+        key = str(sort_key)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self._fetch_page, page_size, key, None)
+            while future is not None:
+                page = future.result()
+                future = None
+                if len(page) == page_size:
+                    if page[-1].get(key) is None:
+                        raise DataPathException("Sort key '%s' missing from entities of %s" % (key, self.uri))
+                    future = executor.submit(self._fetch_page, page_size, key, page[-1][key])
+                if page:
+                    yield page
+        finally:
+            executor.shutdown(wait=False)
+
+    def _fetch_page(self, page_size, key, after):
+        """Fetches the page of entities sorted by key and following the key value after.
+        """
+        path = '%s@sort(%s)' % (self._query.path(), urlquote(key))
+        if after is not None:
+            path += '@after(%s)' % urlquote(str(after))
+        return _get_rows(self._catalog, '%s?limit=%d' % (path, page_size))
+
+    def fetch_parallel(self, workers=DEFAULT_MAX_WORKERS, key='RID', ordered=False, partitions=None):
+        """Fetches the entities from the catalog by concurrent requests for disjoint ranges of a key column.
+        See iter_parallel for the arguments.
+        :return: self
+        """
+        self._results_doc = list(self.iter_parallel(workers, key, ordered, partitions))
+        self._dataframe = None  # clear potentially cached state
+        logger.debug("Fetched %d entities" % len(self._results_doc))
+        return self
+
+    def iter_parallel(self, workers=DEFAULT_MAX_WORKERS, key='RID', ordered=False, partitions=None):
+        """Iterates over the entities of the set fetched by concurrent requests for disjoint ranges of a key column.
+        The key range is split between the minimum and maximum key values, and the split points are put in the
+        order of the catalog by counting the entities below each of them. Each range is then fetched by a request
+        with additional filters on the key column, at most `workers` at a time. The entities are not retained by the
+        EntitySet, and only about twice as many ranges as workers are held in memory at a time.
+        :param workers: maximum number of concurrent requests.
+        :param key: the name of a column, or a Column, of the context table of the entity set, e.g., 'RID'.
+        :param ordered: whether to yield the entities ordered by the key, or else in the order ranges complete.
+        :param partitions: number of key ranges (default: four per worker).
+        :return: a generator of entities.
+        """
+        if self._query is None:
+            # e.g., the entities returned by an insert or update
+            for entity in self._results:
+                yield entity
+            return
+
+        if not self._query.partitionable:
+            raise DataPathException("Aggregates and groups cannot be fetched in partitions.")
+        if self._split:
+            raise DataPathException("Entity sets filtered by in-lists too long for one request cannot be fetched in "
+                                    "partitions; use fetch() instead.")
+        suffix = '@sort(%s)' % urlquote(str(key)) if ordered else ''
+        paths = [self._query.path(formula) + suffix
+                 for formula in self._partitions(key, partitions or 4 * workers, workers)]
+        for path, rows in map_concurrently(lambda p: _get_rows(self._catalog, p), paths, workers, ordered):
+            for entity in rows:
+                yield entity
+
+    def write_parallel(self, fileobj, workers=DEFAULT_MAX_WORKERS, key='RID', ordered=False, partitions=None):
+        """Writes the entities of the set, fetched as by iter_parallel, to a file in line-delimited JSON format.
+        :param fileobj: a text file object open for writing.
+        :return: the number of entities written.
+        """
+        count = 0
+        for entity in self.iter_parallel(workers, key, ordered, partitions):
+            fileobj.write(json_dumps(entity))
+            fileobj.write('\n')
+            count += 1
+        return count
+
+    def _aggregate(self, aggregates, formula=None):
+        """Returns the aggregates, e.g., 'n:=cnt(*)', of the entity set optionally restricted by a filter predicate.
+        """
+        return _get_rows(self._catalog, self._query.aggregate_path(aggregates, formula))[0]
+
+    def _partitions(self, key, partitions, workers):
+        """Returns filter predicates on the key column which split the entity set into disjoint subsets.
+        The entities below the split points are counted by at most `workers` concurrent requests.
+        """
+        try:
+            column = self._query.context.column_definitions[str(key)]
+        except KeyError:
+            raise DataPathException("Key '%s' is not a column of table '%s'" % (key, self._query.context.name))
+        cname = column.instancename
+        bounds = self._aggregate('n:=cnt(*),k:=cnt(%s),lo:=min(%s),hi:=max(%s)' % (cname, cname, cname))
+        predicates = [column == None] if bounds['k'] < bounds['n'] else []  # noqa: E711
+        if not bounds['k']:
+            return predicates
+
+        # put the split points in the order of the catalog, which may differ from the order of python values
+        points = _split_points(bounds['lo'], bounds['hi'], partitions - 1)
+        below = map_concurrently(lambda p: self._aggregate('n:=cnt(*)', column < p)['n'], points, workers)
+        splits, last = [], 0
+        for count, point in sorted((count, point) for point, count in below):
+            if last < count < bounds['k']:
+                splits.append(point)
+                last = count
+
+        if not splits:
+            return predicates + [column >= bounds['lo']]
+        predicates.append(column < splits[0])
+        predicates.extend((column >= lo) & (column < hi) for lo, hi in zip(splits, splits[1:]))
+        predicates.append(column >= splits[-1])
+        return predicates
+
 
 class Table (object):
     """Represents a Table.
+    The columns of the table are created on first access.
     """
+    __slots__ = ('catalog', 'sname', 'name', '_table_doc', '_kwargs', '_column_docs', '_columns')
+
     def __init__(self, sname, tname, table_doc, **kwargs):
         """Creates a Table object.
         :param sname: name of the schema
@@ -351,17 +1185,35 @@ class Table (object):
         self.name = tname
         self._table_doc = table_doc
         self._kwargs = kwargs
+        self._column_docs = None
+        self._columns = None
 
-        kwargs.update(table=self)
-        self.column_definitions = {
-            cdoc['name']: kwargs.get('column_class', Column)(sname, tname, cdoc, **kwargs)
-            for cdoc in table_doc.get('column_definitions', [])
-        }
+    @property
+    def _base(self):
+        """The base table of this table instance."""
+        return self
+
+    @property
+    def column_definitions(self):
+        """Mapping of column names to the Columns of this table instance."""
+        if self._columns is None:
+            base = self._base
+            if base._column_docs is None:
+                # the index of column documents is shared by all aliases of the base table
+                base._column_docs = OrderedDict(
+                    (cdoc['name'], cdoc) for cdoc in self._table_doc.get('column_definitions', []))
+            kwargs = dict(self._kwargs, table=self)
+            column_class = kwargs.get('column_class', Column)
+            self._columns = _LazyMapping(base._column_docs,
+                                         lambda cname, cdoc: column_class(self.sname, base.name, cdoc, **kwargs))
+        return self._columns
 
     def __dir__(self):
         return list(super(Table, self).__dir__()) + [key for key in self.column_definitions if _isidentifier(key)]
 
     def __getattr__(self, a):
+        if a.startswith('__'):
+            raise AttributeError(a)  # e.g., '__dict__' looked up for instances with slots
         return self.column_definitions[a]
 
     def __repr__(self):
@@ -375,12 +1227,12 @@ class Table (object):
     @property
     def uname(self):
         """the url encoded name"""
-        return urlquote(self.name)
+        return _quote_name(self.name)
 
     @property
     def fqname(self):
         """the url encoded fully qualified name"""
-        return "%s:%s" % (urlquote(self.sname), self.uname)
+        return "%s:%s" % (_quote_name(self.sname), self.uname)
 
     @property
     def instancename(self):
@@ -429,6 +1281,15 @@ class Table (object):
     def entities(self, *attributes, **renamed_attributes):
         return self.path._entities(attributes, renamed_attributes)
 
+    def aggregates(self, **renamed_aggregates):
+        return self.path._aggregates(renamed_aggregates)
+
+    def prepare(self, *attributes, **renamed_attributes):
+        return self.path._prepare(attributes, renamed_attributes)
+
+    def groupby(self, *keys, **renamed_keys):
+        return self.path.groupby(*keys, **renamed_keys)
+
     def insert(self, entities, defaults=None, add_system_defaults=True):
         """Inserts entities into the table.
         :param entities: an iterable collection of entities (i.e., rows) to be inserted into the table.
@@ -449,7 +1310,7 @@ class Table (object):
         entities = entities if isinstance(entities, (list, tuple)) else list(entities)
         try:
             resp = self.catalog.post(path, json=entities, headers={'Content-Type': 'application/json'})
-            return EntitySet(self.path.uri, lambda ignore: resp.json())
+            return EntitySet(self.path.uri, lambda ignore: response_json(resp))
         except HTTPError as e:
             logger.error(e.response.text)
             if 400 <= e.response.status_code < 500:
@@ -491,7 +1352,7 @@ class Table (object):
 
         try:
             resp = self.catalog.put(path, json=entities, headers={'Content-Type': 'application/json'})
-            return EntitySet(self.path.uri, lambda ignore: resp.json())
+            return EntitySet(self.path.uri, lambda ignore: response_json(resp))
         except HTTPError as e:
             logger.error(e.response.text)
             if 400 <= e.response.status_code < 500:
@@ -503,6 +1364,8 @@ class Table (object):
 class TableAlias (Table):
     """Represents a table alias.
     """
+    __slots__ = ('_base_table', '_parent')
+
     def __init__(self, base_table, alias_name):
         """Initializes the table alias.
         :param base_table: the base table to be given an alias name
@@ -514,10 +1377,15 @@ class TableAlias (Table):
         self.name = alias_name
         self._parent = None
 
+    @property
+    def _base(self):
+        """The base table of this table instance."""
+        return self._base_table._base
+
     @property
     def uname(self):
         """the url encoded name"""
-        return urlquote(self.name)
+        return _quote_name(self.name)
 
     @property
     def fqname(self):
@@ -565,10 +1433,21 @@ class TableAlias (Table):
     def entities(self, *attributes, **renamed_attributes):
         return self.path._entities(attributes, renamed_attributes, self)
 
+    def aggregates(self, **renamed_aggregates):
+        return self.path._aggregates(renamed_aggregates, self)
+
+    def prepare(self, *attributes, **renamed_attributes):
+        return self.path._prepare(attributes, renamed_attributes, self)
+
+    def groupby(self, *keys, **renamed_keys):
+        return GroupBy(self.path, keys, renamed_keys, self)
+
 
 class Column (object):
     """Represents a column in a table.
     """
+    __slots__ = ('_table', 'sname', 'tname', 'name', 'type', 'comment')
+
     def __init__(self, sname, tname, column_doc, **kwargs):
         """Creates a Column object.
         :param sname: schema name
@@ -593,7 +1472,7 @@ class Column (object):
     @property
     def uname(self):
         """the url encoded name"""
-        return urlquote(self.name)
+        return _quote_name(self.name)
 
     @property
     def fqname(self):
@@ -641,6 +1520,16 @@ class Column (object):
         assert isinstance(other, str), "This comparison only supports string literals."
         return FilterPredicate(self, "::ts::", other)
 
+    def in_(self, values, max_url_length=DEFAULT_MAX_URL_LENGTH):
+        """Returns a predicate testing whether the column equals any of the values.
+        If the URL of an entity set filtered by the predicate would be longer than max_url_length, the values are
+        split into chunks that fit, which are fetched by concurrent requests, and the results are merged without
+        duplicates. A negated predicate is never split.
+        :param values: an iterable of literal values, where None tests for null.
+        :param max_url_length: maximum length of the URL of each request.
+        """
+        return InPredicate(self, values, max_url_length)
+
 
 class PathOperator (object):
     def __init__(self, r):
@@ -648,9 +1537,16 @@ class PathOperator (object):
         if isinstance(r, Project):
             raise Exception("Cannot extend a path after an attribute projection")
         self._r = r
+        self._compiled = None
 
     @property
     def _path(self):
+        # operators are immutable, so each one compiles its path only once
+        if self._compiled is None:
+            self._compiled = self._compile()
+        return self._compiled
+
+    def _compile(self):
         assert isinstance(self._r, PathOperator)
         return self._r._path
 
@@ -669,8 +1565,7 @@ class Root (PathOperator):
         assert isinstance(r, Table)
         self._table = r
 
-    @property
-    def _path(self):
+    def _compile(self):
         return self._table.fromname
 
     @property
@@ -686,8 +1581,7 @@ class ResetContext (PathOperator):
         assert isinstance(alias, TableAlias)
         self._alias = alias
 
-    @property
-    def _path(self):
+    def _compile(self):
         assert isinstance(self._r, PathOperator)
         return "%s/$%s" % (self._r._path, self._alias.uname)
 
@@ -698,8 +1592,7 @@ class Filter(PathOperator):
         assert isinstance(formula, Predicate)
         self._formula = formula
 
-    @property
-    def _path(self):
+    def _compile(self):
         assert isinstance(self._r, PathOperator)
         return "%s/%s" % (self._r._path, str(self._formula))
 
@@ -708,26 +1601,31 @@ class Project (PathOperator):
     def __init__(self, r, attributes, renamed_attributes):
         super(Project, self).__init__(r)
         assert len(attributes) > 0 or len(renamed_attributes) > 0
-        self._attrs = []
+        self._attrs = self._projection_list(attributes, renamed_attributes)
+
+    @staticmethod
+    def _projection_list(attributes, renamed_attributes):
+        attrs = []
 
         # Build up the list of project attributes
         for attr in attributes:
             if isinstance(attr, Table):
                 iname = attr.instancename
                 if len(iname) > 0:
-                    self._attrs.append(iname + ':*')
+                    attrs.append(iname + ':*')
                 else:
-                    self._attrs.append('*')
+                    attrs.append('*')
             else:
-                self._attrs.append(attr.instancename)
+                attrs.append(attr.instancename)
 
         # Extend the list with renamed attributes (i.e., "out alias" named)
         for new_name in renamed_attributes:
             attr = renamed_attributes[new_name]
-            self._attrs.append("%s:=%s" % (new_name, attr.instancename))
+            attrs.append("%s:=%s" % (new_name, attr.instancename))
 
-    @property
-    def _path(self):
+        return attrs
+
+    def _compile(self):
         assert isinstance(self._r, PathOperator)
         return "%s/%s" % (self._r._path, ','.join(attr for attr in self._attrs))
 
@@ -736,6 +1634,29 @@ class Project (PathOperator):
         return 'attribute'
 
 
+class AggregateProject (Project):
+    @property
+    def _mode(self):
+        return 'aggregate'
+
+
+class GroupProject (Project):
+    def __init__(self, r, keys, renamed_keys, attributes, renamed_attributes):
+        PathOperator.__init__(self, r)
+        assert len(keys) > 0 or len(renamed_keys) > 0
+        self._keys = self._projection_list(keys, renamed_keys)
+        self._attrs = self._projection_list(attributes, renamed_attributes)
+
+    def _compile(self):
+        assert isinstance(self._r, PathOperator)
+        path = "%s/%s" % (self._r._path, ','.join(self._keys))
+        return "%s;%s" % (path, ','.join(self._attrs)) if self._attrs else path
+
+    @property
+    def _mode(self):
+        return 'attributegroup'
+
+
 class Link (PathOperator):
     def __init__(self, r, on, as_=None, join_type=''):
         super(Link, self).__init__(r)
@@ -746,17 +1667,39 @@ class Link (PathOperator):
         self._as = as_
         self._join_type = join_type
 
-    @property
-    def _path(self):
+    def _compile(self):
         assert isinstance(self._r, PathOperator)
         assign = '' if self._as is None else "%s:=" % self._as.uname
         cond = self._on.fqname if isinstance(self._on, Table) else str(self._on)
         return "%s/%s%s%s" % (self._r._path, assign, self._join_type, cond)
 
 
+class Parameter (object):
+    """A named placeholder for a literal value in a filter of a prepared path, e.g., `table.RID == Parameter('rid')`.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        """Creates the parameter.
+        :param name: the parameter name, which must be a valid python identifier.
+        """
+        if not _isidentifier(name):
+            raise DataPathException("Parameter name '%s' is not a valid identifier." % name)
+        self.name = name
+
+    def __str__(self):
+        return "{%s}" % self.name
+
+
 class Predicate (object):
     def __init__(self):
-        pass
+        self._compiled = None
+
+    def __str__(self):
+        # predicates are immutable, so each one is compiled only once
+        if self._compiled is None:
+            self._compiled = self._compile()
+        return self._compiled
 
     def __and__(self, other):
         return JunctionPredicate(self, "&", other)
@@ -774,21 +1717,70 @@ class FilterPredicate (Predicate):
         assert isinstance(lop, Column)
         assert isinstance(rop, Column) or isinstance(rop, int) or \
             isinstance(rop, float) or isinstance(rop, str) or \
-            isinstance(rop, date)
+            isinstance(rop, date) or isinstance(rop, Parameter)
         assert isinstance(op, str)
         self._lop = lop
         self._op = op
         self._rop = rop
 
-    def __str__(self):
+    def _compile(self):
         if isinstance(self._rop, Column):
             # The only valid circumstance for a Column rop is in a link 'on' predicate
             # TODO: ultimately, this should be a Column Set equality comparison
             return "(%s)=(%s)" % (self._lop.instancename, self._rop.fqname)
+        elif isinstance(self._rop, Parameter):
+            return "%s%s%s" % (self._lop.instancename, self._op, self._rop)
         else:
             return "%s%s%s" % (self._lop.instancename, self._op, urlquote(str(self._rop)))
 
 
+class InPredicate (Predicate):
+    def __init__(self, lop, values, max_url_length=DEFAULT_MAX_URL_LENGTH):
+        """Initializes the predicate.
+        :param lop: a Column, or a tuple of Columns of a composite key whose values are then tuples.
+        :param values: an iterable of values.
+        :param max_url_length: maximum length of the URL of each request.
+        """
+        super(InPredicate, self).__init__()
+        assert isinstance(lop, Column) or all(isinstance(column, Column) for column in lop)
+        self._lop = lop
+        self._values = list(OrderedDict.fromkeys(values))  # distinct values in their original order
+        if not self._values:
+            raise DataPathException("At least one value is required for an in-list.")
+        self.max_url_length = max_url_length
+
+    @staticmethod
+    def _term(column, value):
+        iname = column.instancename
+        return "%s::null::" % iname if value is None else "%s=%s" % (iname, urlquote(str(value)))
+
+    def _terms(self):
+        if isinstance(self._lop, Column):
+            return [self._term(self._lop, value) for value in self._values]
+        return ["(%s)" % '&'.join(self._term(column, v) for column, v in zip(self._lop, value))
+                for value in self._values]
+
+    def _compile(self):
+        return ';'.join(self._terms())
+
+    def chunks(self, max_length):
+        """Returns InPredicates of disjoint chunks of the values, each compiled to at most max_length characters.
+        """
+        chunks = []
+        chunk, length = [], -1
+        for value, term in zip(self._values, self._terms()):
+            if len(term) > max_length:
+                raise DataPathException("The URL would exceed %d characters even for one value of the in-list."
+                                        % self.max_url_length)
+            if length + 1 + len(term) > max_length:
+                chunks.append(chunk)
+                chunk, length = [], -1
+            chunk.append(value)
+            length += 1 + len(term)
+        chunks.append(chunk)
+        return [InPredicate(self._lop, chunk, self.max_url_length) for chunk in chunks]
+
+
 class JunctionPredicate (Predicate):
     def __init__(self, left, op, right):
         super(JunctionPredicate, self).__init__()
@@ -799,7 +1791,7 @@ class JunctionPredicate (Predicate):
         self._op = op
         self._right = right
 
-    def __str__(self):
+    def _compile(self):
         return "(%s)%s(%s)" % (self._left, self._op, self._right)
 
 
@@ -809,5 +1801,88 @@ class NegationPredicate (Predicate):
         assert isinstance(child, Predicate)
         self._child = child
 
-    def __str__(self):
+    def _compile(self):
         return "!(%s)" % self._child
+
+
+class AggregateFunction (object):
+    """An aggregate function of the values of a column, computed by the catalog over a set of entities.
+    """
+    _fn = None
+
+    def __init__(self, arg):
+        """Initializes the aggregate function.
+        :param arg: a Column, or a Table for functions over whole entities such as Cnt(table).
+        """
+        assert isinstance(arg, (Column, Table))
+        self._arg = arg
+
+    @property
+    def instancename(self):
+        arg = self._arg
+        if isinstance(arg, Table):
+            return "%s(*)" % self._fn
+        return "%s(%s)" % (self._fn, arg.instancename)
+
+    @property
+    def type(self):
+        """The column type document of the values of the function, where known."""
+        return self._arg.type if isinstance(self._arg, Column) else {}
+
+    def __str__(self):
+        return self.instancename
+
+
+class Min (AggregateFunction):
+    _fn = 'min'
+
+
+class Max (AggregateFunction):
+    _fn = 'max'
+
+
+class Sum (AggregateFunction):
+    _fn = 'sum'
+
+    @property
+    def type(self):
+        column_type = super(Sum, self).type
+        return {'typename': 'int8'} if _numpy_dtype_name(column_type).startswith('int') else column_type
+
+
+class Avg (AggregateFunction):
+    _fn = 'avg'
+
+    @property
+    def type(self):
+        return {'typename': 'float8'}
+
+
+class Cnt (AggregateFunction):
+    """Number of entities, or of non-null values of a column."""
+    _fn = 'cnt'
+
+    @property
+    def type(self):
+        return {'typename': 'int8'}
+
+
+class CntD (Cnt):
+    """Number of distinct non-null values of a column."""
+    _fn = 'cnt_d'
+
+
+class Array (AggregateFunction):
+    _fn = 'array'
+
+    @property
+    def type(self):
+        return {}
+
+
+class ArrayD (Array):
+    _fn = 'array_d'
+
+
+Count = Cnt
+CountDistinct = CntD
@@ -1,10 +1,25 @@
+import json
+import time
+import zlib
 import inspect
+import hashlib
+import threading
 import requests
-from requests.adapters import HTTPAdapter
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE, DEFAULT_POOLBLOCK
 from requests.packages.urllib3.util.retry import Retry
 from requests.packages.urllib3.exceptions import MaxRetryError
 from multiprocessing import Queue
-from . import ConcurrentUpdate, NotModified, DEFAULT_HEADERS, DEFAULT_SESSION_CONFIG
+from . import ConcurrentUpdate, NotModified, DEFAULT_HEADERS, DEFAULT_SESSION_CONFIG, DEFAULT_CACHE_SIZE, \
+    DEFAULT_MAX_WORKERS, urlsplit
+from .json_codec import json_dumps_bytes
+from .response_cache import ResponseCache, MemoryResponseCache
+from .request_metrics import RequestMetrics
+from .concurrency_governor import ConcurrencyGovernor, parse_retry_after
+from .request_hedging import HedgingPolicy
+from .utils.concurrent_utils import map_concurrently
+from .utils.json_utils import iter_json_array, iter_json_lines
+
+DEFAULT_ROW_CHUNK_SIZE = 64 * 1024
 
 
 class DerivaPathError (ValueError):
@@ -31,8 +46,123 @@ def _response_raise_for_status(self):
         )
 
 
+def _gzip_body(body):
+    """Returns body bytes compressed in the gzip format."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+_http_adapters = dict()
+_http_adapters_lock = threading.Lock()
+
+
+def _get_http_adapter(server_uri, session_config):
+    """Returns an HTTPAdapter for server_uri configured by session_config.
+
+    The adapter owns the pool of persistent connections to the server. Unless session_config sets 'pool_shared'
+    to false, one adapter is shared by every binding to the same server with the same session configuration, so
+    that catalogs, snapshots and stores on one server reuse a single warmed connection pool while keeping their
+    own sessions and cookies.
+
+    The pool is sized by the 'pool_connections', 'pool_maxsize' and 'pool_block' settings, which take the
+    meaning of the same-named HTTPAdapter arguments.
+    """
+    shared = session_config.get('pool_shared', True)
+    key = (server_uri, json.dumps(session_config, sort_keys=True))
+    if shared:
+        with _http_adapters_lock:
+            adapter = _http_adapters.get(key)
+            if adapter is not None:
+                return adapter
+
+    # getargspec was removed in Python 3.11
+    getargspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
+    inspect_retry = getargspec(Retry.__init__)
+    if "raise_on_status" in inspect_retry.args:
+        retries = Retry(connect=session_config['retry_connect'],
+                        read=session_config['retry_read'],
+                        backoff_factor=session_config['retry_backoff_factor'],
+                        status_forcelist=session_config['retry_status_forcelist'],
+                        raise_on_status=True)
+    else:
+        # this is in case installed urllib3 is < 1.15 and raise_on_status is unavailable
+        retries = Retry(connect=session_config['retry_connect'],
+                        read=session_config['retry_read'],
+                        backoff_factor=session_config['retry_backoff_factor'],
+                        status_forcelist=session_config['retry_status_forcelist'])
+
+    adapter = HTTPAdapter(pool_connections=session_config.get('pool_connections', DEFAULT_POOLSIZE),
+                          pool_maxsize=session_config.get('pool_maxsize', DEFAULT_POOLSIZE),
+                          pool_block=session_config.get('pool_block', DEFAULT_POOLBLOCK),
+                          max_retries=retries)
+    if shared:
+        with _http_adapters_lock:
+            adapter = _http_adapters.setdefault(key, adapter)
+    return adapter
+
+
+_governors = dict()
+_governors_lock = threading.Lock()
+
+
+def _get_governor(server_uri, session_config):
+    """Returns the ConcurrencyGovernor for server_uri configured by session_config, or None.
+
+    Adaptive concurrency is enabled by the 'adaptive_concurrency' setting, which is either true or a dictionary of
+    ConcurrencyGovernor keyword arguments. One governor is shared by every binding to the same server with the same
+    settings, so that all requests of a process to that server are governed together.
+    """
+    settings = session_config.get('adaptive_concurrency')
+    if not settings:
+        return None
+    kwargs = settings if isinstance(settings, dict) else {}
+    key = (server_uri, json.dumps(kwargs, sort_keys=True))
+    with _governors_lock:
+        governor = _governors.get(key)
+        if governor is None:
+            governor = _governors[key] = ConcurrencyGovernor(name=server_uri, **kwargs)
+        return governor
+
+
+def _throttle_status(response, governor):
+    """Returns the status of response, or of a throttling response retried on the way to it."""
+    history = getattr(getattr(getattr(response, 'raw', None), 'retries', None), 'history', None)
+    for attempt in history or ():
+        if attempt.status in governor.throttle_status:
+            return attempt.status
+    return response.status_code
+
+
+_CREDENTIALS_CHANGING = object()
+"""Credential identity of a binding while its credentials are being changed"""
+
+
+class _Flight (object):
+    """State of one in-flight request shared by concurrent callers."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
 class DerivaBinding (object):
-    """This is a base-class for implementation purposes. Not useful for clients."""
+    """This is a base-class for implementation purposes. Not useful for clients.
+
+       Bindings may be shared by multiple threads, e.g. the workers of
+       a ThreadPoolExecutor. The request methods head(), get(), put(),
+       post() and delete(), the response cache, and set_credentials()
+       are safe to call concurrently. Credential changes are applied
+       atomically, but requests already in flight complete with the
+       credentials that were current when they were sent, and their
+       responses are then not stored in the response cache. Identical
+       GET requests issued concurrently are coalesced into one.
+
+       Methods that stream content to local files are safe to call
+       concurrently as long as each call uses a distinct file.
+    """
+
+    # content types of request bodies which the service decodes from the gzip content encoding
+    _compressed_content_types = frozenset()
 
     def __init__(self, scheme, server, credentials=None, caching=True, session_config=None):
         """Create HTTP(S) server binding.
@@ -41,7 +171,30 @@ class DerivaBinding (object):
              scheme: 'http' or 'https'
              server: server FQDN string
              credentials: credential secrets, e.g. cookie
-             caching: whether to retain a GET response cache
+             caching: whether to retain a GET response cache, or
+               a ResponseCache instance to use as the cache
+             session_config: retry, connection pool, compression and
+               adaptive concurrency and hedging settings (default:
+               DEFAULT_SESSION_CONFIG)
+
+           With caching=True, a MemoryResponseCache bounded to
+           DEFAULT_CACHE_SIZE bytes is used.
+
+           Responses are requested with gzip or deflate content
+           encoding and are transparently decompressed, including when
+           streamed. If session_config sets 'compress_request_threshold'
+           to a number of bytes, POST and PUT bodies at least that large
+           are sent with gzip content encoding by the bindings whose
+           services decode them, i.e. JSON and CSV bodies sent to an
+           ERMrest catalog, but never objects sent to a Hatrac store.
+
+           If session_config enables 'adaptive_concurrency', requests to
+           the server are limited by a ConcurrencyGovernor shared with
+           the other bindings to the same server. If session_config
+           enables 'hedging', with true or a dictionary of
+           HedgingPolicy arguments, GET and HEAD requests that are
+           slower than usual are sent a second time and the first
+           response is used.
 
         """
         self._base_server_uri = "%s://%s" % (
@@ -53,41 +206,165 @@ class DerivaBinding (object):
         if not session_config:
             session_config = DEFAULT_SESSION_CONFIG
         self._get_new_session(session_config)
-
+        self._retry_backoff_factor = session_config.get('retry_backoff_factor', 0)
+        self._governor = _get_governor(self._server_uri, session_config)
+        hedging = session_config.get('hedging')
+        self._hedging = HedgingPolicy(**(hedging if isinstance(hedging, dict) else {})) if hedging else None
+        self._compress_threshold = session_config.get('compress_request_threshold')
+
+        # requests sent by set_credentials() are recorded in the metrics, so they must exist first
+        self._metrics = RequestMetrics()
+        if self._governor is not None:
+            self._metrics.add_governor(self._governor)
+
+        # the number of credential changes and the identity of the current credentials, replaced together
+        self._credentials_state = (0, None)
+        self._credentials_lock = threading.Lock()
+        self._in_flight = dict()
+        self._in_flight_lock = threading.Lock()
         self.set_credentials(credentials, server)
 
         self._caching = caching
-        self._cache = {}
+        self._cache = self._make_cache(caching)
 
         self._response_raise_for_status = _response_raise_for_status
 
     def get_server_uri(self):
         return self._server_uri
 
+    @property
+    def metrics(self):
+        """The RequestMetrics collector recording the requests of this binding.
+
+           Assign a common RequestMetrics instance to several bindings
+           to aggregate their metrics.
+        """
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, value):
+        assert isinstance(value, RequestMetrics)
+        self._metrics = value
+        if self._governor is not None:
+            self._metrics.add_governor(self._governor)
+
+    @property
+    def governor(self):
+        """The ConcurrencyGovernor limiting the concurrent requests of this binding, or None.
+
+           A governor is configured by the 'adaptive_concurrency'
+           session setting, and may also be assigned directly.
+        """
+        return self._governor
+
+    @governor.setter
+    def governor(self, value):
+        assert value is None or isinstance(value, ConcurrencyGovernor)
+        self._governor = value
+        if value is not None:
+            self._metrics.add_governor(value)
+
+    @property
+    def hedging(self):
+        """The HedgingPolicy applied to GET and HEAD requests of this binding, or None.
+
+           A policy is configured by the 'hedging' session setting, and
+           may also be assigned directly.
+        """
+        return self._hedging
+
+    @hedging.setter
+    def hedging(self, value):
+        assert value is None or isinstance(value, HedgingPolicy)
+        self._hedging = value
+
+    def stats(self):
+        """Return a snapshot of the request metrics, response cache and hedging counters of this binding."""
+        snapshot = self._metrics.snapshot()
+        snapshot['cache'] = self._cache.stats() if self._cache is not None else None
+        snapshot['hedging'] = self._hedging.stats() if self._hedging is not None else None
+        return snapshot
+
+    def _send(self, method, url, stream=False, started=None, **kwargs):
+        """Send a request through the session, recording it in the request metrics.
+
+           If the binding has a concurrency governor, the request
+           waits for its turn and its outcome adapts the governor. The
+           optional started function is called when the request is sent.
+        """
+        path = urlsplit(url).path
+        governor = self._governor
+        if governor is not None:
+            governor.acquire()
+        start = time.time()
+        if started is not None:
+            started()
+        try:
+            r = self._session.request(method, url, stream=stream, **kwargs)
+        except Exception:
+            elapsed = time.time() - start
+            self._metrics.record(method, path, elapsed, error=True)
+            if governor is not None:
+                governor.release(elapsed, error=True)
+            raise
+        elapsed = time.time() - start
+        self._metrics.record(method, path, elapsed, r, stream=stream)
+        if governor is not None:
+            governor.release(elapsed, _throttle_status(r, governor),
+                             retry_after=parse_retry_after(r.headers.get('Retry-After')))
+        return r
+
+    def _send_idempotent(self, method, url, headers):
+        """Send an idempotent request, hedged according to the hedging policy of the binding, if any."""
+        hedging = self._hedging
+        if hedging is None:
+            return self._send(method, url, headers=headers)
+        delay = hedging.delay(self._metrics, method, urlsplit(url).path)
+        return hedging.send(lambda started: self._send(method, url, headers=headers, started=started), delay)
+
+    @staticmethod
+    def _make_cache(caching):
+        """Return the response cache selected by the caching argument or None."""
+        if isinstance(caching, ResponseCache):
+            return caching
+        elif caching:
+            return MemoryResponseCache(DEFAULT_CACHE_SIZE)
+        return None
+
+    def get_cached_response(self, path):
+        """Return the cached response for path or None if it is not cached."""
+        key = self._cache_key(self._server_uri + path)
+        if self._cache is None or key is None:
+            return None
+        return self._cache.get(key)
+
+    def _cache_key(self, url, credentials_state=None):
+        """Return the response cache key for url under the current or given credentials state.
+
+           Cache entries are partitioned by credential identity so that
+           a cache shared by several bindings, or persisted on disk, never
+           serves content retrieved under one client's credentials to
+           another. While the credentials are being changed there is no
+           key, and the cache is not used.
+        """
+        generation, identity = credentials_state or self._credentials_state
+        if identity is _CREDENTIALS_CHANGING:
+            return None
+        if identity is None:
+            return url
+        return "%s %s" % (identity, url)
+
     def _get_new_session(self, session_config):
         self._session = requests.session()
-        inspect_retry = inspect.getargspec(Retry.__init__)
-        if "raise_on_status" in inspect_retry.args:
-            retries = Retry(connect=session_config['retry_connect'],
-                            read=session_config['retry_read'],
-                            backoff_factor=session_config['retry_backoff_factor'],
-                            status_forcelist=session_config['retry_status_forcelist'],
-                            raise_on_status=True)
-        else:
-            # this is in case installed urllib3 is < 1.15 and raise_on_status is unavailable
-            retries = Retry(connect=session_config['retry_connect'],
-                            read=session_config['retry_read'],
-                            backoff_factor=session_config['retry_backoff_factor'],
-                            status_forcelist=session_config['retry_status_forcelist'])
+        self._session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self._session.mount(self._server_uri + '/', _get_http_adapter(self._server_uri, session_config))
 
-        self._session.mount(self._server_uri + '/',
-                            HTTPAdapter(max_retries=retries))
-
-    def _pre_get(self, path, headers):
+    def _pre_get(self, path, headers, credentials_state=None):
         self.check_path(path)
         url = self._server_uri + path
         headers = headers.copy()
-        prev_response = self._cache.get(url)
+        key = self._cache_key(url, credentials_state)
+        prev_response = self._cache.get(key) if self._cache is not None and key is not None else None
         if prev_response and 'etag' in prev_response.headers \
            and not ('if-none-match' in headers or 'if-match' in headers):
             headers['if-none-match'] = prev_response.headers['etag']
@@ -103,6 +380,36 @@ class DerivaBinding (object):
             headers['If-Match'] = guard_response.headers['etag']
         return url, headers
 
+    def _post_mutate(self, path):
+        """Called once a mutation request to path returned or failed, e.g. to discard state derived from it."""
+        pass
+
+    def _encode_body(self, data, json_body, headers):
+        """Returns (data, json, headers) for a request body, gzip-compressed if large enough.
+
+           A JSON body is serialized with the selected JSON codec.
+           Compression applies only when the 'compress_request_threshold'
+           session setting is enabled, the body is a bytes buffer rather
+           than a file-like or form value, its content type is one of
+           the _compressed_content_types of the binding, and the caller
+           did not set a content encoding.
+        """
+        if json_body is not None:
+            data = json_dumps_bytes(json_body)
+            if not any(k.lower() == 'content-type' for k in headers):
+                headers = headers.copy()
+                headers['Content-Type'] = 'application/json'
+        if self._compress_threshold is None or any(k.lower() == 'content-encoding' for k in headers):
+            return data, None, headers
+        if not isinstance(data, bytes) or len(data) < self._compress_threshold:
+            return data, None, headers
+        content_type = next((v for k, v in headers.items() if k.lower() == 'content-type'), '')
+        if content_type.split(';')[0].strip().lower() not in self._compressed_content_types:
+            return data, None, headers
+        headers = headers.copy()
+        headers['Content-Encoding'] = 'gzip'
+        return _gzip_body(data), None, headers
+
     @staticmethod
     def check_path(path):
         if not path:
@@ -133,19 +440,33 @@ class DerivaBinding (object):
 
     def set_credentials(self, credentials, server):
         assert self._session is not None
-        if credentials and ('cookie' in credentials):
-            cname, cval = credentials['cookie'].split('=', 1)
-            self._session.cookies.set(cname, cval, domain=server, path='/')
-        elif credentials and ('username' in credentials and 'password' in credentials):
-            self.post_authn_session(credentials)
+        with self._credentials_lock:
+            generation, identity = self._credentials_state
+            # requests sent meanwhile may use either credentials, so they neither use nor update the response cache
+            self._credentials_state = (generation + 1, _CREDENTIALS_CHANGING)
+            try:
+                if credentials and ('cookie' in credentials):
+                    cname, cval = credentials['cookie'].split('=', 1)
+                    self._session.cookies.set(cname, cval, domain=server, path='/')
+                    identity = self._credential_identity(server, credentials['cookie'])
+                elif credentials and ('username' in credentials and 'password' in credentials):
+                    self.post_authn_session(credentials)
+                    identity = self._credential_identity(server, credentials['username'])
+            finally:
+                self._credentials_state = (generation + 2, identity)
+
+    @staticmethod
+    def _credential_identity(server, secret):
+        """Return an opaque digest identifying the credential secret used with server."""
+        return hashlib.sha256(("%s %s" % (server, secret)).encode('utf-8')).hexdigest()
 
     def get_authn_session(self):
-        r = self._session.get(self._base_server_uri + "/authn/session")
+        r = self._send('GET', self._base_server_uri + "/authn/session")
         _response_raise_for_status(r)
         return r
 
     def post_authn_session(self, credentials):
-        r = self._session.post(self._base_server_uri + "/authn/session", data=credentials)
+        r = self._send('POST', self._base_server_uri + "/authn/session", data=credentials)
         _response_raise_for_status(r)
         return r
 
@@ -167,7 +488,7 @@ class DerivaBinding (object):
         """
         url, headers, prev_response = self._pre_get(path, headers)
         return self._raise_for_status_304(
-            self._session.head(url, headers=headers),
+            self._send_idempotent('HEAD', url, headers),
             prev_response,
             raise_not_modified
         )
@@ -190,18 +511,155 @@ class DerivaBinding (object):
 
            Caching of new results is disabled when stream=True.
 
+           Concurrent identical requests from several threads are
+           coalesced unless stream=True: only the first one is sent,
+           and the others wait for and share its response object or
+           raised error.
+
         """
         if headers is None:
             headers = {}
+        credentials_state = self._credentials_state
+        url, headers, prev_response = self._pre_get(path, headers, credentials_state)
+        cache_key = self._cache_key(url, credentials_state)
+
+        def fetch():
+            r = self._raise_for_status_304(
+                self._send('GET', url, headers=headers, stream=True) if stream
+                else self._send_idempotent('GET', url, headers),
+                prev_response,
+                raise_not_modified
+            )
+            # unless the credentials changed while the request was in flight, so it may have been sent with others
+            if self._cache is not None and not stream and cache_key is not None \
+                    and self._credentials_state == credentials_state:
+                self._cache.put(cache_key, r)
+            return r
+
+        if stream:
+            return fetch()
+        key = (credentials_state, url, tuple(sorted(headers.items())), bool(raise_not_modified))
+        return self._single_flight(key, fetch)
+
+    def _single_flight(self, key, fn):
+        """Return fn(), sharing its result or error with concurrent callers using the same key."""
+        with self._in_flight_lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    def get_rows(self, path, headers=DEFAULT_HEADERS, json_stream=False, chunk_size=DEFAULT_ROW_CHUNK_SIZE):
+        """Perform GET request, returning a generator of the rows of a JSON array result as they arrive.
+
+           Arguments:
+             path: the path within this bound server
+             headers: headers to set in request
+             json_stream: request the line-delimited
+               'application/x-json-stream' format rather than a
+               JSON array.
+             chunk_size: number of bytes to read at a time
+
+           The request is sent, and an error status raised, by this
+           call rather than by the first iteration of the generator.
+           The response is parsed incrementally, so arbitrarily large
+           results may be consumed in constant memory. Either response
+           format is parsed according to its Content-Type. A cached
+           response is used and revalidated as with get(), but new
+           results are not cached. The response is closed when the
+           generator is exhausted or closed.
+
+        """
+        if headers is None:
+            headers = {}
+        if not any(k.lower() == 'accept' for k in headers):
+            headers = dict(headers)
+            headers['Accept'] = 'application/x-json-stream' if json_stream else 'application/json'
         url, headers, prev_response = self._pre_get(path, headers)
         r = self._raise_for_status_304(
-            self._session.get(url, headers=headers),
+            self._send('GET', url, headers=headers, stream=True),
             prev_response,
-            raise_not_modified
+            False
         )
-        if self._caching and not stream:
-            self._cache[url] = r
-        return r
+        if r.headers.get('content-type', '').split(';')[0].strip() == 'application/x-json-stream':
+            parse = iter_json_lines
+        else:
+            parse = iter_json_array
+
+        def rows():
+            try:
+                for row in parse(r.iter_content(chunk_size=chunk_size)):
+                    yield row
+            finally:
+                r.close()
+
+        return rows()
+
+    def _map(self, method, paths, max_workers, ordered, retries, return_exceptions):
+        def call(path):
+            attempt = 0
+            while True:
+                try:
+                    return method(path)
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.RetryError):
+                    if attempt >= retries:
+                        raise
+                except requests.HTTPError as e:
+                    if e.response is None or e.response.status_code < 500 or attempt >= retries:
+                        raise
+                attempt += 1
+                time.sleep(self._retry_backoff_factor * (2 ** (attempt - 1)))
+
+        return map_concurrently(call, paths, max_workers, ordered, return_exceptions)
+
+    def map_head(self, paths, headers=DEFAULT_HEADERS, max_workers=DEFAULT_MAX_WORKERS, ordered=True, retries=0,
+                 return_exceptions=False):
+        """Perform HEAD requests for many paths concurrently, yielding (path, response) tuples.
+
+           Arguments:
+             paths: an iterable of paths within this bound server
+             headers: headers to set in each request
+             max_workers: maximum number of requests in flight
+             ordered: yield results in input order when true, or
+               in completion order otherwise.
+             retries: number of times to retry a request that fails
+               with a connection error or a 5xx status.
+             return_exceptions: yield a failed request's exception
+               in place of its response when true, otherwise raise it.
+
+           Each request behaves like head(), so the response cache
+           is consulted as usual. The paths iterable is consumed
+           lazily.
+
+        """
+        return self._map(lambda path: self.head(path, headers), paths, max_workers, ordered, retries,
+                         return_exceptions)
+
+    def map_get(self, paths, headers=DEFAULT_HEADERS, max_workers=DEFAULT_MAX_WORKERS, ordered=True, retries=0,
+                return_exceptions=False):
+        """Perform GET requests for many paths concurrently, yielding (path, response) tuples.
+
+           Arguments are as for map_head(). Each request behaves like
+           get(), so the response cache is consulted and updated.
+
+        """
+        return self._map(lambda path: self.get(path, headers), paths, max_workers, ordered, retries,
+                         return_exceptions)
 
     def post(self, path, data=None, json=None, headers=DEFAULT_HEADERS):
         """Perform POST request, returning response object.
@@ -216,7 +674,11 @@ class DerivaBinding (object):
 
         """
         url, headers = self._pre_mutate(path, headers)
-        r = self._session.post(url, data=data, json=json, headers=headers)
+        data, json, headers = self._encode_body(data, json, headers)
+        try:
+            r = self._send('POST', url, data=data, json=json, headers=headers)
+        finally:
+            self._post_mutate(path)
         return self._raise_for_status_412(r)
 
     def put(self, path, data=None, json=None, headers=DEFAULT_HEADERS, guard_response=None):
@@ -237,7 +699,11 @@ class DerivaBinding (object):
 
         """ 
         url, headers = self._pre_mutate(path, headers, guard_response)
-        r = self._session.put(url, data=data, json=json, headers=headers)
+        data, json, headers = self._encode_body(data, json, headers)
+        try:
+            r = self._send('PUT', url, data=data, json=json, headers=headers)
+        finally:
+            self._post_mutate(path)
         return self._raise_for_status_412(r)
    
     def delete(self, path, headers=DEFAULT_HEADERS, guard_response=None):
@@ -256,6 +722,9 @@ class DerivaBinding (object):
 
         """
         url, headers = self._pre_mutate(path, headers, guard_response)
-        r = self._session.delete(url, headers=headers)
+        try:
+            r = self._send('DELETE', url, headers=headers)
+        finally:
+            self._post_mutate(path)
         return self._raise_for_status_412(r)
 
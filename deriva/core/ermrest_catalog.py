@@ -1,16 +1,58 @@
+import time
 import logging
 import datetime
+import threading
+from collections import OrderedDict
+from requests import HTTPError
 
-from . import urlquote, datapath, DEFAULT_HEADERS, DEFAULT_CHUNK_SIZE, Megabyte, get_transfer_summary
+from . import urlquote, datapath, DEFAULT_HEADERS, DEFAULT_CHUNK_SIZE, DEFAULT_SESSION_CONFIG, Megabyte, \
+    get_transfer_summary
 from .deriva_binding import DerivaBinding
+from .json_codec import response_json
 from .ermrest_config import CatalogConfig
 from . import ermrest_model
 
 
+DEFAULT_SCHEMA_REVALIDATE_INTERVAL = 60
+"""Seconds for which a memoized catalog schema is used before it is revalidated with the server"""
+
+TABLE_SCHEMA_CACHE_SIZE = 256
+"""Maximum number of individually fetched table definitions retained by a catalog binding"""
+
+DEFAULT_RESULT_CACHE_SIZE = 0
+"""Maximum number of datapath entity set results retained by a catalog binding, where 0 disables the cache"""
+
+DEFAULT_SNAPTIME_REVALIDATE_INTERVAL = 5
+"""Seconds for which the latest snaptime of a catalog is used to validate cached results before it is refetched"""
+
+
 class ErmrestCatalogMutationError(Exception):
     pass
 
 
+class _TableSchema (object):
+    """Parsed table definition with its precomputed set of column names."""
+
+    def __init__(self, doc, etag=None):
+        self.doc = doc
+        self.etag = etag
+        self.validated = time.time()
+        self.columns = frozenset(c['name'] for c in doc.get('column_definitions', []))
+
+
+class _CatalogSchema (object):
+    """Parsed catalog schema document indexed by fully qualified table name."""
+
+    def __init__(self, doc, etag):
+        self.doc = doc
+        self.etag = etag
+        self.validated = time.time()
+        self.tables = dict()
+        for sname, schema in doc.get('schemas', {}).items():
+            for tname, table in schema.get('tables', {}).items():
+                self.tables['%s:%s' % (sname, tname)] = _TableSchema(table)
+
+
 class ErmrestCatalog(DerivaBinding):
     """Persistent handle for an ERMrest catalog.
 
@@ -20,7 +62,7 @@ class ErmrestCatalog(DerivaBinding):
 
        Additional utility methods provided for accessing catalog metadata.
     """
-    table_schemas = dict()
+    _compressed_content_types = frozenset(['application/json', 'application/x-json-stream', 'text/csv'])
 
     def __init__(self, scheme, server, catalog_id, credentials=None, caching=True, session_config=None):
         """Create ERMrest catalog binding.
@@ -31,6 +73,30 @@ class ErmrestCatalog(DerivaBinding):
              catalog_id: e.g. '1'
              credentials: credential secrets, e.g. cookie
              caching: whether to retain a GET response cache
+             session_config: see DerivaBinding
+
+           The catalog schema consulted by getTableSchema() and the
+           other table helpers is memoized and revalidated with its
+           ETag when older than the 'schema_revalidate_interval'
+           session setting in seconds (default:
+           DEFAULT_SCHEMA_REVALIDATE_INTERVAL). An interval of None
+           disables revalidation. Changes to the schema made through
+           this binding discard the memoized schema. Definitions of
+           tables missing from the memoized schema are fetched and
+           revalidated individually, retaining at most
+           TABLE_SCHEMA_CACHE_SIZE of them.
+
+           The entity sets fetched by the datapath module are cached if
+           the 'result_cache_size' session setting is positive (default:
+           DEFAULT_RESULT_CACHE_SIZE, i.e. disabled), retaining at most
+           that many results of distinct URLs, least recently used
+           first evicted. Cached results are valid for one snaptime of
+           the catalog and are discarded once the latest snaptime
+           advances, which is refetched when older than the
+           'snaptime_revalidate_interval' session setting in seconds
+           (default: DEFAULT_SNAPTIME_REVALIDATE_INTERVAL), or after
+           a change made through this binding. An interval of None
+           disables refetching the snaptime.
 
         """
         super(ErmrestCatalog, self).__init__(scheme, server, credentials, caching, session_config)
@@ -38,6 +104,20 @@ class ErmrestCatalog(DerivaBinding):
             self._server_uri,
             catalog_id
         )
+        self._schema = None
+        self._table_schemas = OrderedDict()
+        self._schema_lock = threading.Lock()
+        self._schema_revalidate_interval = (session_config or DEFAULT_SESSION_CONFIG).get(
+            'schema_revalidate_interval', DEFAULT_SCHEMA_REVALIDATE_INTERVAL)
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+        self._results_snaptime = None
+        self._results_validated = 0
+        self._results_generation = 0
+        self._result_cache_size = (session_config or DEFAULT_SESSION_CONFIG).get(
+            'result_cache_size', DEFAULT_RESULT_CACHE_SIZE) or 0
+        self._snaptime_revalidate_interval = (session_config or DEFAULT_SESSION_CONFIG).get(
+            'snaptime_revalidate_interval', DEFAULT_SNAPTIME_REVALIDATE_INTERVAL)
         self._scheme, self._server, self._catalog_id, self._credentials, self._caching, self._session_config = \
             scheme, server, catalog_id, credentials, caching, session_config
 
@@ -58,57 +138,176 @@ class ErmrestCatalog(DerivaBinding):
     def applyCatalogConfig(self, config):
         return config.apply(self)
 
-    def getCatalogSchema(self):
+    def getCatalogSchema(self, memoized=False):
+        """Returns the catalog schema document.
+
+           Arguments:
+             memoized: whether to return the memoized schema, which is
+               revalidated as described for the constructor and shared
+               by all callers, so it must not be modified
+
+        """
+        if memoized:
+            return self._get_schema().doc
         path = '/schema'
         r = self.get(path)
         r.raise_for_status()
-        return r.json()
+        return response_json(r)
 
     def getPathBuilder(self):
         """Returns the 'path builder' interface for this catalog."""
         return datapath.from_catalog(self)
 
-    def getTableSchema(self, fq_table_name):
-        # first try to get from cache(s)
+    def _fetch_schema(self, path, cached):
+        """Returns the parsed document at path and its ETag, or None if the cached definition is still current."""
+        interval = self._schema_revalidate_interval
+        if cached is not None and (interval is None or time.time() - cached.validated < interval):
+            return None
+        headers = DEFAULT_HEADERS.copy()
+        if cached is not None and cached.etag:
+            headers['if-none-match'] = cached.etag
+        r = self.get(path, headers)
+        etag = r.headers.get('etag')
+        if cached is not None and (r.status_code == 304 or (etag and etag == cached.etag)):
+            cached.validated = time.time()
+            return None
+        r.raise_for_status()
+        return response_json(r), etag
+
+    def _get_schema(self):
+        """Returns the memoized _CatalogSchema, fetching or revalidating it as needed."""
+        with self._schema_lock:
+            fetched = self._fetch_schema('/schema', self._schema)
+            if fetched is not None:
+                self._schema = _CatalogSchema(*fetched)
+                self._table_schemas.clear()
+            return self._schema
+
+    def _get_table_schema(self, fq_table_name):
+        """Returns the _TableSchema of fq_table_name, given as 'schema:table'."""
         s, t = self.splitQualifiedCatalogName(fq_table_name)
-        cat = self.getCatalogSchema()
-        schema = cat['schemas'][s]['tables'][t] if cat else None
-        if schema:
-            return schema
-        schema = self.table_schemas.get(fq_table_name)
-        if schema:
-            return schema
-
-        path = '/schema/%s/table/%s' % (s, t)
-        r = self.get(path)
-        resp = r.json()
-        self.table_schemas[fq_table_name] = resp
+        table = self._get_schema().tables.get('%s:%s' % (s, t))
+        if table is not None:
+            return table
+
+        # e.g. a table created since the catalog schema was fetched
+        path = '/schema/%s/table/%s' % (urlquote(s), urlquote(t))
+        # the binding URI scopes the key to the server, catalog and snapshot
+        key = self._server_uri + path
+        with self._schema_lock:
+            # a definition which fails to be fetched or revalidated is not retained
+            table = self._table_schemas.pop(key, None)
+            try:
+                fetched = self._fetch_schema(path, table)
+            except HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    raise KeyError(fq_table_name)
+                raise
+            if fetched is not None:
+                table = _TableSchema(*fetched)
+            self._table_schemas[key] = table
+            while len(self._table_schemas) > TABLE_SCHEMA_CACHE_SIZE:
+                self._table_schemas.popitem(last=False)
+            return table
+
+    def clearSchemaCache(self):
+        """Discards the memoized catalog schema, e.g. after the schema was changed by another client."""
+        with self._schema_lock:
+            self._schema = None
+            self._table_schemas.clear()
+
+    def _latest_snaptime(self):
+        """Returns the snaptime of the latest catalog snapshot, discarding the cached results if it has advanced."""
+        interval = self._snaptime_revalidate_interval
+        with self._results_lock:
+            snaptime = self._results_snaptime
+            if snaptime is not None and (interval is None or time.time() - self._results_validated < interval):
+                return snaptime
+            generation = self._results_generation
+        r = self.get('/')
         r.raise_for_status()
+        snaptime = response_json(r)['snaptime']
+        with self._results_lock:
+            if generation != self._results_generation:
+                # the cache was cleared meanwhile, e.g. by a change which this snaptime may precede
+                return snaptime
+            if snaptime != self._results_snaptime:
+                self._results.clear()
+                self._results_snaptime = snaptime
+            self._results_validated = time.time()
+        return snaptime
+
+    def _cached_result(self, path, fetch_fn):
+        """Returns the list of entities fetched by fetch_fn() for path, cached while the catalog snaptime is unchanged.
+
+           The entities are copies, which the caller may modify.
+        """
+        if self._result_cache_size <= 0:
+            return fetch_fn()
+        snaptime = self._latest_snaptime()
+        # the binding URI scopes the key to the server, catalog and snapshot
+        key = (self._server_uri + path, snaptime)
+        with self._results_lock:
+            rows = self._results.pop(key, None)
+            if rows is not None:
+                self._results[key] = rows
+        if rows is None:
+            rows = fetch_fn()
+            with self._results_lock:
+                # unless the catalog changed meanwhile
+                if snaptime == self._results_snaptime:
+                    self._results[key] = rows
+                    while len(self._results) > self._result_cache_size:
+                        self._results.popitem(last=False)
+        return [dict(row) for row in rows]
+
+    def clearResultCache(self):
+        """Discards the cached datapath results, e.g. after the catalog was changed by another client."""
+        with self._results_lock:
+            self._results.clear()
+            self._results_snaptime = None
+            self._results_generation += 1
+
+    def _post_mutate(self, path):
+        # only once the change is applied, so that a concurrent read cannot memoize the state preceding it
+        if path.startswith('/schema'):
+            self.clearSchemaCache()
+        self.clearResultCache()
+        super(ErmrestCatalog, self)._post_mutate(path)
 
-        return resp
+    def getTableSchema(self, fq_table_name):
+        """Returns the table definition of fq_table_name, given as 'schema:table'.
+
+           The definition is shared with the memoized catalog schema
+           and must not be modified by the caller. Raises KeyError if
+           the catalog has no such table.
+        """
+        return self._get_table_schema(fq_table_name).doc
 
     def getTableColumns(self, fq_table_name):
-        columns = set()
-        schema = self.getTableSchema(fq_table_name)
-        for column in schema['column_definitions']:
-            columns.add(column['name'])
+        """Returns the frozenset of column names of fq_table_name, given as 'schema:table'.
 
-        return columns
+           Raises KeyError if the catalog has no such table.
+        """
+        return self._get_table_schema(fq_table_name).columns
 
     def validateRowColumns(self, row, fq_tableName):
+        """Returns the set of keys of row which are not columns of fq_tableName."""
         columns = self.getTableColumns(fq_tableName)
-        return set(row.keys()) - columns
+        return set(row.keys()).difference(columns)
 
     def getDefaultColumns(self, row, table, exclude=None, quote_url=True):
         columns = self.getTableColumns(table)
+        excluded = set()
         if isinstance(exclude, list):
             for col in exclude:
-                columns.remove(col)
+                if col not in columns:
+                    raise KeyError(col)
+                excluded.add(col)
 
         defaults = []
-        supplied_columns = row.keys()
         for col in columns:
-            if col not in supplied_columns:
+            if col not in row and col not in excluded:
                 defaults.append(urlquote(col, safe='') if quote_url else col)
 
         return defaults
@@ -134,7 +333,7 @@ class ErmrestCatalog(DerivaBinding):
         destfile = open(destfilename, 'w+b')
 
         try:
-            r = self._session.get(self._server_uri + path, headers=headers, stream=True)
+            r = self._send('GET', self._server_uri + path, headers=headers, stream=True)
             self._response_raise_for_status(r)
 
             total = 0
@@ -148,6 +347,7 @@ class ErmrestCatalog(DerivaBinding):
                         destfile.close()
                         return None
             elapsed = datetime.datetime.now() - start
+            self._metrics.record_transfer('ermrest_download', total, elapsed.total_seconds())
             summary = get_transfer_summary(total, elapsed)
             logging.info("File [%s] transfer successful. %s" % (destfilename, summary))
             if callback:
@@ -182,12 +382,23 @@ class ErmrestSnapshot(ErmrestCatalog):
             snaptime
         )
         self._snaptime = snaptime
+        # the schema and results of a snapshot never change
+        self._schema_revalidate_interval = None
+        self._results_snaptime = snaptime
 
     @property
     def snaptime(self):
         """The snaptime for this catalog snapshot instance."""
         return self._snaptime
 
+    def _latest_snaptime(self):
+        return self._snaptime
+
+    def clearResultCache(self):
+        """Discards the cached datapath results, which remain valid for the snaptime of the snapshot."""
+        with self._results_lock:
+            self._results.clear()
+
     def _pre_mutate(self, path, headers, guard_response=None):
         """Override and disable mutation operations.
 
@@ -1,5 +1,6 @@
 
 from . import urlquote
+from .json_codec import response_json
 
 
 class AttrDict (dict):
@@ -216,7 +217,7 @@ class CatalogConfig (NodeConfigAcl):
     @classmethod
     def fromcatalog(cls, catalog):
         """Retrieve catalog config as a CatalogConfig management object."""
-        return cls(catalog.get("/schema").json())
+        return cls(response_json(catalog.get("/schema")))
 
     def apply(self, catalog, existing=None):
         if existing is None:
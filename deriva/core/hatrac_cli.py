@@ -1,12 +1,9 @@
 import logging
 import os
 from os.path import basename
-import requests
-from requests.exceptions import HTTPError, ConnectionError
 import sys
 import traceback
-from deriva.core import __version__ as VERSION, BaseCLI, DerivaPathError, HatracStore, HatracHashMismatch, \
-    get_credential, urlquote, format_exception
+from deriva.core import __version__ as VERSION, BaseCLI, get_credential, urlquote, format_exception
 from deriva.core.utils import eprint, mime_utils as mu
 
 
@@ -129,16 +126,18 @@ class DerivaHatracCLI (BaseCLI):
         """
         self.host = args.host if args.host else 'localhost'
         self.resource = urlquote(args.resource, '/')
+        from deriva.core import HatracStore
         self.store = HatracStore('https', args.host, DerivaHatracCLI._get_credential(self.host, args.token))
 
     def list(self, args):
         """Implements the list sub-command.
         """
+        import requests
         try:
             namespaces = self.store.retrieve_namespace(self.resource)
             for name in namespaces:
                 print(name)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException('No such object or namespace', e)
             elif e.response.status_code != requests.codes.conflict:
@@ -150,9 +149,10 @@ class DerivaHatracCLI (BaseCLI):
     def mkdir(self, args):
         """Implements the mkdir sub-command.
         """
+        import requests
         try:
             self.store.create_namespace(self.resource, parents=args.parents)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException("Parent namespace not found (use '--parents' to create parent namespace)", e)
             elif e.response.status_code == requests.codes.conflict:
@@ -163,9 +163,10 @@ class DerivaHatracCLI (BaseCLI):
     def rmdir(self, args):
         """Implements the mkdir sub-command.
         """
+        import requests
         try:
             self.store.delete_namespace(self.resource)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException('No such object or namespace', e)
             elif e.response.status_code == requests.codes.conflict:
@@ -176,6 +177,7 @@ class DerivaHatracCLI (BaseCLI):
     def getacl(self, args):
         """Implements the getacl sub-command.
         """
+        import requests
         if args.role and not args.access:
             raise UsageException("Must use '--access' option with '--role' option")
 
@@ -185,7 +187,7 @@ class DerivaHatracCLI (BaseCLI):
                 print("%s:" % access)
                 for role in acls.get(access, []):
                     print("  %s" % role)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException('No such object or namespace or ACL entry', e)
             elif e.response.status_code == requests.codes.bad_request:
@@ -196,12 +198,13 @@ class DerivaHatracCLI (BaseCLI):
     def setacl(self, args):
         """Implements the setacl sub-command.
         """
+        import requests
         if args.add and len(args.roles) > 1:
             raise UsageException("Option '--add' is only valid for a single role")
 
         try:
             self.store.set_acl(self.resource, args.access, args.roles, args.add)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException('No such object or namespace', e)
             elif e.response.status_code == requests.codes.bad_request:
@@ -212,9 +215,10 @@ class DerivaHatracCLI (BaseCLI):
     def delacl(self, args):
         """Implements the getacl sub-command.
         """
+        import requests
         try:
             self.store.del_acl(self.resource, args.access, args.role)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException('No such object or namespace or ACL entry', e)
             elif e.response.status_code == requests.codes.bad_request:
@@ -225,6 +229,7 @@ class DerivaHatracCLI (BaseCLI):
     def getobj(self, args):
         """Implements the getobj sub-command.
         """
+        import requests
         try:
             if args.outfile and args.outfile == '-':
                 r = self.store.get_obj(self.resource)
@@ -234,7 +239,7 @@ class DerivaHatracCLI (BaseCLI):
             else:
                 outfilename = args.outfile if args.outfile else basename(self.resource)
                 self.store.get_obj(self.resource, destfilename=outfilename)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException('No such object', e)
             else:
@@ -243,12 +248,13 @@ class DerivaHatracCLI (BaseCLI):
     def putobj(self, args):
         """Implements the putobj sub-command.
         """
+        import requests
         try:
             content_type = args.content_type if args.content_type else mu.guess_content_type(args.infile)
             loc = self.store.put_obj(
                 self.resource, args.infile, headers={"Content-Type": content_type}, parents=args.parents)
             print(loc)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException("Parent namespace not found (use '--parents' to create parent namespace)", e)
             elif e.response.status_code == requests.codes.conflict:
@@ -260,9 +266,10 @@ class DerivaHatracCLI (BaseCLI):
     def delobj(self, args):
         """Implements the delobj sub-command.
         """
+        import requests
         try:
             self.store.del_obj(self.resource)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.not_found:
                 raise ResourceException('No such object', e)
             else:
@@ -272,6 +279,9 @@ class DerivaHatracCLI (BaseCLI):
         """Main routine of the CLI.
         """
         args = self.parse_cli()
+        # the HTTP stack is imported only once a sub-command runs, so that the command-line help comes up quickly
+        import requests
+        from deriva.core import DerivaPathError, HatracHashMismatch
 
         def _resource_error_message(emsg):
             return "{prog} {subcmd}: {resource}: {msg}".format(
@@ -287,11 +297,11 @@ class DerivaHatracCLI (BaseCLI):
             return 0
         except UsageException as e:
             eprint("{prog} {subcmd}: {msg}".format(prog=self.parser.prog, subcmd=args.subcmd, msg=e))
-        except ConnectionError as e:
+        except requests.ConnectionError as e:
             eprint("{prog}: Connection error occurred".format(prog=self.parser.prog))
         except DerivaPathError as e:
             eprint(e)
-        except HTTPError as e:
+        except requests.HTTPError as e:
             if e.response.status_code == requests.codes.unauthorized:
                 msg = 'Authentication required'
             elif e.response.status_code == requests.codes.forbidden:
@@ -77,6 +77,9 @@ class HatracStore(DerivaBinding):
         self.check_path(path)
 
         headers = headers.copy()
+        if not any(k.lower() == 'accept-encoding' for k in headers):
+            # retrieve the stored object bytes so that they match the object checksums
+            headers['Accept-Encoding'] = 'identity'
 
         if destfilename is not None:
             destfile = open(destfilename, 'w+b')
@@ -86,7 +89,7 @@ class HatracStore(DerivaBinding):
             stream = False
 
         try:
-            r = self._session.get(self._server_uri + path, headers=headers, stream=stream)
+            r = self._send('GET', self._server_uri + path, headers=headers, stream=stream)
             self._response_raise_for_status(r)
 
             if destfilename is not None:
@@ -103,6 +106,7 @@ class HatracStore(DerivaBinding):
                             return None
                 destfile.flush()
                 elapsed = datetime.datetime.now() - start
+                self._metrics.record_transfer('hatrac_download', total, elapsed.total_seconds())
                 summary = get_transfer_summary(total, elapsed)
                 logging.info("File [%s] transfer successful. %s" % (destfilename, summary))
                 if callback:
@@ -177,7 +181,7 @@ class HatracStore(DerivaBinding):
         url = self._server_uri + path
         url = '%s%s' % (url.rstrip("/") if url.endswith("/") else url,
                         "" if not parents else "?parents=%s" % str(parents).lower())
-        r = self._session.put(url, data=f, headers=headers)
+        r = self._send('PUT', url, data=f, headers=headers)
         self._response_raise_for_status(r)
         loc = r.text.strip() or r.url
         if loc.startswith(self._server_uri):
@@ -291,6 +295,8 @@ class HatracStore(DerivaBinding):
                         elif ret == -1:
                             raise HatracJobPaused("Upload in-progress paused by user.")
                 elapsed = datetime.datetime.now() - start
+                self._metrics.record_transfer('hatrac_chunked_upload', total - start_chunk * chunk_size,
+                                              elapsed.total_seconds())
                 summary = get_transfer_summary(total, elapsed)
                 logging.info("File [%s] upload successful. %s" % (file_path, summary))
                 if callback:
@@ -0,0 +1,230 @@
+"""JSON encoding and decoding of request and response bodies.
+
+The codec used by the bindings and transfer tools is chosen from the installed backends, preferring 'orjson', then
+'ujson', then the standard library 'json' module. A different codec may be selected with set_json_codec() or with the
+DERIVA_JSON_CODEC environment variable naming a backend. Every backend returns the same values and encodes the same
+bytes as the standard library, falling back to it for documents a fast backend would decode differently, e.g. with
+integers beyond 64 bits, and for values a fast backend would encode differently or cannot encode.
+"""
+import os
+import json
+import math
+import logging
+import operator
+from itertools import chain, compress, repeat
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JSONCodec (object):
+    """JSON codec using the standard library 'json' module, and the base class for faster backends.
+
+       The loads() method accepts str or UTF-8 encoded bytes. The
+       dumps() method returns str and dumps_bytes() returns UTF-8
+       encoded bytes suitable for a request body. Documents are
+       encoded without whitespace unless indented, and with non-ASCII
+       characters unescaped, as the fast backends encode them.
+    """
+    name = 'json'
+
+    def loads(self, s):
+        if isinstance(s, (bytes, bytearray)):
+            s = s.decode('utf-8')
+        return json.loads(s)
+
+    def dumps(self, obj, indent=None):
+        return json.dumps(obj, indent=indent, allow_nan=False, ensure_ascii=False,
+                          separators=(',', ':') if indent is None else (',', ': '))
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+
+_stdlib_codec = JSONCodec()
+
+
+# maps ASCII digits to '0' and all other bytes to ' ', to find runs of digits quickly
+_DIGITS_TABLE = bytes(bytearray(0x30 if 0x30 <= c <= 0x39 else 0x20 for c in range(256)))
+
+# integers beyond 64 bits have at least this many digits
+_LONG_DIGITS = b'0' * 19
+
+_SCALAR_TYPES = frozenset([str, int, bool, type(None)])
+_PLAIN_TYPES = _SCALAR_TYPES | frozenset([float, dict, list, tuple])
+
+
+def _of_type(values, types, cls):
+    return compress(values, map(operator.is_, types, repeat(cls)))
+
+
+def _is_plain(obj):
+    """Returns whether obj is made of dicts, lists, tuples, str, int, bool and None values, and of floats which the fast
+       backends encode as the standard library does, i.e. finite and written without an exponent.
+
+       Each level of nested values is checked by iterators running in C, so this takes a fraction of the time of
+       encoding obj with the standard library.
+    """
+    values = [obj]
+    while values:
+        types = list(map(type, values))
+        found = set(types)
+        if not found <= _PLAIN_TYPES:
+            return False
+        if float in found:
+            magnitudes = list(map(abs, _of_type(values, types, float)))
+            # a nan or infinity makes the sum nan or infinite
+            if math.isnan(sum(magnitudes)) or max(magnitudes) >= 1e16 or \
+                    min(filter(None, magnitudes + [1.0])) < 1e-4:
+                return False
+        children = []
+        if dict in found:
+            children.append(chain.from_iterable(map(dict.values, _of_type(values, types, dict))))
+        for cls in (list, tuple):
+            if cls in found:
+                children.append(chain.from_iterable(_of_type(values, types, cls)))
+        values = list(chain.from_iterable(children))
+    return True
+
+
+class OrjsonCodec (JSONCodec):
+    """JSON codec using the 'orjson' package.
+
+       orjson decodes integers beyond 64 bits as floats, so documents
+       with runs of 19 or more digits are decoded by the standard
+       library instead. orjson encodes NaN as null, writes exponents
+       differently and accepts values such as datetimes and UUIDs which
+       the standard library rejects, so values other than plain ones
+       are encoded by the standard library.
+    """
+    name = 'orjson'
+
+    def loads(self, s):
+        if not isinstance(s, (bytes, bytearray)):
+            s = s.encode('utf-8')
+        if _LONG_DIGITS in s.translate(_DIGITS_TABLE):
+            return _stdlib_codec.loads(s)
+        try:
+            return orjson.loads(s)
+        except ValueError:
+            return _stdlib_codec.loads(s)
+
+    def dumps(self, obj, indent=None):
+        if indent is None or indent == 2:
+            try:
+                return self._dumps_bytes(obj, orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+            except TypeError:
+                pass
+        return _stdlib_codec.dumps(obj, indent=indent)
+
+    def dumps_bytes(self, obj):
+        try:
+            return self._dumps_bytes(obj, 0)
+        except TypeError:
+            return _stdlib_codec.dumps_bytes(obj)
+
+    @staticmethod
+    def _dumps_bytes(obj, option):
+        if not _is_plain(obj):
+            raise TypeError('not a plain JSON value')
+        # orjson raises a TypeError for non-str keys, integers beyond 64 bits and invalid str
+        return orjson.dumps(obj, option=option)
+
+
+class UjsonCodec (JSONCodec):
+    """JSON codec using the 'ujson' package.
+
+       Like orjson, ujson writes exponents differently and accepts
+       values which the standard library rejects, so values other than
+       plain ones, and indented documents, are encoded by the standard
+       library.
+    """
+    name = 'ujson'
+
+    def loads(self, s):
+        try:
+            return ujson.loads(s)
+        except (ValueError, OverflowError):
+            return _stdlib_codec.loads(s)
+
+    def dumps(self, obj, indent=None):
+        if indent is None and _is_plain(obj):
+            try:
+                return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+            except (TypeError, OverflowError):
+                pass
+        return _stdlib_codec.dumps(obj, indent=indent)
+
+
+_codec_classes = [(OrjsonCodec, orjson), (UjsonCodec, ujson), (JSONCodec, json)]
+
+
+def get_json_codec_names():
+    """Returns the names of the installed JSON codec backends, fastest first."""
+    return [cls.name for cls, module in _codec_classes if module is not None]
+
+
+def _make_json_codec(name=None):
+    for cls, module in _codec_classes:
+        if module is not None and (name is None or name == cls.name):
+            return cls()
+    raise ValueError("JSON codec '%s' is not available. Installed codecs: %s" %
+                     (name, ", ".join(get_json_codec_names())))
+
+
+def set_json_codec(codec=None):
+    """Select the JSON codec used for request and response bodies.
+
+       Arguments:
+         codec: a JSONCodec instance, the name of an installed backend
+           ('orjson', 'ujson' or 'json'), or None for the fastest one
+
+       Returns the previously selected codec.
+    """
+    global _codec
+    previous = _codec
+    _codec = codec if isinstance(codec, JSONCodec) else _make_json_codec(codec)
+    return previous
+
+
+def get_json_codec():
+    """Returns the selected JSONCodec."""
+    return _codec
+
+
+def json_loads(s):
+    """Decode the JSON document s, given as str or UTF-8 encoded bytes, with the selected codec."""
+    return _codec.loads(s)
+
+
+def json_dumps(obj, indent=None):
+    """Encode obj as a JSON str with the selected codec."""
+    return _codec.dumps(obj, indent=indent)
+
+
+def json_dumps_bytes(obj):
+    """Encode obj as UTF-8 encoded JSON bytes with the selected codec."""
+    return _codec.dumps_bytes(obj)
+
+
+def response_json(response):
+    """Decode the JSON content of a requests.Response object with the selected codec.
+
+       This is equivalent to response.json() for the UTF-8 encoded
+       JSON content returned by Deriva services.
+    """
+    return _codec.loads(response.content)
+
+
+try:
+    _codec = _make_json_codec(os.environ.get('DERIVA_JSON_CODEC') or None)
+except ValueError as e:
+    logging.warning("%s Using the fastest installed codec instead." % e)
+    _codec = _make_json_codec()
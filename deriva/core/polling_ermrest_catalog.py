@@ -1,6 +1,5 @@
 import sys
 import json
-import pika
 import time
 from . import NotModified, ConcurrentUpdate
 from .ermrest_catalog import ErmrestCatalog
@@ -64,6 +63,8 @@ class PollingErmrestCatalog(ErmrestCatalog):
 
     def _amqp_bind(self):
         """Bind or rebind to AMQP for change notice monitoring."""
+        import pika
+
         if self.amqp_connection is not None:
             try:
                 self.amqp_connection.close()
@@ -121,6 +122,8 @@ class PollingErmrestCatalog(ErmrestCatalog):
            Other exceptions abort the blocking_poll() call.
 
         """
+        import pika
+
         last_run_time = None
         retry_amqp = False
         while True:
@@ -187,7 +190,7 @@ class PollingErmrestCatalog(ErmrestCatalog):
         try:
             before = self.get(query_datapath, raise_not_modified=True)
         except NotModified as e:
-            before = self._cache[self._server_uri + query_datapath]
+            before = self.get_cached_response(query_datapath)
 
         if idle_etag is not None:
             if before.headers['etag'] == idle_etag:
@@ -0,0 +1,208 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from .request_metrics import LatencyHistogram
+
+
+class HedgingPolicy (object):
+    """Policy for hedging idempotent requests to reduce tail latency.
+
+       A hedged request is sent once on the calling thread and, if no
+       response has arrived a delay after it was sent, sent a second
+       time on the thread pool of the policy; the first response to
+       arrive is used. The delay is the given percentile of the latencies
+       recorded so far for the same method and path template in the
+       binding's RequestMetrics, clamped to [min_delay, max_delay].
+       Requests are not hedged until min_samples latencies have been
+       recorded for their path template, nor when hedges would exceed
+       the budget fraction of all requests governed by the policy.
+
+       Arguments:
+         percentile: latency percentile (0-100) after which to hedge
+         min_delay: lower bound of the hedging delay in seconds
+         max_delay: optional upper bound of the hedging delay in seconds
+         min_samples: latencies required before hedging a path template
+         budget: maximum fraction of requests which may be hedged
+         max_workers: size of the thread pool sending hedges
+
+       The policy records the latency observed by callers of hedged
+       requests, which may be compared with the per-request latencies
+       of the metrics to measure the gain. A policy is safe for
+       concurrent use and may be shared by several bindings.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.01, max_delay=None, min_samples=20, budget=0.1, max_workers=16):
+        assert 0 < percentile <= 100
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.budget = budget
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._timers = []
+        self._timers_seq = itertools.count()
+        self._timers_cond = threading.Condition(threading.Lock())
+        self._timer_thread = None
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self, metrics, method, path):
+        """Returns the hedging delay in seconds for a request, or None if it should not be hedged."""
+        histogram = metrics.latency(method, path)
+        if histogram is None or histogram.count < self.min_samples:
+            return None
+        delay = max(self.min_delay, histogram.percentile(self.percentile))
+        return min(delay, self.max_delay) if self.max_delay is not None else delay
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _within_budget(self):
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def send(self, send_fn, delay):
+        """Return the result of send_fn(started), calling it a second time if the first call takes longer than delay.
+
+           The send_fn is called with a function which it calls once the
+           request is actually sent, e.g. after waiting for a concurrency
+           governor, and the delay is measured from then. The first call
+           runs on the calling thread and the second call, the hedge, on
+           the thread pool of the policy. The first call to return a
+           response wins. A call raising an error only wins if the other
+           call raises an error as well. The response of the losing call
+           is closed once it arrives.
+        """
+        start = time.time()
+        with self._lock:
+            self.requests += 1
+        if delay is None:
+            try:
+                return send_fn(_ignore)
+            finally:
+                self._observe(time.time() - start)
+
+        request = _HedgedRequest(send_fn)
+        try:
+            try:
+                r = send_fn(lambda: self._schedule(time.time() + delay, lambda: self._hedge(request, delay)))
+            except Exception:
+                hedge = request.settle()
+                if hedge is None:
+                    raise
+                wait([hedge])
+                if hedge.exception() is not None:
+                    raise
+                with self._lock:
+                    self.hedge_wins += 1
+                return hedge.result()
+            hedge = request.settle()
+            if hedge is not None:
+                if hedge.done() and hedge.exception() is None:
+                    r.close()
+                    with self._lock:
+                        self.hedge_wins += 1
+                    return hedge.result()
+                hedge.add_done_callback(_close_response)
+            return r
+        finally:
+            self._observe(time.time() - start)
+
+    def _hedge(self, request, delay):
+        """Send the hedge of a request still awaiting its response, if the budget allows."""
+        with request.lock:
+            if request.settled or not self._within_budget():
+                return
+            logging.debug("Hedging request after %.3f seconds." % delay)
+            try:
+                request.hedge = self._get_executor().submit(request.send_fn, _ignore)
+            except RuntimeError:
+                pass  # the policy was shut down
+
+    def _schedule(self, deadline, fn):
+        """Call fn on the timer thread of the policy at the deadline."""
+        with self._timers_cond:
+            heapq.heappush(self._timers, (deadline, next(self._timers_seq), fn))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(target=self._run_timers, name='HedgingPolicy timer')
+                self._timer_thread.daemon = True
+                self._timer_thread.start()
+            self._timers_cond.notify()
+
+    def _run_timers(self):
+        while True:
+            with self._timers_cond:
+                while True:
+                    if not self._timers:
+                        # the thread ends when idle and is started again by the next schedule
+                        self._timer_thread = None
+                        return
+                    deadline, _, fn = self._timers[0]
+                    now = time.time()
+                    if deadline <= now:
+                        heapq.heappop(self._timers)
+                        break
+                    self._timers_cond.wait(deadline - now)
+            try:
+                fn()
+            except Exception as e:
+                logging.warning("Unable to hedge request: %s" % e)
+
+    def _observe(self, seconds):
+        with self._lock:
+            self.latency.observe(seconds)
+
+    def stats(self):
+        """Return a dictionary of hedging counters and the latency observed by callers."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'latency': self.latency.todict(),
+            }
+
+    def shutdown(self):
+        """Release the threads of the policy once outstanding requests have completed."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+class _HedgedRequest (object):
+    """State shared by the first call of a hedged request and the timer sending its hedge."""
+
+    def __init__(self, send_fn):
+        self.send_fn = send_fn
+        self.lock = threading.Lock()
+        self.settled = False
+        self.hedge = None
+
+    def settle(self):
+        """Mark the first call as returned, so no hedge is sent anymore, and return the hedge sent, if any."""
+        with self.lock:
+            self.settled = True
+            return self.hedge
+
+
+def _ignore():
+    pass
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
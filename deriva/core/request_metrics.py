@@ -0,0 +1,302 @@
+import os
+import io
+import threading
+from bisect import bisect_left
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+"""Upper bounds, in seconds, of the request latency histogram buckets"""
+
+
+def path_template(path):
+    """Returns a low-cardinality template of a request path for use as a metrics label.
+
+       The query string and the variable parts of the path are elided. For ERMrest paths, the catalog identifier is
+       replaced and the API name is retained, e.g. '/ermrest/catalog/1/entity/S:T/RID=X' becomes
+       '/ermrest/catalog/{id}/entity/*', and relative catalog paths like '/entity/S:T' become '/entity/*'. Hatrac
+       sub-resources are retained, e.g. '/hatrac/ns/obj;upload/job/3' becomes '/hatrac/*;upload'.
+    """
+    path = path.split('?', 1)[0]
+    path, _, suffix = path.partition(';')
+    segments = path.split('/')[1:]
+    if segments[:2] == ['ermrest', 'catalog'] and len(segments) > 2:
+        head = ['ermrest', 'catalog', '{id}'] + segments[3:4]
+    else:
+        head = segments[:1]
+    template = '/' + '/'.join(head)
+    if len(segments) > len(head) and any(segments[len(head):]):
+        template += '/*'
+    if suffix:
+        template += ';' + suffix.split('/', 1)[0]
+    return template
+
+
+class LatencyHistogram (object):
+    """Histogram of request latencies with fixed bucket boundaries."""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last count is the +Inf overflow bucket
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, q):
+        """Returns an estimate of the q-th percentile (0 < q <= 100) latency in seconds or None if empty.
+
+           The estimate interpolates linearly within the bucket holding the percentile rank.
+        """
+        if not self.count:
+            return None
+        rank = self.count * q / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def copy(self):
+        h = LatencyHistogram(self.buckets)
+        h.counts = list(self.counts)
+        h.count = self.count
+        h.sum = self.sum
+        return h
+
+    def todict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': list(zip(self.buckets + (float('inf'),), self.counts)),
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+        }
+
+
+class RequestStats (object):
+    """Counters for requests sharing one method and path template."""
+
+    def __init__(self):
+        self.count = 0
+        self.latency = LatencyHistogram()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.not_modified = 0
+        self.conflicts = 0
+        self.retries = 0
+        self.errors = 0
+
+    def todict(self):
+        return {
+            'count': self.count,
+            'latency': self.latency.todict(),
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'not_modified': self.not_modified,
+            'conflicts': self.conflicts,
+            'retries': self.retries,
+            'errors': self.errors,
+        }
+
+
+class TransferStats (object):
+    """Counters for bulk content transfers of one stage, e.g. chunked Hatrac uploads."""
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def todict(self):
+        return {
+            'count': self.count,
+            'bytes': self.bytes,
+            'seconds': self.seconds,
+            'throughput': self.bytes / self.seconds if self.seconds else None,
+        }
+
+
+def _content_length(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, type(u'')):
+        return len(body.encode('utf-8'))
+    return 0
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics (object):
+    """Thread-safe collector of request and transfer metrics for one or more bindings.
+
+       Request metrics are recorded per HTTP method and path template: request count, latency histogram, bytes sent
+       and received, 304 (not modified) responses, 412 (conflict) responses, retries, and errors. Transfer metrics
+       are recorded per named stage: transfer count, bytes, and elapsed seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = dict()
+        self._transfers = dict()
+        self._governors = []
+
+    def record(self, method, path, seconds, response=None, stream=False, error=False, retries=None):
+        """Record one completed request.
+
+           Arguments:
+             method: the HTTP method
+             path: the request path, which is reduced to its template
+             seconds: elapsed time of the request
+             response: the requests.Response object, if any
+             stream: whether the response content is streamed, in which case the bytes received are not counted
+             error: whether the request failed without a response
+             retries: number of retries, if not available from the response
+        """
+        sent = received = 0
+        status = None
+        if response is not None:
+            status = response.status_code
+            request = getattr(response, 'request', None)
+            if request is not None:
+                sent = _content_length(request.body) or int(request.headers.get('Content-Length') or 0)
+            if not stream:
+                received = len(response.content or b'')
+            if retries is None:
+                history = getattr(getattr(getattr(response, 'raw', None), 'retries', None), 'history', None)
+                retries = len(history) if history else 0
+        key = (method.upper(), path_template(path))
+        with self._lock:
+            stats = self._requests.get(key)
+            if stats is None:
+                stats = self._requests[key] = RequestStats()
+            stats.count += 1
+            stats.latency.observe(seconds)
+            stats.bytes_sent += sent
+            stats.bytes_received += received
+            stats.retries += retries or 0
+            if status == 304:
+                stats.not_modified += 1
+            elif status == 412:
+                stats.conflicts += 1
+            if error or (status is not None and status >= 400 and status != 412):
+                stats.errors += 1
+
+    def record_transfer(self, stage, nbytes, seconds):
+        """Record one bulk content transfer of nbytes taking seconds in the named stage."""
+        with self._lock:
+            stats = self._transfers.get(stage)
+            if stats is None:
+                stats = self._transfers[stage] = TransferStats()
+            stats.count += 1
+            stats.bytes += nbytes
+            stats.seconds += seconds
+
+    def add_governor(self, governor):
+        """Include the state of a ConcurrencyGovernor in the metrics."""
+        with self._lock:
+            if not any(g is governor for g in self._governors):
+                self._governors.append(governor)
+
+    def _governor_stats(self):
+        with self._lock:
+            governors = list(self._governors)
+        return [(governor.name or str(i), governor.stats()) for i, governor in enumerate(governors)]
+
+    def latency(self, method, path):
+        """Returns a copy of the latency histogram for the method and template of path, or None."""
+        with self._lock:
+            stats = self._requests.get((method.upper(), path_template(path)))
+            return stats.latency.copy() if stats is not None else None
+
+    def snapshot(self):
+        """Returns a point-in-time copy of all metrics as a dictionary.
+
+           The 'requests' entry maps "<METHOD> <path template>" strings to request counters, the 'transfers'
+           entry maps stage names to transfer counters, and the 'governors' entry maps the names of concurrency
+           governors to their state.
+        """
+        governors = dict(self._governor_stats())
+        with self._lock:
+            return {
+                'requests': dict(("%s %s" % key, stats.todict()) for key, stats in self._requests.items()),
+                'transfers': dict((stage, stats.todict()) for stage, stats in self._transfers.items()),
+                'governors': governors,
+            }
+
+    def reset(self):
+        """Discard all recorded request and transfer metrics."""
+        with self._lock:
+            self._requests.clear()
+            self._transfers.clear()
+
+    def to_prometheus(self, prefix='deriva'):
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = []
+        governors = self._governor_stats()
+        with self._lock:
+            requests = sorted(self._requests.items())
+            transfers = sorted(self._transfers.items())
+
+            def counter(name, helptext, values):
+                lines.append("# HELP %s_%s %s" % (prefix, name, helptext))
+                lines.append("# TYPE %s_%s counter" % (prefix, name))
+                for labels, value in values:
+                    lines.append("%s_%s{%s} %s" % (prefix, name, labels, value))
+
+            rlabels = [('method="%s",path="%s"' % (_label(m), _label(p)), s) for (m, p), s in requests]
+            counter('requests_total', 'Number of HTTP requests.', [(l, s.count) for l, s in rlabels])
+            lines.append("# HELP %s_request_duration_seconds HTTP request latency." % prefix)
+            lines.append("# TYPE %s_request_duration_seconds histogram" % prefix)
+            for l, s in rlabels:
+                cumulative = 0
+                for bound, n in zip(s.latency.buckets + (float('inf'),), s.latency.counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_request_duration_seconds_bucket{%s,le="%s"} %d' % (prefix, l, le, cumulative))
+                lines.append('%s_request_duration_seconds_sum{%s} %r' % (prefix, l, s.latency.sum))
+                lines.append('%s_request_duration_seconds_count{%s} %d' % (prefix, l, s.latency.count))
+            counter('request_bytes_sent_total', 'Request body bytes sent.', [(l, s.bytes_sent) for l, s in rlabels])
+            counter('request_bytes_received_total', 'Response body bytes received.',
+                    [(l, s.bytes_received) for l, s in rlabels])
+            counter('request_not_modified_total', 'Responses with 304 Not Modified status.',
+                    [(l, s.not_modified) for l, s in rlabels])
+            counter('request_conflicts_total', 'Responses with 412 Precondition Failed status.',
+                    [(l, s.conflicts) for l, s in rlabels])
+            counter('request_retries_total', 'Request retries.', [(l, s.retries) for l, s in rlabels])
+            counter('request_errors_total', 'Failed requests.', [(l, s.errors) for l, s in rlabels])
+
+            tlabels = [('stage="%s"' % _label(stage), s) for stage, s in transfers]
+            counter('transfers_total', 'Number of bulk content transfers.', [(l, s.count) for l, s in tlabels])
+            counter('transfer_bytes_total', 'Bulk content bytes transferred.', [(l, s.bytes) for l, s in tlabels])
+            counter('transfer_seconds_total', 'Time spent in bulk content transfers.',
+                    [(l, repr(s.seconds)) for l, s in tlabels])
+
+        glabels = [('server="%s"' % _label(name), s) for name, s in sorted(governors)]
+        for name, helptext in [('limit', 'Adaptive limit on concurrent requests.'),
+                               ('in_flight', 'Requests in flight.'),
+                               ('waiting', 'Requests waiting for the concurrency limit.')]:
+            lines.append("# HELP %s_governor_%s %s" % (prefix, name, helptext))
+            lines.append("# TYPE %s_governor_%s gauge" % (prefix, name))
+            for l, s in glabels:
+                lines.append("%s_governor_%s{%s} %s" % (prefix, name, l, s[name]))
+        counter('governor_throttled_total', 'Throttling responses and connection errors.',
+                [(l, s['throttled']) for l, s in glabels])
+        counter('governor_decreases_total', 'Decreases of the concurrency limit.',
+                [(l, s['decreases']) for l, s in glabels])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, file_path, prefix='deriva'):
+        """Atomically write all metrics in the Prometheus text format to file_path, e.g. for a node exporter."""
+        tmp_path = "%s.%d.tmp" % (file_path, os.getpid())
+        with io.open(tmp_path, 'w', newline='\n') as f:
+            f.write(type(u'')(self.to_prometheus(prefix)))
+        getattr(os, 'replace', os.rename)(tmp_path, file_path)
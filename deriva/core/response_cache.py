@@ -0,0 +1,376 @@
+import os
+import json
+import time
+import errno
+import sqlite3
+import threading
+from collections import OrderedDict
+import requests
+from requests.structures import CaseInsensitiveDict
+from . import DEFAULT_CACHE_FILE, DEFAULT_CACHE_SIZE
+
+# response headers which are never retained in a cache entry
+_UNCACHED_HEADERS = frozenset(['set-cookie'])
+
+
+class CachedResponse (object):
+    """Minimal state of a GET response needed for ETag revalidation.
+
+       Only the etag, status, headers and raw content bytes are
+       retained. A fresh requests.Response can be rebuilt from this
+       state with to_response().
+    """
+    def __init__(self, url, etag, status_code, headers, content, encoding=None, reason=None, stored=None):
+        self.url = url
+        self.etag = etag
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.reason = reason
+        self.stored = stored if stored is not None else time.time()
+        self.accessed = self.stored
+        self.size = len(url) + len(content or b'') + sum(len(k) + len(v) for k, v in headers.items())
+
+    @classmethod
+    def fromresponse(cls, url, response):
+        """Build a cache entry from a requests.Response object whose content has been retrieved."""
+        headers = dict(
+            (k, v) for k, v in response.headers.items() if k.lower() not in _UNCACHED_HEADERS
+        )
+        return cls(
+            url,
+            response.headers.get('etag'),
+            response.status_code,
+            headers,
+            response.content,
+            encoding=response.encoding,
+            reason=response.reason,
+        )
+
+    def to_response(self):
+        """Rebuild a requests.Response object from this cache entry."""
+        r = requests.Response()
+        r.url = self.url
+        r.status_code = self.status_code
+        r.reason = self.reason
+        r.headers = CaseInsensitiveDict(self.headers)
+        r.encoding = self.encoding
+        r._content = self.content
+        r._content_consumed = True
+        return r
+
+
+class ResponseCache (object):
+    """Base class for GET response caches used by DerivaBinding.
+
+       Sub-classes implement the lookup, store and removal of
+       CachedResponse entries keyed by an opaque string. The cache
+       keeps hit, miss and eviction counters which may be inspected
+       with stats().
+
+       Implementations must be safe for concurrent use by multiple
+       threads.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._counter_lock = threading.Lock()
+
+    def _count(self, counter, n=1):
+        with self._counter_lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def lookup(self, key):
+        """Return the CachedResponse for key or None."""
+        raise NotImplementedError()
+
+    def store(self, key, entry):
+        """Retain the CachedResponse entry under key."""
+        raise NotImplementedError()
+
+    def discard(self, key):
+        """Remove any entry under key."""
+        raise NotImplementedError()
+
+    def clear(self):
+        """Remove all entries."""
+        raise NotImplementedError()
+
+    def get(self, key):
+        """Return a rebuilt requests.Response for key or None on cache miss."""
+        entry = self.lookup(key)
+        if entry is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return entry.to_response()
+
+    def put(self, key, response):
+        """Retain the revalidation state of response under key.
+
+           Responses lacking an ETag are not useful for revalidation
+           and are discarded instead.
+        """
+        if 'etag' not in response.headers:
+            self.discard(key)
+            return
+        self.store(key, CachedResponse.fromresponse(response.url or key, response))
+
+    def stats(self):
+        """Return a dictionary of cache counters."""
+        with self._counter_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class _CacheStripe (object):
+    """One independently locked LRU segment of a MemoryResponseCache."""
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def remove(self, key):
+        return self.entries.pop(key, None)
+
+    def oldest(self):
+        """Return the least-recently-used (key, entry) pair or None."""
+        for key in self.entries:
+            return key, self.entries[key]
+        return None
+
+
+class MemoryResponseCache (ResponseCache):
+    """In-memory LRU response cache with a maximum byte budget and optional TTL.
+
+       Arguments:
+         max_bytes: approximate upper bound on the total size of retained entries
+         ttl: optional number of seconds after which entries expire
+         stripes: number of independently locked cache segments
+
+       Keys are spread over several lock stripes so that concurrent
+       threads rarely contend for the same lock. The byte budget is
+       shared by all stripes and eviction removes the least recently
+       used among the oldest entries of each stripe.
+    """
+    def __init__(self, max_bytes, ttl=None, stripes=16):
+        super(MemoryResponseCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._stripes = [_CacheStripe() for i in range(max(1, stripes))]
+        self._bytes = 0
+        self._bytes_lock = threading.Lock()
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def _adjust(self, delta):
+        with self._bytes_lock:
+            self._bytes += delta
+            return self._bytes
+
+    def _evict(self, total):
+        while total > self.max_bytes:
+            candidates = []
+            for stripe in self._stripes:
+                with stripe.lock:
+                    oldest = stripe.oldest()
+                if oldest is not None:
+                    candidates.append((oldest[1].accessed, oldest[0], stripe))
+            if not candidates:
+                return
+            accessed, key, stripe = min(candidates, key=lambda c: c[0])
+            with stripe.lock:
+                entry = stripe.remove(key)
+            if entry is not None:
+                self._count('evictions')
+                total = self._adjust(-entry.size)
+            else:
+                with self._bytes_lock:
+                    total = self._bytes
+
+    def lookup(self, key):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.remove(key)
+            if entry is None:
+                return None
+            if self.ttl is None or time.time() - entry.stored <= self.ttl:
+                # re-insert to mark as most recently used
+                entry.accessed = time.time()
+                stripe.entries[key] = entry
+                return entry
+        self._count('evictions')
+        self._adjust(-entry.size)
+        return None
+
+    def store(self, key, entry):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            old = stripe.remove(key)
+            delta = -old.size if old is not None else 0
+            if entry.size <= self.max_bytes:
+                stripe.entries[key] = entry
+                delta += entry.size
+        self._evict(self._adjust(delta))
+
+    def discard(self, key):
+        stripe = self._stripe(key)
+        with stripe.lock:
+            entry = stripe.remove(key)
+        if entry is not None:
+            self._adjust(-entry.size)
+
+    def clear(self):
+        for stripe in self._stripes:
+            with stripe.lock:
+                size = sum(entry.size for entry in stripe.entries.values())
+                stripe.entries.clear()
+            self._adjust(-size)
+
+    def stats(self):
+        s = super(MemoryResponseCache, self).stats()
+        entries = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                entries += len(stripe.entries)
+        with self._bytes_lock:
+            s.update({
+                'entries': entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            })
+        return s
+
+
+class SqliteResponseCache (ResponseCache):
+    """On-disk LRU response cache backed by an SQLite database file.
+
+       The database may be shared by concurrent threads and processes,
+       e.g. successive CLI invocations, with SQLite providing the
+       necessary locking. Each thread uses its own connection.
+
+       Arguments:
+         path: filename of the SQLite database, created if missing
+           (default: DEFAULT_CACHE_FILE)
+         max_bytes: approximate upper bound on the total size of retained entries
+         ttl: optional number of seconds after which entries expire
+         timeout: seconds to wait on a database locked by another process
+    """
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_bytes=DEFAULT_CACHE_SIZE, ttl=None, timeout=60):
+        super(SqliteResponseCache, self).__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " url TEXT NOT NULL,"
+                " etag TEXT,"
+                " status INTEGER NOT NULL,"
+                " reason TEXT,"
+                " encoding TEXT,"
+                " headers TEXT NOT NULL,"
+                " content BLOB,"
+                " size INTEGER NOT NULL,"
+                " stored REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_idx ON responses (accessed)")
+        try:
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            try:
+                # write-ahead logging lets readers proceed while another process writes
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError:
+                pass
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key):
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "SELECT url, etag, status, reason, encoding, headers, content, stored FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            url, etag, status, reason, encoding, headers, content, stored = row
+            now = time.time()
+            if self.ttl is not None and now - stored > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count('evictions')
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return CachedResponse(url, etag, status, json.loads(headers), bytes(content or b''),
+                              encoding=encoding, reason=reason, stored=stored)
+
+    def store(self, key, entry):
+        if entry.size > self.max_bytes:
+            self.discard(key)
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, url, etag, status, reason, encoding, headers, content, size, stored, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.url, entry.etag, entry.status_code, entry.reason, entry.encoding,
+                 json.dumps(entry.headers), sqlite3.Binary(entry.content or b''), entry.size, entry.stored,
+                 time.time())
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                victims = []
+                for victim, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append((victim,))
+                    total -= size
+                conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                self._count('evictions', len(victims))
+
+    def discard(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        s = super(SqliteResponseCache, self).stats()
+        conn = self._connect()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        s.update({
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        })
+        return s
@@ -0,0 +1,49 @@
+import collections
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def map_concurrently(fn, iterable, max_workers, ordered=True, return_exceptions=False):
+    """
+       Applies fn to each item of iterable using a pool of up to max_workers threads.
+       Yields (item, result) tuples, either in input order or, when ordered is False, in completion order.
+
+       Only a bounded window of items is in flight at any time, so arbitrarily long input iterables may be consumed
+       lazily. If return_exceptions is True, an exception raised by fn is yielded as the result for that item,
+       otherwise it is re-raised and the remaining work is cancelled.
+    """
+    window = max(1, max_workers) * 2
+    items = iter(iterable)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    pending = collections.OrderedDict()
+
+    def submit():
+        for item in items:
+            pending[executor.submit(fn, item)] = item
+            if len(pending) >= window:
+                break
+
+    def result(future):
+        item = pending.pop(future)
+        try:
+            return item, future.result()
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return item, e
+
+    try:
+        submit()
+        while pending:
+            if ordered:
+                future = next(iter(pending))
+                wait([future])
+                yield result(future)
+            else:
+                done, not_done = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield result(future)
+            submit()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
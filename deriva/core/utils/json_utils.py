@@ -0,0 +1,85 @@
+import re
+import json
+import codecs
+from ..json_codec import json_loads
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(chunks):
+    """
+       Incrementally parses a JSON array document arriving as an iterable of byte chunks, yielding each array element
+       as soon as it has been completely received. Only the unparsed tail of the document is retained in memory.
+
+       Raises ValueError if the document is not a well-formed JSON array.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf, pos, eof = u'', 0, False
+    expect = '['  # one of '[', 'first', 'value', 'separator', 'end'
+
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos < len(buf):
+            char = buf[pos]
+            if expect == '[':
+                if char != '[':
+                    raise ValueError("Expected a JSON array but found %r at position %d" % (char, pos))
+                pos += 1
+                expect = 'first'
+                continue
+            elif char == ']' and expect in ('first', 'separator'):
+                pos += 1
+                expect = 'end'
+                continue
+            elif char == ',' and expect == 'separator':
+                pos += 1
+                expect = 'value'
+                continue
+            elif expect in ('first', 'value'):
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    # the element may still be incomplete
+                    if eof:
+                        raise
+                else:
+                    # a scalar element, e.g. a number, is only complete once a delimiter has been received
+                    following = _WHITESPACE.match(buf, end).end()
+                    if eof or (following < len(buf) and buf[following] in ',]'):
+                        yield value
+                        pos = end
+                        expect = 'separator'
+                        continue
+            else:
+                raise ValueError("Unexpected %r in JSON array at position %d" % (char, pos))
+        elif eof:
+            if expect != 'end':
+                raise ValueError("Truncated JSON array")
+            return
+
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buf = buf[pos:] + text.decode(b'', True)
+        else:
+            buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+
+
+def iter_json_lines(chunks):
+    """
+       Incrementally parses a line-delimited JSON document, e.g. in the ERMrest 'application/x-json-stream' format,
+       arriving as an iterable of byte chunks, yielding the value of each non-blank line as soon as it has been
+       completely received.
+    """
+    buf = b''
+    for chunk in chunks:
+        lines = (buf + chunk).split(b'\n')
+        buf = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json_loads(line)
+    if buf.strip():
+        yield json_loads(buf)
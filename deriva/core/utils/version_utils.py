@@ -1,5 +1,4 @@
 import re
-from pkg_resources import parse_version
 
 
 def is_compatible(source_version, compat_versions):
@@ -46,6 +45,8 @@ def is_compatible(source_version, compat_versions):
     compat_versions: [["==version-3.0"], ["==version-3.1"], ["==version-3.3"]]
     result: True
     """
+    from pkg_resources import parse_version
+
     pattern = "^.*(?P<operator>(>=|<=|>|<|==|!=))(?P<version>.*)$"
     compat = None
     for version_spec in compat_versions:
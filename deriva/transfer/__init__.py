@@ -1,4 +1,31 @@
-from deriva.transfer.download.deriva_download import DerivaDownload, GenericDownloader
-from deriva.transfer.download.deriva_download_cli import DerivaDownloadCLI
-from deriva.transfer.upload.deriva_upload import DerivaUpload, GenericUploader
-from deriva.transfer.upload.deriva_upload_cli import DerivaUploadCLI
+import sys
+import importlib
+
+# The transfer classes are imported from their modules on first use, so that the command-line entry points do not
+# load the download stack (including bdbag) or the upload stack unless they need it.
+_lazy_attributes = {
+    'DerivaDownload': 'deriva.transfer.download.deriva_download',
+    'GenericDownloader': 'deriva.transfer.download.deriva_download',
+    'DerivaDownloadCLI': 'deriva.transfer.download.deriva_download_cli',
+    'DerivaUpload': 'deriva.transfer.upload.deriva_upload',
+    'GenericUploader': 'deriva.transfer.upload.deriva_upload',
+    'DerivaUploadCLI': 'deriva.transfer.upload.deriva_upload_cli',
+}
+
+
+def __getattr__(name):
+    if name in _lazy_attributes:
+        value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is unavailable, so import eagerly
+    for _name in _lazy_attributes:
+        __getattr__(_name)
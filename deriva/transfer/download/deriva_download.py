@@ -4,8 +4,8 @@ import uuid
 import logging
 import platform
 from bdbag import bdbag_api as bdb, bdbag_ro as ro, BAG_PROFILE_TAG, BDBAG_RO_PROFILE_ID
-from deriva.core import ErmrestCatalog, HatracStore, format_exception, get_credential, read_config, stob, \
-    __version__ as VERSION
+from deriva.core import ErmrestCatalog, HatracStore, SqliteResponseCache, format_exception, get_credential, \
+    read_config, stob, __version__ as VERSION
 from deriva.transfer.download.processors import findProcessor
 
 
@@ -42,6 +42,7 @@ class DerivaDownload(object):
         self.server_url = protocol + "://" + self.hostname
         catalog_id = self.server.get("catalog_id", "1")
         session_config = self.server.get('session')
+        cache_file = self.server.get('cache_file')
 
         # credential initialization
         if credential_file:
@@ -51,7 +52,8 @@ class DerivaDownload(object):
         if self.catalog:
             del self.catalog
         self.catalog = ErmrestCatalog(
-            protocol, self.hostname, catalog_id, self.credentials, session_config=session_config)
+            protocol, self.hostname, catalog_id, self.credentials,
+            caching=SqliteResponseCache(cache_file) if cache_file else True, session_config=session_config)
         if self.store:
             del self.store
         self.store = HatracStore(
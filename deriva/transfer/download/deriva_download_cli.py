@@ -2,7 +2,6 @@ import os
 import sys
 import traceback
 import argparse
-from deriva.transfer import GenericDownloader
 from deriva.core import BaseCLI, KeyValuePairArgs, format_credential, urlparse, __version__
 
 
@@ -30,6 +29,8 @@ class DerivaDownloadCLI(BaseCLI):
                kwargs=None,
                config_file=None,
                credential_file=None):
+        # imported here so that the command-line help does not wait for the download stack to load
+        from deriva.transfer import GenericDownloader
 
         assert hostname, "A hostname is required!"
         server = dict()
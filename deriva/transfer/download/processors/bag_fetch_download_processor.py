@@ -1,9 +1,10 @@
 import os
-import json
 import logging
 import requests
 from bdbag import bdbag_ro as ro
-from deriva.core import format_exception
+from deriva.core import format_exception, DEFAULT_MAX_WORKERS
+from deriva.core.json_codec import json_loads, json_dumps
+from deriva.core.utils.concurrent_utils import map_concurrently
 from deriva.core.utils.hash_utils import decodeBase64toHex
 from deriva.core.utils.mime_utils import parse_content_disposition
 from deriva.transfer.download.processors import BaseDownloadProcessor
@@ -25,12 +26,13 @@ class BagFetchDownloadProcessor(BaseDownloadProcessor):
         logging.info("Creating remote file manifest")
         input_manifest = self.output_abspath
         remote_file_manifest = self.args.get("remote_file_manifest")
+        max_workers = (self.format_args or {}).get("max_workers", DEFAULT_MAX_WORKERS)
         with open(input_manifest, "r") as in_file, open(remote_file_manifest, "a") as remote_file:
-            for line in in_file:
-                # get the required bdbag remote file manifest vars from each line of the json-stream input file
-                entry = json.loads(line)
-                entry = self.createManifestEntry(entry)
-                remote_file.write(json.dumps(entry) + "\n")
+            # get the required bdbag remote file manifest vars from each line of the json-stream input file,
+            # issuing any required HEAD requests concurrently
+            entries = (json_loads(line) for line in in_file)
+            for source, entry in map_concurrently(self.createManifestEntry, entries, max_workers):
+                remote_file.write(json_dumps(entry) + "\n")
                 if self.ro_manifest:
                     ro.add_file_metadata(self.ro_manifest,
                                          source_url=entry["url"],
@@ -45,7 +47,7 @@ class BagFetchDownloadProcessor(BaseDownloadProcessor):
         manifest_entry = dict()
         url = entry.get("url")
         if not url:
-            raise RuntimeError("Missing required attribute \"url\" in download manifest entry %s" % json.dumps(entry))
+            raise RuntimeError("Missing required attribute \"url\" in download manifest entry %s" % json_dumps(entry))
 
         length = entry.get("length")
         md5 = entry.get("md5")
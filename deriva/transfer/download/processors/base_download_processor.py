@@ -1,5 +1,6 @@
 import os
 import errno
+import threading
 import certifi
 import requests
 from requests.adapters import HTTPAdapter
@@ -7,6 +8,10 @@ from requests.packages.urllib3.util.retry import Retry
 from deriva.core import urlsplit, format_exception, DEFAULT_SESSION_CONFIG
 from bdbag import bdbag_ro as ro
 
+# guards the creation of the external sessions shared by the processors of a download, which may look them up
+# concurrently while resolving manifest entries
+_external_sessions_lock = threading.Lock()
+
 
 class BaseDownloadProcessor(object):
     """
@@ -110,6 +115,10 @@ class BaseDownloadProcessor(object):
         return url
 
     def getExternalSession(self, host):
+        with _external_sessions_lock:
+            return self._getExternalSession(host)
+
+    def _getExternalSession(self, host):
         sessions = self.sessions
         auth_params = self.args.get("auth_params", dict())
         cookies = auth_params.get("cookies")
@@ -199,7 +208,8 @@ class JSONEnvUpdateProcessor(BaseDownloadProcessor):
     def process(self):
         headers = self.HEADERS
         headers.update({'accept': "application/json"})
-        resp = self.catalogQuery(headers, as_file=False)
-        if resp[0]:
-            self.envars.update(resp[0])
+        # a small query, which benefits from the response cache unlike a streamed one
+        rows = self.catalogQuery(headers, as_file=False)
+        if rows:
+            self.envars.update(rows[0])
         return []
@@ -1,11 +1,11 @@
 import os
-import json
 import datetime
 import logging
 import requests
 import certifi
 from bdbag import bdbag_ro as ro
 from deriva.core import urlsplit, format_exception, get_transfer_summary, DEFAULT_CHUNK_SIZE
+from deriva.core.json_codec import json_loads, json_dumps
 from deriva.core.utils.mime_utils import parse_content_disposition
 from deriva.transfer.download.processors import BaseDownloadProcessor
 
@@ -57,11 +57,11 @@ class FileDownloadProcessor(BaseDownloadProcessor):
             with open(input_manifest, "r") as in_file:
                 file_list = list()
                 for line in in_file:
-                    entry = json.loads(line)
+                    entry = json_loads(line)
                     url = entry.get('url')
                     if not url:
                         raise RuntimeError(
-                            "Missing required attribute \"url\" in download manifest entry %s" % json.dumps(entry))
+                            "Missing required attribute \"url\" in download manifest entry %s" % json_dumps(entry))
                     store = self.getHatracStore(url)
                     filename = entry.get('filename')
                     envvars = self.envars.copy()
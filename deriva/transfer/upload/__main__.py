@@ -1,11 +1,12 @@
 import sys
-from deriva.transfer import DerivaUploadCLI, GenericUploader
 
 DESC = "Deriva Data Upload Utility - CLI"
 INFO = "For more information see: https://github.com/informatics-isi-edu/deriva-py"
 
 
 def main():
+    # imported here so that importing the entry point does not load the upload stack
+    from deriva.transfer import DerivaUploadCLI, GenericUploader
     cli = DerivaUploadCLI(GenericUploader, DESC, INFO)
     cli.main()
 
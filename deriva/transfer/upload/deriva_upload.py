@@ -9,9 +9,10 @@ import tempfile
 import logging
 import platform
 from collections import OrderedDict, namedtuple
-from deriva.core import ErmrestCatalog, CatalogConfig, HatracStore, HatracJobAborted, HatracJobPaused, \
-    HatracJobTimeout, urlquote, stob, format_exception, get_credential, read_config, write_config, copy_config, \
-    resource_path, __version__ as VERSION
+from deriva.core import ErmrestCatalog, CatalogConfig, HatracStore, SqliteResponseCache, HatracJobAborted, \
+    HatracJobPaused, HatracJobTimeout, urlquote, stob, format_exception, get_credential, read_config, write_config, \
+    copy_config, resource_path, __version__ as VERSION
+from deriva.core.json_codec import json_dumps, response_json
 from deriva.core.utils import hash_utils as hu, mime_utils as mu, version_utils as vu
 
 try:
@@ -112,6 +113,7 @@ class DerivaUpload(object):
         self.server_url = protocol + "://" + host
         catalog_id = self.server.get("catalog_id", "1")
         session_config = self.server.get('session')
+        cache_file = self.server.get('cache_file')
 
         # overriden credential initialization
         if self.override_credential_file:
@@ -120,7 +122,9 @@ class DerivaUpload(object):
         # catalog and file store initialization
         if self.catalog:
             del self.catalog
-        self.catalog = ErmrestCatalog(protocol, host, catalog_id, self.credentials, session_config=session_config)
+        self.catalog = ErmrestCatalog(protocol, host, catalog_id, self.credentials,
+                                      caching=SqliteResponseCache(cache_file) if cache_file else True,
+                                      session_config=session_config)
         if self.store:
             del self.store
         self.store = HatracStore(protocol, host, self.credentials, session_config=session_config)
@@ -599,7 +603,8 @@ class DerivaUpload(object):
             path = rqt.format(**self.metadata)
         except KeyError as e:
             raise ConfigurationError("Record query template substitution error: %s" % format_exception(e))
-        result = self.catalog.get(path).json()
+        # a small query, which benefits from the response cache and request coalescing unlike a streamed one
+        result = response_json(self.catalog.get(path))
         if result:
             self._updateFileMetadata(result[0])
             return self.pruneDict(result[0], column_map)
@@ -661,7 +666,7 @@ class DerivaUpload(object):
                 path = uri.format(**self.metadata)
             except KeyError as e:
                 raise RuntimeError("Metadata query template substitution error: %s" % format_exception(e))
-            result = self.catalog.get(path).json()
+            result = response_json(self.catalog.get(path))
             if result:
                 self._updateFileMetadata(result[0], True)
                 self._urlEncodeMetadata(asset_mapping.get("url_encoding_safe_overrides"))
@@ -771,7 +776,7 @@ class DerivaUpload(object):
             create_uri = '/entity/%s%s' % (catalog_table, default_param)
             logging.debug(
                 "Attempting catalog record create [%s] with data: %s" % (create_uri, json.dumps(row)))
-            return self.catalog.post(create_uri, json=[row]).json()
+            return response_json(self.catalog.post(create_uri, json=[row]))
         except:
             (etype, value, traceback) = sys.exc_info()
             raise CatalogCreateError(format_exception(value))
@@ -809,7 +814,7 @@ class DerivaUpload(object):
             )
             logging.debug(
                 "Attempting catalog record update [%s] with data: %s" % (update_uri, json.dumps(combined_row)))
-            return self.catalog.put(update_uri, json=[combined_row]).json()
+            return response_json(self.catalog.put(update_uri, json=[combined_row]))
         except:
             (etype, value, traceback) = sys.exc_info()
             raise CatalogUpdateError(format_exception(value))
@@ -880,7 +885,7 @@ class DerivaUpload(object):
         try:
             self.transfer_state_fp.seek(0, 0)
             self.transfer_state_fp.truncate()
-            json.dump(self.transfer_state, self.transfer_state_fp, indent=2)
+            self.transfer_state_fp.write(json_dumps(self.transfer_state, indent=2))
             self.transfer_state_fp.flush()
         except Exception as e:
             logging.warning("Unable to write transfer state file: %s" % format_exception(e))
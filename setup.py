@@ -61,8 +61,12 @@ setup(
         'portalocker',
         'portalocker>=1.2.1; platform_system == "Windows"',
         'scandir; python_version <= "2.7"',
+        'futures; python_version <= "2.7"',
         'bdbag>=1.4.1'
     ],
+    extras_require={
+        'async': ['aiohttp; python_version >= "3.5"'],
+    },
     license='Apache 2.0',
     classifiers=[
         'Intended Audience :: Science/Research',
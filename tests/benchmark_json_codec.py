@@ -0,0 +1,39 @@
+"""Benchmark of the installed JSON codecs on an ERMrest-like entity document.
+
+Run with: python -m tests.benchmark_json_codec [rows]
+"""
+import sys
+import time
+
+from deriva.core.json_codec import get_json_codec_names, _make_json_codec, JSONCodec
+
+
+def _rows(n):
+    return [{'RID': '1-%04X' % i, 'RCT': '2020-01-01T00:00:00.000000+00:00', 'int8': i * 1000003, 'float8': i * 0.1,
+             'text': 'text value %d' % i, 'boolean': i % 2 == 0, 'null': None} for i in range(n)]
+
+
+def _best(fn, repeat=5):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        fn()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(n=100000):
+    rows = _rows(n)
+    document = JSONCodec().dumps_bytes(rows)
+    print("%d rows, %.1f MB" % (n, len(document) / 1e6))
+    print("%-8s %10s %10s" % ('codec', 'loads', 'dumps'))
+    for name in get_json_codec_names():
+        codec = _make_json_codec(name)
+        loads = _best(lambda: codec.loads(document))
+        dumps = _best(lambda: codec.dumps_bytes(rows))
+        print("%-8s %8.1fms %8.1fms" % (name, loads * 1000, dumps * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
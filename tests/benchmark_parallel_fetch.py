@@ -0,0 +1,64 @@
+"""Benchmark of the serial and parallel fetch of an entity set from a local mock ERMrest catalog.
+
+The mock delays each response by a fixed latency plus its size over a per-connection bandwidth, as a remote
+catalog streaming results would.
+
+Run with: python -m tests.benchmark_parallel_fetch [rows] [workers]
+"""
+import sys
+import time
+
+from deriva.core import ErmrestCatalog
+from tests.local_server import LocalServer, ErmrestEntities, NO_RETRY_SESSION_CONFIG
+
+LATENCY = 0.05
+"""Seconds before the first byte of each response"""
+
+BANDWIDTH = 1e6
+"""Bytes per second of each connection"""
+
+COLUMNS = [('RID', 'ermrest_rid'), ('v', 'int4'), ('k', 'text')]
+
+
+def _rows(n):
+    return [{'RID': '1-%05X' % i, 'v': i * 7919 % n, 'k': 'text value %d ' % i + 'x' * 200} for i in range(n)]
+
+
+def _delayed(handler):
+    def handle(request):
+        status, body, headers = handler(request)
+        time.sleep(LATENCY + len(body) / BANDWIDTH)
+        return status, body, headers
+    return handle
+
+
+def _best(fn, repeat=3):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        fn()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(n=5000, workers=8):
+    handler = ErmrestEntities({'t': (COLUMNS, _rows(n))})
+    with LocalServer(_delayed(handler)) as server:
+        catalog = ErmrestCatalog('http', server.host, '1', caching=False, session_config=NO_RETRY_SESSION_CONFIG)
+        t = catalog.getPathBuilder().s.t
+        print("%d rows, %d workers" % (n, workers))
+        print("%-28s %10s" % ('fetch', 'seconds'))
+        cases = [
+            ('fetch()', lambda: t.entities().fetch()),
+            ('fetch_parallel()', lambda: t.entities().fetch_parallel(workers)),
+            ('fetch_parallel(ordered)', lambda: t.entities().fetch_parallel(workers, ordered=True)),
+            ("fetch_parallel(key='v')", lambda: t.entities().fetch_parallel(workers, key='v')),
+        ]
+        for name, fn in cases:
+            assert len(fn()) == n
+            print("%-28s %9.2fs" % (name, _best(fn)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
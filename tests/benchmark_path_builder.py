@@ -0,0 +1,80 @@
+"""Benchmark of the startup time and memory of the datapath path builder on a synthetic catalog model.
+
+The model has 5,000 tables of 20 columns in 10 schemas by default. Times are the best of a few runs, and memory is
+the size of the objects allocated by each step and still alive at its end, as measured by tracemalloc.
+
+Run with: python -m tests.benchmark_path_builder [tables]
+"""
+import sys
+import json
+import time
+import tracemalloc
+
+from deriva.core import ErmrestCatalog, datapath
+from tests.local_server import LocalServer, NO_RETRY_SESSION_CONFIG
+
+SCHEMAS = 10
+COLUMNS = 20
+
+
+def _model(tables):
+    def column(i):
+        return {'name': 'c%d' % i, 'type': {'typename': 'text' if i % 2 else 'int4'}, 'nullok': True,
+                'default': None, 'comment': 'column %d' % i, 'annotations': {}, 'acls': {}, 'acl_bindings': {}}
+
+    schemas = dict(('s%d' % s, {'schema_name': 's%d' % s, 'comment': None, 'annotations': {}, 'tables': {}})
+                   for s in range(SCHEMAS))
+    for t in range(tables):
+        sname = 's%d' % (t % SCHEMAS)
+        schemas[sname]['tables']['t%d' % t] = {
+            'schema_name': sname, 'table_name': 't%d' % t, 'kind': 'table', 'comment': None, 'annotations': {},
+            'column_definitions': [column(i) for i in range(COLUMNS)], 'keys': [], 'foreign_keys': []}
+    return {'schemas': schemas}
+
+
+def _measure(fn, repeat=3):
+    """Returns the best time of fn() and the memory it allocated which is still alive, with the result of fn()."""
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        fn()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return best, size, result
+
+
+def _eager(catalog):
+    # every wrapper, as built by a path builder which is not lazy
+    return [column for schema in catalog.schemas.values() for table in schema.tables.values()
+            for column in table.column_definitions.values()]
+
+
+def main(tables=5000):
+    doc = _model(tables)
+    body = json.dumps(doc).encode('utf-8')
+    kwargs = datapath._kwargs(catalog=None)
+    print("%d tables of %d columns, %.1f MB model document" % (tables, COLUMNS, len(body) / 1e6))
+    print("%-36s %10s %10s" % ('step', 'time', 'memory'))
+
+    def report(name, fn):
+        elapsed, size, result = _measure(fn)
+        print("%-36s %8.2fms %8.1fKB" % (name, elapsed * 1000, size / 1e3))
+        return result
+
+    report('Catalog()', lambda: datapath.Catalog(doc, **kwargs))
+    report('Catalog().s3.t3.c3', lambda: datapath.Catalog(doc, **kwargs).s3.t3.c3)
+    report('Catalog() with every wrapper', lambda: _eager(datapath.Catalog(doc, **kwargs)))
+
+    with LocalServer(lambda request: (200, body, {'Content-Type': 'application/json', 'ETag': '"1"'})) as server:
+        catalog = ErmrestCatalog('http', server.host, '1', caching=False, session_config=NO_RETRY_SESSION_CONFIG)
+        report('getPathBuilder(), schema fetched', lambda: (catalog.clearSchemaCache(), catalog.getPathBuilder()))
+        catalog.getPathBuilder()
+        report('getPathBuilder(), schema memoized', catalog.getPathBuilder)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
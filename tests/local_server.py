@@ -0,0 +1,301 @@
+"""A local stand-in HTTP server for tests of the bindings, which need no network access or real Deriva services."""
+import re
+import json
+import operator as operator_
+import threading
+from collections import namedtuple
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+
+Request = namedtuple('Request', ['method', 'path', 'headers', 'body'])
+"""A request received by the LocalServer, with its headers as a dictionary with lower case keys"""
+
+
+class _ThreadingHTTPServer (ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LocalServer (object):
+    """A threaded HTTP server on the loopback interface answering requests with a handler function.
+
+       Arguments:
+         handler: function of a Request returning a (status, body,
+           headers) tuple, where body is bytes and headers a dictionary,
+           or None to close the connection without a response. The body
+           may also be an iterable of bytes, each written as soon as it
+           is produced, if the headers include its Content-Length.
+
+       The requests received are recorded in the requests list. Use the
+       server as a context manager, and its host as the server name of
+       bindings with the 'http' scheme.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler (BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately, which would otherwise wait for delayed acknowledgements
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                request = Request(self.command, self.path, dict((k.lower(), v) for k, v in self.headers.items()), body)
+                with server._lock:
+                    server.requests.append(request)
+                response = server.handler(request)
+                if response is None:
+                    self.close_connection = True
+                    return
+                status, content, headers = response
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                if isinstance(content, bytes):
+                    self.send_header('Content-Length', str(len(content)))
+                    content = [content]
+                self.end_headers()
+                if self.command != 'HEAD':
+                    for part in content:
+                        self.wfile.write(part)
+                        self.wfile.flush()
+
+            do_GET = do_HEAD = do_PUT = do_POST = do_DELETE = _handle
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.host = '127.0.0.1:%d' % self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def received(self, method=None, path=None):
+        """Returns the requests received, optionally only those with the given method and path prefix."""
+        with self._lock:
+            return [r for r in self.requests
+                    if (method is None or r.method == method) and (path is None or r.path.startswith(path))]
+
+
+class HatracUploads (object):
+    """Handler of a minimal Hatrac chunked upload protocol, assembling the uploaded objects in memory."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        path, _, job = request.path.partition(';upload')
+        job = job.split('?')[0].lstrip('/')
+        with self._lock:
+            if request.method == 'HEAD':
+                return 404, b'', {}
+            if request.method == 'POST' and not job:
+                job = 'job%d' % len(self.jobs)
+                self.jobs[job] = {'spec': json.loads(request.body.decode('utf-8')), 'chunks': {}}
+                return 201, ('%s;upload/%s\n' % (path, job)).encode('utf-8'), {'Content-Type': 'text/uri-list'}
+            if request.method == 'GET':
+                return 200, json.dumps(self.jobs[job]['spec']).encode('utf-8'), {'Content-Type': 'application/json'}
+            if request.method == 'PUT':
+                job, chunk = job.split('/')
+                self.jobs[job]['chunks'][int(chunk)] = request
+                return 204, b'', {}
+            if request.method == 'POST':
+                chunks = self.jobs[job]['chunks']
+                self.objects[path] = b''.join(chunks[i].body for i in sorted(chunks))
+                return 201, ('%s:1\n' % path).encode('utf-8'), {'Content-Type': 'text/uri-list'}
+        return 405, b'', {}
+
+
+class ErmrestEntities (object):
+    """Handler of a minimal read-only ERMrest catalog '1' with the tables of schema 's' held in memory.
+
+       Arguments:
+         tables: dictionary of table names to (columns, rows) tuples,
+           where columns is a list of (name, type) tuples, and each
+           type a typename or a column type document
+         collation: key function ordering text values as the catalog
+           does, which may differ from the order of python strings
+         foreign_keys: dictionary of table names to lists of the
+           foreign key documents of the tables in the catalog model
+
+       Supports entity, attribute, attributegroup and aggregate paths
+       over one table with filters, conjunctions, disjunctions and
+       negations, the cnt, cnt_d, min and max aggregates, @sort, @after
+       and ?limit. The number of rows returned for each path is
+       recorded in results.
+    """
+
+    _path = re.compile(r'/ermrest/catalog/1/(entity|attribute|attributegroup|aggregate)/(?:\w+:=)?s:(\w+)(/[^@?]*)?'
+                       r'(?:@sort\(([^)]*)\))?(?:@after\(([^)]*)\))?(?:\?limit=(\d+))?$')
+    _filter = re.compile(r'^(?:\w+:)?(\w+)(=|::geq::|::gt::|::leq::|::lt::|::null::)(.*)$')
+    _aggregate = re.compile(r'^(cnt|cnt_d|min|max)\((.*)\)$')
+
+    def __init__(self, tables, collation=None, foreign_keys=None):
+        self.tables = tables
+        self.collation = collation or (lambda value: value)
+        self.foreign_keys = foreign_keys or {}
+        self.results = []
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if request.path == '/ermrest/catalog/1/schema':
+            return self._json({'schemas': {'s': {'tables': dict(
+                (name, {'column_definitions': [{'name': c, 'type': _type_doc(t), 'comment': None}
+                                               for c, t in columns],
+                        'foreign_keys': self.foreign_keys.get(name, [])})
+                for name, (columns, rows) in self.tables.items())}}})
+        m = self._path.match(request.path)
+        if request.method != 'GET' or not m:
+            return 404, b'', {}
+        api, table, parts, sort, after, limit = m.groups()
+        columns, rows = self.tables[table]
+        types = dict((name, _base_typename(t)) for name, t in columns)
+        parts = [part for part in (parts or '').split('/') if part]
+        projection = parts.pop() if api != 'entity' else None
+        for part in parts:
+            test = self._compile(part, types)
+            rows = [row for row in rows if test(row)]
+        if api == 'aggregate':
+            rows = [dict(self._compute(item, rows) for item in projection.split(','))]
+        elif api == 'attribute':
+            items = [self._item(item) for item in projection.split(',')]
+            rows = [dict((name, row[column]) for name, column in items) for row in rows]
+        elif api == 'attributegroup':
+            keys, _, attributes = projection.partition(';')
+            rows = self._group([self._item(key) for key in keys.split(',')], attributes, rows)
+        if sort:
+            column = unquote(sort)
+            if rows and column not in rows[0]:
+                return 409, ('Sort key %s is not an output column.' % column).encode('utf-8'), {}
+            # nulls last, as the catalog sorts them
+            rows = sorted(rows, key=lambda row: self._nulls_last(row[column]))
+            if after:
+                b = self._key(self._literal(after, types.get(column, 'text')))
+                rows = [row for row in rows if row[column] is None or self._key(row[column]) > b]
+        if limit:
+            rows = rows[:int(limit)]
+        with self._lock:
+            self.results.append((request.path, len(rows)))
+        return self._json(rows)
+
+    def _key(self, value):
+        return self.collation(value) if isinstance(value, str) else value
+
+    def _nulls_last(self, value):
+        return (value is None, self._key(value) if value is not None else 0)
+
+    @staticmethod
+    def _item(item):
+        """Returns the output name and the column name of a projected attribute."""
+        name, _, column = item.rpartition(':=')
+        column = column.split(':')[-1]
+        return name or column, column
+
+    def _group(self, keys, attributes, rows):
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(row[column] for name, column in keys), []).append(row)
+        results = []
+        for values in sorted(groups, key=lambda values: [self._nulls_last(value) for value in values]):
+            group = dict((name, value) for (name, column), value in zip(keys, values))
+            for item in filter(None, attributes.split(',')):
+                if self._aggregate.match(item.rpartition(':=')[2]):
+                    group.update([self._compute(item, groups[values])])
+                else:
+                    name, column = self._item(item)
+                    group[name] = groups[values][0][column]
+            results.append(group)
+        return results
+
+    def _compute(self, item, rows):
+        name, expression = item.split(':=')
+        function, column = self._aggregate.match(expression).groups()
+        values = rows if column == '*' else [row[column.split(':')[-1]] for row in rows
+                                             if row[column.split(':')[-1]] is not None]
+        if function == 'cnt':
+            return name, len(values)
+        if function == 'cnt_d':
+            return name, len(set(values))
+        return name, (min if function == 'min' else max)(values, key=self._key) if values else None
+
+    def _compile(self, formula, types):
+        """Returns a function testing whether a row satisfies the filter formula."""
+        for operator, combine in ((';', any), ('&', all)):
+            terms = _split_outside_parentheses(formula, operator)
+            if len(terms) > 1:
+                tests = [self._compile(term, types) for term in terms]
+                return lambda row: combine(test(row) for test in tests)
+        if formula.startswith('!'):
+            test = self._compile(formula[1:], types)
+            return lambda row: not test(row)
+        if formula.startswith('(') and formula.endswith(')'):
+            return self._compile(formula[1:-1], types)
+        column, operator, literal = self._filter.match(formula).groups()
+        if operator == '::null::':
+            return lambda row: row[column] is None
+        literal = self._literal(literal, types[column])
+        compare = {'=': operator_.eq, '::geq::': operator_.ge, '::gt::': operator_.gt, '::leq::': operator_.le,
+                   '::lt::': operator_.lt}[operator]
+        b = self._key(literal)
+        return lambda row: row[column] is not None and compare(self._key(row[column]), b)
+
+    @staticmethod
+    def _literal(literal, typename):
+        literal = unquote(literal)
+        return int(literal) if typename.startswith('int') else float(literal) if typename.startswith('float') \
+            else literal
+
+    @staticmethod
+    def _json(doc):
+        return 200, json.dumps(doc).encode('utf-8'), {'Content-Type': 'application/json'}
+
+
+def _type_doc(column_type):
+    return {'typename': column_type} if isinstance(column_type, str) else column_type
+
+
+def _base_typename(column_type):
+    column_type = _type_doc(column_type)
+    while column_type.get('base_type'):
+        column_type = column_type['base_type']
+    return column_type['typename']
+
+
+def _split_outside_parentheses(formula, separator):
+    terms, depth, start = [], 0, 0
+    for i, c in enumerate(formula):
+        depth += {'(': 1, ')': -1}.get(c, 0)
+        if c == separator and depth == 0:
+            terms.append(formula[start:i])
+            start = i + 1
+    return terms + [formula[start:]]
+
+
+NO_RETRY_SESSION_CONFIG = {
+    'retry_connect': 0,
+    'retry_read': 0,
+    'retry_backoff_factor': 0,
+    'retry_status_forcelist': [],
+}
+"""Session configuration of bindings to a LocalServer, whose failures are not worth retrying"""
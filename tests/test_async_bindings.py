@@ -0,0 +1,177 @@
+import os
+import base64
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+import unittest
+
+from deriva.core import NotModified
+
+try:
+    import aiohttp
+    from deriva.core.async_bindings import AsyncErmrestCatalog, AsyncHatracStore
+except ImportError:
+    aiohttp = None
+
+from tests.local_server import LocalServer, HatracUploads, NO_RETRY_SESSION_CONFIG
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@unittest.skipIf(aiohttp is None, "The 'aiohttp' package is not installed.")
+class AsyncErmrestCatalogTest (unittest.TestCase):
+
+    def test_retries_configured_status(self):
+        failures = []
+
+        def handler(request):
+            if len(failures) < 2:
+                failures.append(request)
+                return 503, b'busy', {}
+            return 200, b'[]', {'Content-Type': 'application/json'}
+
+        config = dict(NO_RETRY_SESSION_CONFIG, retry_read=2, retry_status_forcelist=[503])
+
+        async def main(host):
+            async with AsyncErmrestCatalog('http', host, '1', session_config=config) as catalog:
+                return await catalog.get('/entity/s:t')
+
+        with LocalServer(handler) as server:
+            r = _run(main(server.host))
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(len(server.received('GET')), 3)
+
+    def test_retries_exhausted(self):
+        config = dict(NO_RETRY_SESSION_CONFIG, retry_read=1, retry_status_forcelist=[503])
+
+        async def main(host):
+            async with AsyncErmrestCatalog('http', host, '1', session_config=config) as catalog:
+                return await catalog.get('/entity/s:t')
+
+        with LocalServer(lambda request: (503, b'busy', {})) as server:
+            with self.assertRaises(Exception):
+                _run(main(server.host))
+            self.assertEqual(len(server.received('GET')), 2)
+
+    def test_not_modified_serves_cached_response(self):
+        def handler(request):
+            if request.headers.get('if-none-match') == '"v1"':
+                return 304, b'', {'ETag': '"v1"'}
+            return 200, b'[{"RID": "1"}]', {'ETag': '"v1"', 'Content-Type': 'application/json'}
+
+        async def main(host):
+            async with AsyncErmrestCatalog('http', host, '1', session_config=NO_RETRY_SESSION_CONFIG) as catalog:
+                first = await catalog.get('/entity/s:t')
+                second = await catalog.get('/entity/s:t')
+                with self.assertRaises(NotModified):
+                    await catalog.get('/entity/s:t', raise_not_modified=True)
+                return second
+
+        with LocalServer(handler) as server:
+            second = _run(main(server.host))
+            self.assertEqual(second.json(), [{'RID': '1'}])
+            self.assertEqual(second.status_code, 200)
+            requests = server.received('GET')
+            self.assertEqual(len(requests), 3)
+            self.assertNotIn('if-none-match', requests[0].headers)
+            self.assertEqual(requests[1].headers.get('if-none-match'), '"v1"')
+
+    def test_coalesces_concurrent_identical_gets(self):
+        def handler(request):
+            time.sleep(0.2)
+            return 200, b'[]', {'Content-Type': 'application/json'}
+
+        async def main(host):
+            async with AsyncErmrestCatalog('http', host, '1', session_config=NO_RETRY_SESSION_CONFIG) as catalog:
+                return await asyncio.gather(*[catalog.get('/entity/s:t') for i in range(10)])
+
+        with LocalServer(handler) as server:
+            responses = _run(main(server.host))
+            self.assertEqual(len(responses), 10)
+            self.assertEqual(len(server.received('GET')), 1)
+
+    def _governed_get(self, host, blocker):
+        config = dict(NO_RETRY_SESSION_CONFIG, adaptive_concurrency={'initial_limit': 1, 'max_limit': 1})
+
+        async def main():
+            async with AsyncErmrestCatalog('http', host, '1', session_config=config) as catalog:
+                governor = catalog.governor
+                self.assertTrue(governor.acquire(timeout=1))
+                thread = threading.Thread(target=blocker, args=(governor,))
+                thread.start()
+                start = time.time()
+                r = await catalog.get('/entity/s:t')
+                thread.join()
+                return r, time.time() - start, governor
+
+        return _run(main())
+
+    def test_governor_release_wakes_waiting_request(self):
+        listeners = []
+
+        def blocker(governor):
+            time.sleep(0.3)
+            listeners.append(len(governor._listeners))
+            governor.release(0.01, 200)
+
+        with LocalServer(lambda request: (200, b'[]', {'Content-Type': 'application/json'})) as server:
+            r, elapsed, governor = self._governed_get(server.host, blocker)
+            self.assertEqual(r.status_code, 200)
+            # the waiting request registered one listener rather than polling the governor
+            self.assertEqual(listeners, [1])
+            self.assertGreaterEqual(elapsed, 0.3)
+            self.assertLess(elapsed, 1.0)
+            self.assertEqual(governor.stats()['in_flight'], 0)
+
+    def test_governor_hold_expiry_wakes_waiting_request(self):
+        def blocker(governor):
+            time.sleep(0.1)
+            governor.release(0.01, 503, retry_after=0.3)
+
+        with LocalServer(lambda request: (200, b'[]', {'Content-Type': 'application/json'})) as server:
+            r, elapsed, governor = self._governed_get(server.host, blocker)
+            self.assertEqual(r.status_code, 200)
+            self.assertGreaterEqual(elapsed, 0.4)
+            self.assertLess(elapsed, 1.2)
+
+
+@unittest.skipIf(aiohttp is None, "The 'aiohttp' package is not installed.")
+class AsyncHatracStoreTest (unittest.TestCase):
+
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(10 * 1024 + 123))
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def test_chunked_upload(self):
+        uploads = HatracUploads()
+
+        async def main(host):
+            async with AsyncHatracStore('http', host, session_config=NO_RETRY_SESSION_CONFIG) as store:
+                return await store.put_loc('/hatrac/ns/obj', self.file_path, chunked=True, chunk_size=1024,
+                                           concurrency=3)
+
+        with LocalServer(uploads) as server:
+            location = _run(main(server.host))
+            self.assertEqual(location, '/hatrac/ns/obj:1')
+            with open(self.file_path, 'rb') as f:
+                content = f.read()
+            self.assertEqual(uploads.objects['/hatrac/ns/obj'], content)
+            self.assertEqual(len(server.received('PUT')), 11)
+            spec = list(uploads.jobs.values())[0]['spec']
+            self.assertEqual(spec['content-md5'], base64.b64encode(hashlib.md5(content).digest()).decode('ascii'))
+
+
+if __name__ == '__main__':
+    unittest.main()
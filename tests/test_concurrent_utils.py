@@ -0,0 +1,69 @@
+import time
+import itertools
+import threading
+import unittest
+
+from deriva.core.utils.concurrent_utils import map_concurrently
+
+
+class MapConcurrentlyTest (unittest.TestCase):
+
+    def test_ordered_results_follow_input(self):
+        # the first items complete last
+        results = list(map_concurrently(lambda i: time.sleep(0.01 * (4 - i)) or i * i, range(5), 5))
+        self.assertEqual(results, [(i, i * i) for i in range(5)])
+
+    def test_unordered_results_follow_completion(self):
+        results = list(map_concurrently(lambda i: time.sleep(0.05 * (4 - i)) or i * i, range(5), 5, ordered=False))
+        self.assertEqual(results, [(i, i * i) for i in reversed(range(5))])
+
+    def test_items_in_flight_are_bounded(self):
+        active, peak, pulled, lock = [0], [0], [], threading.Lock()
+
+        def items():
+            for i in itertools.count():
+                pulled.append(i)
+                yield i
+
+        def fn(i):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.005)
+            with lock:
+                active[0] -= 1
+            return i
+
+        for ordered in (True, False):
+            del pulled[:]
+            peak[0] = 0
+            results = map_concurrently(fn, items(), 3, ordered=ordered)
+            for count, (item, result) in enumerate(itertools.islice(results, 30), 1):
+                # items are consumed lazily, at most twice as many as workers ahead of the results
+                self.assertLessEqual(len(pulled), count + 6)
+            results.close()
+            self.assertEqual(peak[0], 3)
+
+    def test_exceptions(self):
+        calls = []
+
+        def fn(i):
+            calls.append(i)
+            if i == 2:
+                raise ValueError(i)
+            time.sleep(0.01)
+            return i
+
+        results = list(map_concurrently(fn, range(5), 2, return_exceptions=True))
+        self.assertEqual([item for item, result in results], list(range(5)))
+        self.assertIsInstance(results[2][1], ValueError)
+        self.assertEqual([result for item, result in results if item != 2], [0, 1, 3, 4])
+
+        del calls[:]
+        self.assertRaises(ValueError, list, map_concurrently(fn, range(100), 2))
+        # the remaining items are not started
+        self.assertLess(len(calls), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
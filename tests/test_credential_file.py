@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from deriva.core import write_credential, read_credential, get_credential, lock_file, _takes_truncate
+
+
+class _LegacyLock (object):
+    # the signature of portalocker.Lock up to release 0.6.1
+    def __init__(self, filename, mode='a', truncate=0, timeout=5, check_interval=0.25, fail_when_locked=True,
+                 flags=None):
+        pass
+
+
+class _Lock (object):
+    def __init__(self, filename, mode='a', timeout=None, check_interval=0.25, fail_when_locked=False, flags=None,
+                 **file_open_kwargs):
+        pass
+
+
+class CredentialFileTest (unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'deriva', 'credential.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_credential_round_trip(self):
+        credential = {'example.org': {'cookie': 'webauthn=abc'}}
+        write_credential(self.path, credential)
+        self.assertEqual(read_credential(self.path), credential)
+        self.assertEqual(get_credential('example.org', self.path), {'cookie': 'webauthn=abc'})
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_shared_locks_read_concurrently(self):
+        write_credential(self.path, {})
+        with lock_file(self.path, mode='r', exclusive=False) as first:
+            with lock_file(self.path, mode='r', exclusive=False) as second:
+                self.assertEqual(first.read(), second.read())
+
+    def test_portalocker_without_version_attribute(self):
+        import portalocker
+        version = portalocker.__dict__.pop('__version__', None)
+        try:
+            write_credential(self.path, {'example.org': {}})
+            self.assertEqual(read_credential(self.path), {'example.org': {}})
+        finally:
+            if version is not None:
+                portalocker.__version__ = version
+
+    def test_truncate_argument_is_detected_from_signature(self):
+        self.assertTrue(_takes_truncate(_LegacyLock))
+        self.assertFalse(_takes_truncate(_Lock))
+
+
+if __name__ == '__main__':
+    unittest.main()
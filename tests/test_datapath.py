@@ -0,0 +1,618 @@
+import io
+import re
+import json
+import time
+import string
+import threading
+import unittest
+
+try:
+    from urllib.parse import unquote
+except ImportError:
+    from urllib import unquote
+
+try:
+    import numpy
+    import pandas
+except ImportError:
+    numpy = pandas = None
+
+from deriva.core import ErmrestCatalog, datapath
+from tests.local_server import LocalServer, ErmrestEntities, NO_RETRY_SESSION_CONFIG
+
+COLUMNS = [('RID', 'ermrest_rid'), ('v', 'int4'), ('k', 'text')]
+
+
+def _rows(n, value=lambda i: i, key=lambda i: 'k%03d' % i):
+    return [{'RID': '1-%04d' % i, 'v': value(i), 'k': key(i)} for i in range(n)]
+
+
+def _foreign_key(name, table, columns, referenced_table, referenced_columns):
+    return {'names': [['s', name]],
+            'foreign_key_columns': [{'schema_name': 's', 'table_name': table, 'column_name': c} for c in columns],
+            'referenced_columns': [{'schema_name': 's', 'table_name': referenced_table, 'column_name': c}
+                                   for c in referenced_columns]}
+
+
+def _catalog(server):
+    return ErmrestCatalog('http', server.host, '1', caching=False, session_config=NO_RETRY_SESSION_CONFIG)
+
+
+class ParallelFetchTest (unittest.TestCase):
+
+    def _fetch(self, handler, key, **kwargs):
+        with LocalServer(handler) as server:
+            t = _catalog(server).getPathBuilder().s.t
+            return list(t.entities().iter_parallel(key=key, **kwargs))
+
+    def _assertRanges(self, handler, rows, entities):
+        """Asserts the entities are the rows, fetched by requests for disjoint and non-empty ranges."""
+        self.assertEqual(sorted(e['RID'] for e in entities), sorted(r['RID'] for r in rows))
+        fetched = [count for path, count in handler.results if '/entity/' in path]
+        self.assertEqual(sum(fetched), len(rows))
+        self.assertNotIn(0, fetched)
+        return fetched
+
+    def test_null_keys_are_fetched_in_own_partition(self):
+        rows = _rows(50, value=lambda i: None if i % 5 == 0 else i)
+        handler = ErmrestEntities({'t': (COLUMNS, rows)})
+        entities = self._fetch(handler, 'v', workers=2, partitions=4)
+        self.assertGreater(len(self._assertRanges(handler, rows, entities)), 2)
+        nulls = [count for path, count in handler.results if '/entity/' in path and 'v::null::' in path]
+        self.assertEqual(nulls, [10])
+
+    def test_only_null_keys(self):
+        rows = _rows(5, value=lambda i: None)
+        handler = ErmrestEntities({'t': (COLUMNS, rows)})
+        entities = self._fetch(handler, 'v', workers=2)
+        self.assertEqual(self._assertRanges(handler, rows, entities), [5])
+
+    def test_split_points_follow_catalog_collation(self):
+        # mixed case keys, which a case-insensitive catalog orders differently from python
+        alphabet = string.digits + string.ascii_uppercase + string.ascii_lowercase
+        rows = _rows(124, key=lambda i: 'x%s%03d' % (alphabet[i % 62], i))
+        handler = ErmrestEntities({'t': (COLUMNS, rows)}, collation=lambda value: value.lower())
+        entities = self._fetch(handler, 'k', workers=3, partitions=8, ordered=True)
+        self.assertGreater(len(self._assertRanges(handler, rows, entities)), 2)
+        keys = [e['k'] for e in entities]
+        self.assertEqual(keys, sorted(keys, key=lambda value: value.lower()))
+        self.assertNotEqual(keys, sorted(keys))
+        ranges = [re.search(r'::geq::(.*)\)&\(t:k::lt::(.*)\)$', unquote(path)) for path, count in handler.results]
+        # some range bounds are in the order of the catalog only
+        self.assertIn(True, [m.group(1) > m.group(2) for m in ranges if m])
+
+    def test_clustered_keys_skip_empty_ranges(self):
+        rows = _rows(20, value=lambda i: i if i < 19 else 10 ** 6)
+        handler = ErmrestEntities({'t': (COLUMNS, rows)})
+        entities = self._fetch(handler, 'v', workers=2, partitions=16)
+        self.assertLess(len(self._assertRanges(handler, rows, entities)), 16)
+
+    def test_empty_entity_set(self):
+        handler = ErmrestEntities({'t': (COLUMNS, [])})
+        self.assertEqual(self._fetch(handler, 'v', workers=2), [])
+
+    def test_split_points_are_counted_by_at_most_workers_requests(self):
+        active, peak, lock = [0], [0], threading.Lock()
+        handler = ErmrestEntities({'t': (COLUMNS, _rows(100))})
+
+        def counting(request):
+            if '/aggregate/' in request.path and '::lt::' in request.path:
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+            return handler(request)
+
+        entities = self._fetch(counting, 'v', workers=2, partitions=12)
+        self.assertEqual(len(entities), 100)
+        self.assertEqual(len([p for p, c in handler.results if '::lt::' in p and '/aggregate/' in p]), 11)
+        self.assertLessEqual(peak[0], 2)
+
+    def _slow_first_range(self, handler):
+        def handle(request):
+            if '/entity/' in request.path and '::lt::' in request.path and '::geq::' not in request.path:
+                time.sleep(0.2)
+            return handler(request)
+        return handle
+
+    def test_ordered_entities_follow_key(self):
+        rows = _rows(60, value=lambda i: i * 37 % 60)
+        handler = ErmrestEntities({'t': (COLUMNS, rows)})
+        entities = self._fetch(self._slow_first_range(handler), 'v', workers=3, partitions=6, ordered=True)
+        self.assertEqual([e['v'] for e in entities], list(range(60)))
+        self.assertGreater(len(self._assertRanges(handler, rows, entities)), 2)
+        for path, count in handler.results:
+            if '/entity/' in path:
+                self.assertTrue(path.endswith('@sort(v)'), path)
+
+    def test_unordered_entities_follow_completion(self):
+        rows = _rows(60)
+        handler = ErmrestEntities({'t': (COLUMNS, rows)})
+        entities = self._fetch(self._slow_first_range(handler), 'v', workers=3, partitions=6)
+        self.assertEqual(sorted(e['v'] for e in entities), list(range(60)))
+        # the slow range of the smallest keys completes last
+        self.assertNotEqual(entities[0]['v'], 0)
+
+    def test_write_parallel(self):
+        rows = _rows(50, value=lambda i: None if i % 10 == 0 else i)
+        handler = ErmrestEntities({'t': (COLUMNS, rows)})
+        fileobj = io.StringIO()
+        with LocalServer(handler) as server:
+            t = _catalog(server).getPathBuilder().s.t
+            self.assertEqual(t.entities().write_parallel(fileobj, workers=2, key='v', ordered=True), 50)
+        lines = fileobj.getvalue().splitlines()
+        self.assertEqual(len(lines), 50)
+        entities = [json.loads(line) for line in lines]
+        self.assertEqual(sorted(e['RID'] for e in entities), sorted(r['RID'] for r in rows))
+        # the range of null keys is fetched first
+        self.assertEqual([e['v'] for e in entities], [None] * 5 + [i for i in range(50) if i % 10])
+
+
+class PagingTest (unittest.TestCase):
+
+    def _pages(self, rows, query, page_size, sort_key=lambda t: 'RID'):
+        self.handler = ErmrestEntities({'t': (COLUMNS, rows)})
+        with LocalServer(self.handler) as server:
+            t = _catalog(server).getPathBuilder().s.t
+            return list(query(t).iter_pages(page_size, sort_key(t)))
+
+    def _requests(self):
+        return [(unquote(path), count) for path, count in self.handler.results]
+
+    def test_pages_follow_sort_key(self):
+        rows = _rows(25, key=lambda i: 'k%03d' % (i * 7 % 25))
+        pages = self._pages(rows[::-1], lambda t: t.entities(), 10)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual([e['RID'] for page in pages for e in page], [r['RID'] for r in rows])
+        self.assertEqual(self._requests(), [('/ermrest/catalog/1/entity/t:=s:t@sort(RID)?limit=10', 10),
+                                            ('/ermrest/catalog/1/entity/t:=s:t@sort(RID)@after(1-0009)?limit=10', 10),
+                                            ('/ermrest/catalog/1/entity/t:=s:t@sort(RID)@after(1-0019)?limit=10', 5)])
+
+    def test_full_last_page(self):
+        pages = self._pages(_rows(20), lambda t: t.filter(t.v >= 0).entities(), 10)
+        self.assertEqual([len(page) for page in pages], [10, 10])
+        # only a short or empty page ends the set
+        self.assertEqual([count for path, count in self._requests()], [10, 10, 0])
+
+    def test_empty_set(self):
+        self.assertEqual(self._pages(_rows(20), lambda t: t.filter(t.v < 0).entities(), 10), [])
+        self.assertEqual([count for path, count in self._requests()], [0])
+
+    def test_sort_key_column(self):
+        # text keys in another order than the RIDs, with characters to quote in the @after value
+        rows = _rows(12, key=lambda i: 'k(%02d)/x,y' % (i * 5 % 12))
+        pages = self._pages(rows, lambda t: t.entities(), 5, lambda t: t.k)
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual([e['k'] for page in pages for e in page], sorted(r['k'] for r in rows))
+        self.assertEqual([path.split('@', 1)[1] for path, count in self._requests()],
+                         ['sort(k)?limit=5', 'sort(k)@after(k(04)/x,y)?limit=5', 'sort(k)@after(k(09)/x,y)?limit=5'])
+        for path, count in self.handler.results:
+            self.assertNotIn('(k(', path)
+
+    def test_attribute_set(self):
+        rows = _rows(7, value=lambda i: 10 - i)
+        pages = self._pages(rows, lambda t: t.entities(t.v, t.k), 3, lambda t: 'v')
+        self.assertEqual([[e['v'] for e in page] for page in pages], [[4, 5, 6], [7, 8, 9], [10]])
+        self.assertEqual(set(pages[0][0]), {'v', 'k'})
+
+    def test_attribute_set_without_sort_key(self):
+        # the catalog rejects a sort key which is not an output column
+        with self.assertRaises(datapath.DataPathException) as cm:
+            self._pages(_rows(7), lambda t: t.entities(t.v, t.k), 3)
+        self.assertIn('409', str(cm.exception))
+        self.assertEqual(self._requests(), [])
+
+
+class AggregateTest (unittest.TestCase):
+
+    def setUp(self):
+        self.rows = _rows(10, value=lambda i: None if i == 9 else i % 3)
+        self.handler = ErmrestEntities({'t': (COLUMNS, self.rows)})
+        self.server = LocalServer(self.handler).__enter__()
+        self.t = _catalog(self.server).getPathBuilder().s.t
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def _requests(self):
+        return [unquote(path)[len('/ermrest/catalog/1'):] for path, count in self.handler.results]
+
+    def test_aggregates(self):
+        t = self.t
+        aggregates = t.filter(t.v >= 1).aggregates(n=datapath.Cnt(t), m=datapath.Max(t.v), d=datapath.CntD(t.v))
+        self.assertTrue(aggregates.uri.endswith('/aggregate/t:=s:t/v::geq::1/n:=cnt(*),m:=max(v),d:=cnt_d(v)'),
+                        aggregates.uri)
+        self.assertEqual(list(aggregates), [{'n': 6, 'm': 2, 'd': 2}])
+
+    def test_groups(self):
+        t = self.t
+        groups = t.groupby(t.v).attributes(n=datapath.Cnt(t), first=datapath.Min(t.k))
+        self.assertTrue(groups.uri.endswith('/attributegroup/t:=s:t/v;n:=cnt(*),first:=min(k)'), groups.uri)
+        self.assertEqual(list(groups), [{'v': 0, 'n': 3, 'first': 'k000'}, {'v': 1, 'n': 3, 'first': 'k001'},
+                                        {'v': 2, 'n': 3, 'first': 'k002'}, {'v': None, 'n': 1, 'first': 'k009'}])
+        groups = t.filter(~(t.v == None)).groupby(value=t.v).attributes(t.k)  # noqa: E711
+        self.assertTrue(groups.uri.endswith('/attributegroup/t:=s:t/!(v::null::)/value:=v;k'), groups.uri)
+        self.assertEqual([g['value'] for g in groups], [0, 1, 2])
+        self.assertTrue(t.groupby(t.k).attributes().uri.endswith('/attributegroup/t:=s:t/k'))
+
+    def test_aggregates_must_be_named(self):
+        t = self.t
+        self.assertRaises(datapath.DataPathException, t.groupby(t.v).attributes, datapath.Cnt(t))
+        self.assertRaises(datapath.DataPathException, t.groupby(t.v).attributes, t.k, datapath.Max(t.k))
+        self.assertRaises(datapath.DataPathException, t.aggregates)
+        self.assertRaises(datapath.DataPathException, t.aggregates, n=t.v)
+        self.assertRaises(datapath.DataPathException, t.groupby)
+        self.assertEqual(self._requests(), [])
+
+    def test_count_unfetched_set(self):
+        t = self.t
+        self.assertEqual(t.entities().count(), 10)
+        self.assertEqual(t.filter(t.v == 1).entities().count(), 3)
+        self.assertEqual(t.filter(t.v == 1).entities(t.k).count(), 3)
+        self.assertEqual(self._requests(), ['/aggregate/t:=s:t/n:=cnt(*)', '/aggregate/t:=s:t/v=1/n:=cnt(*)',
+                                            '/aggregate/t:=s:t/v=1/n:=cnt(*)'])
+
+    def test_count_fetched_set(self):
+        t = self.t
+        entities = t.filter(t.v == 1).entities().fetch()
+        groups = t.groupby(t.v).attributes().fetch()
+        del self.handler.results[:]
+        self.assertEqual(entities.count(), 3)
+        self.assertEqual(groups.count(), 4)
+        self.assertEqual(self._requests(), [])
+
+    def test_count_aggregates_and_groups(self):
+        t = self.t
+        self.assertEqual(t.aggregates(n=datapath.Cnt(t)).count(), 1)
+        self.assertRaises(datapath.DataPathException, t.groupby(t.v).attributes().count)
+        self.assertEqual(self._requests(), [])
+
+    def test_aggregates_and_groups_are_not_fetched_in_partitions(self):
+        t = self.t
+        for entities in (t.aggregates(n=datapath.Cnt(t)), t.groupby(t.v).attributes(n=datapath.Cnt(t))):
+            self.assertRaises(datapath.DataPathException, entities.fetch_parallel, 2)
+            self.assertRaises(datapath.DataPathException, entities.write_parallel, io.StringIO(), 2)
+        self.assertEqual(self._requests(), [])
+
+
+class PreparedPathTest (unittest.TestCase):
+
+    def setUp(self):
+        self.rows = _rows(20, value=lambda i: i % 4, key=lambda i: 'k %d/%s' % (i % 5, '&;()' if i % 2 else '{x}'))
+        self.handler = ErmrestEntities({'t': (COLUMNS, self.rows)})
+        self.server = LocalServer(self.handler).__enter__()
+        self.t = _catalog(self.server).getPathBuilder().s.t
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_bound_set_equals_literal_filter(self):
+        t = self.t
+        prepared = t.filter((t.k == datapath.Parameter('k')) | (t.v >= datapath.Parameter('lo'))).prepare(t.RID, t.k)
+        self.assertEqual(prepared.parameters, ['k', 'lo'])
+        self.assertTrue(prepared.uri.endswith('/attribute/t:=s:t/(k={k});(v::geq::{lo})/RID,k'), prepared.uri)
+        for key, lo in (('k 1/&;()', 3), ('k 2/{x}', 2), ('{k}', 5)):
+            bound = prepared.bind(k=key, lo=lo)
+            literal = t.filter((t.k == key) | (t.v >= lo)).entities(t.RID, t.k)
+            self.assertEqual(bound.uri, literal.uri)
+            self.assertEqual(list(bound), list(literal))
+            self.assertEqual(bound.count(), len(literal))
+
+    def test_bind_quotes_values(self):
+        t = self.t
+        prepared = t.filter(t.k == datapath.Parameter('k')).prepare()
+        bound = prepared.bind(k='a/b c&{k}')
+        self.assertTrue(bound.uri.endswith('/entity/t:=s:t/k=a%2Fb%20c%26%7Bk%7D'), bound.uri)
+        self.assertEqual(len(prepared.bind(k=self.rows[1]['k'])), 2)
+
+    def test_parameter_used_twice(self):
+        t = self.t
+        value = datapath.Parameter('value')
+        prepared = t.filter((t.v == value) | (t.RID == value)).prepare()
+        self.assertEqual(prepared.parameters, ['value'])
+        self.assertEqual(sorted(e['RID'] for e in prepared.bind(value=2)), ['1-0002', '1-0006', '1-0010', '1-0014',
+                                                                           '1-0018'])
+
+    def test_bind_rejects_missing_and_unknown_parameters(self):
+        t = self.t
+        prepared = t.filter((t.k == datapath.Parameter('k')) & (t.v == datapath.Parameter('v'))).prepare()
+        self.assertRaises(datapath.DataPathException, prepared.bind, k='x')
+        self.assertRaises(datapath.DataPathException, prepared.bind, k='x', v=1, w=2)
+        self.assertRaises(datapath.DataPathException, t.prepare().bind, k='x')
+        self.assertRaises(datapath.DataPathException, datapath.Parameter, 'not valid')
+        self.assertEqual(len(t.prepare().bind()), 20)
+
+    def test_compiled_paths_are_not_shared_between_paths(self):
+        t = self.t
+        path = t.filter(t.v == 1)
+        first, prepared = path.entities(), path.prepare()
+        self.assertTrue(first.uri.endswith('/entity/t:=s:t/v=1'), first.uri)
+        predicate = t.k == datapath.Parameter('k')
+        path.filter(predicate)
+        second = path.prepare()
+        # the parameter of the path has no value
+        self.assertRaises(datapath.DataPathException, path.entities)
+        other = t.filter(t.v == 2).filter(predicate).prepare()
+        self.assertTrue(second.uri.endswith('/entity/t:=s:t/v=1/k={k}'), second.uri)
+        self.assertTrue(first.uri.endswith('/entity/t:=s:t/v=1'), first.uri)
+        self.assertTrue(prepared.uri.endswith('/entity/t:=s:t/v=1'), prepared.uri)
+        self.assertTrue(other.uri.endswith('/entity/t:=s:t/v=2/k={k}'), other.uri)
+        key = self.rows[1]['k']
+        self.assertEqual([e['RID'] for e in second.bind(k=key)], ['1-0001'])
+        self.assertEqual([e['RID'] for e in other.bind(k=self.rows[6]['k'])], ['1-0006'])
+        self.assertEqual(len(prepared.bind()), 5)
+
+
+class PrefetchTest (unittest.TestCase):
+
+    def setUp(self):
+        self.parents = [{'RID': 'P%d' % i, 'k': 'k/%d' % (i % 3), 'n': i // 3} for i in range(9)]
+        self.children = [{'RID': 'C%02d' % i, 'parent': None if i % 7 == 6 else 'P%d' % (i % 5),
+                          'pk': 'k/%d' % (i % 3), 'pn': i % 4} for i in range(20)]
+        self.notes = [{'RID': 'N%d' % i, 'child': 'C%02d' % (i * 3 % 20)} for i in range(10)]
+        self.handler = ErmrestEntities(
+            {'parent': ([('RID', 'ermrest_rid'), ('k', 'text'), ('n', 'int4')], self.parents),
+             'child': ([('RID', 'ermrest_rid'), ('parent', 'text'), ('pk', 'text'), ('pn', 'int4')], self.children),
+             'note': ([('RID', 'ermrest_rid'), ('child', 'text')], self.notes)},
+            foreign_keys={
+                'child': [_foreign_key('child_parent_fkey', 'child', ['parent'], 'parent', ['RID']),
+                          _foreign_key('child_pair_fkey', 'child', ['pk', 'pn'], 'parent', ['k', 'n'])],
+                'note': [_foreign_key('note_child_fkey', 'note', ['child'], 'child', ['RID'])]})
+        self.server = LocalServer(self.handler).__enter__()
+        self.s = _catalog(self.server).getPathBuilder().s
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def _requests(self, table):
+        return [path for path, count in self.handler.results if ':=s:%s/' % table in path]
+
+    def _parent(self, **values):
+        return [p for p in self.parents if all(p[name] == value for name, value in values.items())]
+
+    def test_outbound_single_entity(self):
+        children = self.s.child.entities().prefetch(['s', 'child_parent_fkey'], name='parent_entity')
+        self.assertEqual(len(self._requests('parent')), 1)
+        for child in children:
+            expected = self._parent(RID=child['parent'])
+            self.assertEqual(child['parent_entity'], expected[0] if expected else None)
+        # null keys reference nothing
+        self.assertIsNone(children[6]['parent_entity'])
+
+    def test_outbound_by_table(self):
+        notes = self.s.note.entities().prefetch(self.s.child, name='owner')
+        self.assertEqual([n['owner'] for n in notes],
+                         [[c for c in self.children if c['RID'] == n['child']][0] for n in self.notes])
+        children = self.s.child.entities().prefetch(self.s.note)
+        self.assertEqual(sorted(n['RID'] for c in children for n in c['note']), sorted(n['RID'] for n in self.notes))
+
+    def test_inbound_list(self):
+        parents = self.s.parent.entities().prefetch(['s', 'child_parent_fkey'])
+        self.assertEqual(len(self._requests('child')), 1)
+        for parent in parents:
+            self.assertEqual(sorted(c['RID'] for c in parent['child']),
+                             [c['RID'] for c in self.children if c['parent'] == parent['RID']])
+        self.assertEqual(parents[8]['child'], [])
+
+    def test_composite_foreign_key(self):
+        children = self.s.child.entities().prefetch(['s', 'child_pair_fkey'], name='pair')
+        paths = [unquote(path) for path in self._requests('parent')]
+        self.assertEqual(len(paths), 1)
+        self.assertIn('(k=k/0&n=0);', paths[0].replace('%2F', '/'))
+        for child in children:
+            expected = self._parent(k=child['pk'], n=child['pn'])
+            self.assertEqual(child['pair'], expected[0] if expected else None)
+        self.assertIsNone(children[3]['pair'])
+        parents = self.s.parent.entities().prefetch(['s', 'child_pair_fkey'])
+        for parent in parents:
+            self.assertEqual(sorted(c['RID'] for c in parent['child']),
+                             [c['RID'] for c in self.children if (c['pk'], c['pn']) == (parent['k'], parent['n'])])
+
+    def test_split_in_list(self):
+        parents = self.s.parent.entities().prefetch(['s', 'child_parent_fkey'], max_url_length=110)
+        self.assertGreater(len(self._requests('child')), 2)
+        for parent in parents:
+            self.assertEqual(sorted(c['RID'] for c in parent['child']),
+                             [c['RID'] for c in self.children if c['parent'] == parent['RID']])
+
+    def test_attribute_set(self):
+        t = self.s.child
+        children = t.filter(t.pn == 1).entities(t.RID, t.parent).prefetch(['s', 'child_parent_fkey'], name='p')
+        self.assertEqual([c['p'] and c['p']['RID'] for c in children], ['P1', 'P0', 'P4', None, 'P2'])
+        self.assertRaises(datapath.DataPathException, t.entities(t.RID).prefetch, ['s', 'child_parent_fkey'], 'p')
+
+    def test_foreign_key_errors(self):
+        s = self.s
+        # two foreign keys relate children to parents
+        self.assertRaises(datapath.DataPathException, s.parent.entities().prefetch, s.child)
+        self.assertRaises(datapath.DataPathException, s.parent.entities().prefetch, s.note)
+        self.assertRaises(datapath.DataPathException, s.parent.entities().prefetch, ['s', 'unknown_fkey'])
+        self.assertRaises(datapath.DataPathException, s.parent.entities().prefetch, ['s', 'note_child_fkey'])
+        # the name of a column of the entities
+        self.assertRaises(datapath.DataPathException, s.child.entities().prefetch, ['s', 'child_parent_fkey'])
+        self.assertRaises(datapath.DataPathException, s.child.aggregates(n=datapath.Cnt(s.child)).prefetch,
+                          ['s', 'child_parent_fkey'])
+        self.assertEqual(self._requests('parent') + self._requests('note'), [])
+
+
+class ColumnarTest (unittest.TestCase):
+
+    COLUMNS = [('RID', 'ermrest_rid'), ('i', 'int4'), ('f', 'float8'), ('b', 'boolean'), ('t', 'text'),
+               ('d', {'typename': 'count_t', 'base_type': {'typename': 'int8'}}),
+               ('a', {'typename': 'int4[]', 'is_array': True, 'base_type': {'typename': 'int4'}}),
+               ('ni', 'int4'), ('nb', 'boolean')]
+
+    def setUp(self):
+        # the attributes of the rows are in another order than the columns of the table
+        self.rows = [dict(reversed([('RID', '1-%d' % i), ('i', i), ('f', i / 2.0), ('b', i % 2 == 0), ('t', 't%d' % i),
+                                    ('d', 10 ** 10 + i), ('a', [i, i + 1]), ('ni', None if i == 2 else i),
+                                    ('nb', None if i == 3 else i > 2)]))
+                     for i in range(5)]
+        self.handler = ErmrestEntities({'t': (self.COLUMNS, self.rows)})
+        self.server = LocalServer(self.handler).__enter__()
+        self.t = _catalog(self.server).getPathBuilder().s.t
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_entity_columns(self):
+        columns = self.t.entities().to_columns()
+        self.assertEqual(list(columns), [name for name, t in self.COLUMNS])
+        for name, values in columns.items():
+            self.assertEqual(values, [row[name] for row in self.rows])
+
+    def test_projected_columns(self):
+        t = self.t
+        columns = t.filter(t.i >= 1).entities(t.f, t.RID, total=t.d, first=t.i).to_columns()
+        self.assertEqual(list(columns), ['f', 'RID', 'total', 'first'])
+        self.assertEqual(columns['first'], [1, 2, 3, 4])
+        self.assertEqual(columns['total'], [row['d'] for row in self.rows[1:]])
+
+    def test_unfetched_set_is_streamed(self):
+        entities = self.t.entities()
+        columns = entities.to_columns()
+        self.assertEqual(len(columns['RID']), 5)
+        self.assertEqual(self.handler.results, [('/ermrest/catalog/1/entity/t:=s:t', 5)])
+        # the entities are not retained
+        self.assertIsNone(entities._results_doc)
+        entities.fetch()
+        self.assertEqual(entities.to_columns(), columns)
+        self.assertEqual(len(self.handler.results), 2)
+
+    def test_fetched_set_columns_include_unknown_attributes(self):
+        entities = self.t.entities().fetch()
+        entities[1]['extra'] = 'x'
+        columns = entities.to_columns()
+        self.assertEqual(list(columns)[-1], 'extra')
+        self.assertEqual(columns['extra'], [None, 'x', None, None, None])
+
+    @unittest.skipIf(numpy is None, "The 'numpy' and 'pandas' packages are not installed.")
+    def test_numpy_dtypes(self):
+        arrays = self.t.entities().to_numpy()
+        self.assertEqual(list(arrays), [name for name, t in self.COLUMNS])
+        self.assertEqual(dict((name, array.dtype.name) for name, array in arrays.items()),
+                         {'RID': 'object', 'i': 'int32', 'f': 'float64', 'b': 'bool', 't': 'object', 'd': 'int64',
+                          'a': 'object', 'ni': 'float64', 'nb': 'object'})
+        self.assertTrue(numpy.isnan(arrays['ni'][2]))
+        self.assertEqual(list(arrays['ni'][[0, 1, 3, 4]]), [0.0, 1.0, 3.0, 4.0])
+        self.assertEqual(list(arrays['nb']), [False, False, False, None, True])
+        self.assertEqual(arrays['a'][4], [4, 5])
+        self.assertEqual(list(arrays['d']), [row['d'] for row in self.rows])
+
+    @unittest.skipIf(numpy is None, "The 'numpy' and 'pandas' packages are not installed.")
+    def test_numpy_aggregates_and_empty_sets(self):
+        t = self.t
+        arrays = t.aggregates(n=datapath.Cnt(t), top=datapath.Max(t.i), d=datapath.Max(t.d)).to_numpy()
+        self.assertEqual([(name, array.dtype.name, list(array)) for name, array in arrays.items()],
+                         [('n', 'int64', [5]), ('top', 'int32', [4]), ('d', 'int64', [10 ** 10 + 4])])
+        arrays = t.filter(t.i > 10).entities(t.i, t.t).to_numpy()
+        self.assertEqual([(name, array.dtype.name, len(array)) for name, array in arrays.items()],
+                         [('i', 'int32', 0), ('t', 'object', 0)])
+
+    @unittest.skipIf(pandas is None, "The 'numpy' and 'pandas' packages are not installed.")
+    def test_dataframe(self):
+        t = self.t
+        frame = t.entities(t.i, t.ni, t.nb, t.t).to_dataframe()
+        self.assertEqual(list(frame.columns), ['i', 'ni', 'nb', 't'])
+        # text columns may be of a string dtype, depending on the version of pandas
+        self.assertEqual([dtype.name for dtype in frame.dtypes][:3], ['int32', 'float64', 'object'])
+        self.assertEqual(frame['i'].tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(frame['ni'].isna().tolist(), [False, False, True, False, False])
+        self.assertEqual(frame['t'].tolist(), ['t0', 't1', 't2', 't3', 't4'])
+
+
+class ChunkedFetchTest (unittest.TestCase):
+
+    def setUp(self):
+        self.rows = _rows(60, value=lambda i: i % 3)
+        self.keys = [row['k'] for row in self.rows]
+        self.handler = ErmrestEntities({'t': (COLUMNS, self.rows)})
+
+    def _fetch(self, query):
+        with LocalServer(self.handler) as server:
+            t = _catalog(server).getPathBuilder().s.t
+            return list(query(t))
+
+    def _requests(self):
+        return [path for path, count in self.handler.results]
+
+    def test_projection_keeps_duplicate_rows(self):
+        rows = self._fetch(lambda t: t.filter(t.k.in_(self.keys, max_url_length=300)).entities(t.v))
+        self.assertGreater(len(self._requests()), 1)
+        self.assertEqual(sorted(row['v'] for row in rows), sorted(row['v'] for row in self.rows))
+
+    def test_entities_are_distinct(self):
+        # every entity with v=0 is in the results of every chunk
+        rows = self._fetch(lambda t: t.filter(t.k.in_(self.keys[:40], max_url_length=300) | (t.v == 0)).entities())
+        self.assertGreater(len(self._requests()), 1)
+        self.assertEqual(sorted(row['RID'] for row in rows),
+                         sorted(row['RID'] for i, row in enumerate(self.rows) if i < 40 or row['v'] == 0))
+
+    def test_projection_in_list_in_disjunction_is_not_split(self):
+        rows = self._fetch(lambda t: t.filter(t.k.in_(self.keys[:40], max_url_length=300) | (t.v == 0))
+                           .entities(t.v))
+        self.assertEqual(len(self._requests()), 1)
+        self.assertEqual(len(rows), 46)
+
+    def test_aggregates_are_not_split(self):
+        rows = self._fetch(lambda t: t.filter(t.k.in_(self.keys, max_url_length=300))
+                           .aggregates(n=datapath.Cnt(t.RID)))
+        self.assertEqual(rows, [{'n': 60}])
+
+    def test_chunks_replace_only_the_in_list(self):
+        # the text of the in-list is also in the text of the negated in-list
+        rows = self._fetch(lambda t: t.filter(t.k.in_(self.keys[10:50], max_url_length=600) |
+                                              ~t.k.in_(self.keys[:3] + self.keys[10:50])).entities())
+        self.assertEqual(len(rows), 57)
+        paths = [unquote(path) for path in self._requests()]
+        self.assertGreater(len(paths), 1)
+        negated = ';'.join('k=%s' % key for key in self.keys[:3] + self.keys[10:50])
+        for path in paths:
+            self.assertIn('!(%s)' % negated, path)
+
+
+class LazyModelTest (unittest.TestCase):
+
+    def setUp(self):
+        columns = [{'name': 'c%d' % i, 'type': {'typename': 'text'}, 'comment': None} for i in range(50)]
+        tables = dict(('t%d' % i, {'column_definitions': columns}) for i in range(500))
+        self.doc = {'schemas': {'s': {'tables': tables}, 'u': {'tables': tables}}}
+
+    def test_wrappers_are_created_on_first_access(self):
+        catalog = datapath.Catalog(self.doc, **datapath._kwargs(catalog=None))
+        self.assertEqual(catalog.schemas._values, {})
+        t = catalog.s.t7
+        self.assertEqual(list(catalog.schemas._values), ['s'])
+        self.assertEqual(list(catalog.s.tables._values), ['t7'])
+        self.assertEqual(len(t.column_definitions), 50)
+        self.assertEqual(t.column_definitions._values, {})
+        self.assertEqual(t.c3.name, 'c3')
+        self.assertEqual(list(t.column_definitions._values), ['c3'])
+        self.assertIs(catalog.s.t7, t)
+
+    def test_aliases_share_column_documents(self):
+        catalog = datapath.Catalog(self.doc, **datapath._kwargs(catalog=None))
+        t = catalog.s.t1
+        t.c1
+        alias = t.alias('a')
+        self.assertEqual(alias.column_definitions._values, {})
+        self.assertIs(alias.c2._table, alias)
+        self.assertIs(alias._base._column_docs, t._column_docs)
+        self.assertEqual(list(alias.column_definitions._values), ['c2'])
+
+    def test_path_builder_reads_memoized_schema(self):
+        handler = ErmrestEntities({'t': (COLUMNS, [])})
+        with LocalServer(handler) as server:
+            catalog = _catalog(server)
+            first, second = catalog.getPathBuilder(), catalog.getPathBuilder()
+            self.assertIsNot(first, second)
+            self.assertEqual(list(second.s.t.column_definitions), ['RID', 'v', 'k'])
+            self.assertEqual(len(server.received('GET', '/ermrest/catalog/1/schema')), 1)
+            self.assertIs(catalog.getCatalogSchema(memoized=True), catalog.getCatalogSchema(memoized=True))
+            self.assertIsNot(catalog.getCatalogSchema(), catalog.getCatalogSchema(memoized=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,462 @@
+import os
+import gzip
+import json
+import time
+import random
+import tempfile
+import threading
+import unittest
+
+import requests
+
+from deriva.core import ErmrestCatalog, HatracStore, ermrest_catalog
+from deriva.core.deriva_binding import DerivaBinding
+from tests.local_server import LocalServer, HatracUploads, NO_RETRY_SESSION_CONFIG
+
+COMPRESS_SESSION_CONFIG = dict(NO_RETRY_SESSION_CONFIG, compress_request_threshold=1024)
+
+OPERATIONS = 100
+
+
+def _authn_handler(request):
+    if request.path == '/authn/session':
+        return 200, b'{}', {'Content-Type': 'application/json', 'Set-Cookie': 'webauthn=abc; Path=/'}
+    return 404, b'not found', {}
+
+
+class PasswordLoginTest (unittest.TestCase):
+
+    def test_login_in_constructor_is_recorded_in_metrics(self):
+        with LocalServer(_authn_handler) as server:
+            binding = DerivaBinding('http', server.host, credentials={'username': 'u', 'password': 'p'},
+                                    session_config=NO_RETRY_SESSION_CONFIG)
+            self.assertEqual(len(server.received('POST', '/authn/session')), 1)
+            self.assertEqual(list(binding.stats()['requests']), ['POST /authn/*'])
+
+
+class RequestCompressionTest (unittest.TestCase):
+
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'0123456789' * 5000)
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def test_hatrac_chunks_above_threshold_are_not_compressed(self):
+        uploads = HatracUploads()
+        with LocalServer(uploads) as server:
+            store = HatracStore('http', server.host, session_config=COMPRESS_SESSION_CONFIG)
+            store.put_loc('/hatrac/ns/obj', self.file_path, chunked=True, chunk_size=20000)
+            with open(self.file_path, 'rb') as f:
+                self.assertEqual(uploads.objects['/hatrac/ns/obj'], f.read())
+            chunks = server.received('PUT')
+            self.assertEqual(len(chunks), 3)
+            for chunk in chunks:
+                self.assertNotIn('content-encoding', chunk.headers)
+                self.assertEqual(int(chunk.headers['content-length']), len(chunk.body))
+
+    def test_hatrac_objects_are_not_compressed(self):
+        with LocalServer(lambda request: (404, b'', {}) if request.method == 'HEAD' else (201, b'/obj:1', {})) \
+                as server:
+            store = HatracStore('http', server.host, session_config=COMPRESS_SESSION_CONFIG)
+            store.put('/hatrac/ns/obj', data=b'x' * 5000, headers={'Content-Type': 'application/json'})
+            self.assertNotIn('content-encoding', server.received('PUT')[0].headers)
+            self.assertEqual(server.received('PUT')[0].body, b'x' * 5000)
+
+    def test_catalog_json_and_csv_above_threshold_are_compressed(self):
+        rows = [{'RID': str(i), 'value': 'x' * 20} for i in range(100)]
+        csv = ('RID,value\n' + ''.join('%d,%s\n' % (i, 'x' * 20) for i in range(100))).encode('utf-8')
+        with LocalServer(lambda request: (200, b'[]', {'Content-Type': 'application/json'})) as server:
+            catalog = ErmrestCatalog('http', server.host, '1', session_config=COMPRESS_SESSION_CONFIG)
+            catalog.post('/entity/s:t', json=rows)
+            catalog.post('/entity/s:t', data=csv, headers={'Content-Type': 'text/csv'})
+            catalog.post('/entity/s:t', json=rows[:1])
+            catalog.post('/entity/s:t', data=b'y' * 5000, headers={'Content-Type': 'application/octet-stream'})
+            posts = server.received('POST')
+            self.assertEqual([p.headers.get('content-encoding') for p in posts], ['gzip', 'gzip', None, None])
+            self.assertEqual(json.loads(gzip.decompress(posts[0].body).decode('utf-8')), rows)
+            self.assertEqual(gzip.decompress(posts[1].body), csv)
+
+
+class CompressedResponseTest (unittest.TestCase):
+
+    def setUp(self):
+        fd, self.file_path = tempfile.mkstemp()
+        os.close(fd)
+        self.data = b''.join(b'%d,row %d\n' % (i, i * i) for i in range(200000))
+        self.compressed = gzip.compress(self.data)
+        self.first_decoded = threading.Event()
+        self.decoded_before_end = []
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def _handler(self, request):
+        half = len(self.compressed) // 2
+
+        def body():
+            yield self.compressed[:half]
+            # the rest is sent once the client has written data decoded from the first half
+            self.decoded_before_end.append(self.first_decoded.wait(5))
+            yield self.compressed[half:]
+
+        return 200, body(), {'Content-Type': 'text/csv', 'Content-Encoding': 'gzip',
+                             'Content-Length': str(len(self.compressed))}
+
+    def test_get_as_file_decodes_incrementally(self):
+        progress = []
+
+        def callback(**kwargs):
+            if 'progress' in kwargs:
+                progress.append(kwargs['progress'])
+                self.first_decoded.set()
+            return True
+
+        chunk_size = ermrest_catalog.DEFAULT_CHUNK_SIZE
+        ermrest_catalog.DEFAULT_CHUNK_SIZE = 64 * 1024
+        try:
+            with LocalServer(self._handler) as server:
+                catalog = ErmrestCatalog('http', server.host, '1', session_config=NO_RETRY_SESSION_CONFIG)
+                catalog.getAsFile('/entity/s:t?accept=csv', self.file_path, callback=callback)
+        finally:
+            ermrest_catalog.DEFAULT_CHUNK_SIZE = chunk_size
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(self.decoded_before_end, [True])
+        self.assertGreater(len(progress), len(self.data) // (64 * 1024))
+
+
+class SharedConnectionPoolTest (unittest.TestCase):
+
+    @staticmethod
+    def _handler(request):
+        return 200, (request.headers.get('cookie') or '').encode('utf-8'), {'Content-Type': 'text/plain'}
+
+    @staticmethod
+    def _adapter(binding):
+        return binding._session.get_adapter(binding._server_uri + '/')
+
+    def test_bindings_share_adapter_but_not_cookies(self):
+        with LocalServer(self._handler) as server:
+            config = dict(NO_RETRY_SESSION_CONFIG, pool_maxsize=4)
+            catalog = ErmrestCatalog('http', server.host, '1', session_config=config)
+            store = HatracStore('http', server.host, session_config=dict(config))
+            self.assertIsNot(catalog._session, store._session)
+            self.assertIs(self._adapter(catalog), self._adapter(store))
+            catalog.set_credentials({'cookie': 'webauthn=catalog'}, '127.0.0.1')
+            self.assertEqual(catalog.get('/ermrest/catalog/1/x').text, 'webauthn=catalog')
+            self.assertEqual(store.get('/hatrac/x').text, '')
+            self.assertIsNot(self._adapter(catalog),
+                             self._adapter(DerivaBinding('http', server.host, session_config=NO_RETRY_SESSION_CONFIG)))
+
+    def test_pool_shared_false(self):
+        with LocalServer(self._handler) as server:
+            config = dict(NO_RETRY_SESSION_CONFIG, pool_shared=False)
+            first, second = [DerivaBinding('http', server.host, session_config=config) for i in range(2)]
+            self.assertIsNot(self._adapter(first), self._adapter(second))
+            self.assertEqual(first.get('/x').status_code, 200)
+
+    def test_pool_settings(self):
+        config = dict(NO_RETRY_SESSION_CONFIG, pool_connections=3, pool_maxsize=5, pool_block=True)
+        adapter = self._adapter(DerivaBinding('http', 'example.org', session_config=config))
+        self.assertEqual((adapter._pool_connections, adapter._pool_maxsize, adapter._pool_block), (3, 5, True))
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'], 5)
+        self.assertTrue(adapter.poolmanager.connection_pool_kw['block'])
+
+
+class GetRowsTest (unittest.TestCase):
+
+    ROWS = [{'RID': '1-%04d' % i, 'text': u'caf\u00e9 %d \U0001f600' % i, 'n': i} for i in range(50)]
+
+    def _handler(self, request):
+        if request.path == '/missing':
+            return 404, b'not found', {}
+        if request.headers.get('accept') == 'application/x-json-stream':
+            body = u'\n'.join(json.dumps(row, ensure_ascii=False) for row in self.ROWS) + u'\n'
+            return 200, body.encode('utf-8'), {'Content-Type': 'application/x-json-stream'}
+        return 200, json.dumps(self.ROWS, ensure_ascii=False).encode('utf-8'), \
+            {'Content-Type': 'application/json; charset=utf-8'}
+
+    def test_content_types(self):
+        with LocalServer(self._handler) as server:
+            binding = DerivaBinding('http', server.host, session_config=NO_RETRY_SESSION_CONFIG)
+            for json_stream in (False, True):
+                # chunks which split rows and multibyte characters
+                self.assertEqual(list(binding.get_rows('/rows', json_stream=json_stream, chunk_size=7)), self.ROWS)
+            self.assertEqual([r.headers['accept'] for r in server.received('GET', '/rows')],
+                             ['application/json', 'application/x-json-stream'])
+
+    def test_request_is_sent_by_call(self):
+        with LocalServer(self._handler) as server:
+            binding = DerivaBinding('http', server.host, session_config=NO_RETRY_SESSION_CONFIG)
+            self.assertRaises(requests.HTTPError, binding.get_rows, '/missing')
+            rows = binding.get_rows('/rows')
+            self.assertEqual(len(server.received('GET', '/rows')), 1)
+            self.assertEqual(next(rows), self.ROWS[0])
+            rows.close()
+
+
+class MapRequestsTest (unittest.TestCase):
+
+    def setUp(self):
+        self.failures = {}
+        self.lock = threading.Lock()
+
+    def _handler(self, request):
+        """Answers /<n>/<failure> after failing the first n requests for the path, where failure is a status or
+           'drop' to close the connection. Paths of /delay/<seconds> are answered after a delay.
+        """
+        parts = request.path.strip('/').split('/')
+        if parts[0] == 'delay':
+            time.sleep(float(parts[1]))
+        else:
+            with self.lock:
+                failed = self.failures.setdefault(request.path, 0)
+                if failed < int(parts[0]):
+                    self.failures[request.path] += 1
+                    return None if parts[1] == 'drop' else (int(parts[1]), b'failed', {})
+        return 200, request.path.encode('utf-8'), {'Content-Type': 'text/plain'}
+
+    def _binding(self, server):
+        return DerivaBinding('http', server.host, session_config=NO_RETRY_SESSION_CONFIG)
+
+    def test_order(self):
+        paths = ['/delay/%.2f' % (0.05 * (3 - i)) for i in range(4)]
+        with LocalServer(self._handler) as server:
+            binding = self._binding(server)
+            ordered = [(path, r.text) for path, r in binding.map_get(paths, max_workers=4)]
+            self.assertEqual(ordered, [(path, path) for path in paths])
+            completed = [path for path, r in binding.map_get(paths, max_workers=4, ordered=False)]
+            self.assertEqual(completed, paths[::-1])
+            self.assertEqual([r.status_code for path, r in binding.map_head(paths, ordered=False)], [200] * 4)
+            self.assertEqual(len(server.received('HEAD')), 4)
+
+    def test_max_workers(self):
+        active, peak = [0], [0]
+
+        def handler(request):
+            with self.lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with self.lock:
+                active[0] -= 1
+            return 200, b'', {}
+
+        with LocalServer(handler) as server:
+            responses = list(self._binding(server).map_get(['/%d' % i for i in range(20)], max_workers=3))
+        self.assertEqual(len(responses), 20)
+        self.assertEqual(peak[0], 3)
+
+    def test_retries(self):
+        with LocalServer(self._handler) as server:
+            binding = self._binding(server)
+            paths = ['/2/503', '/1/500', '/2/drop', '/0/503']
+            self.assertEqual([r.text for path, r in binding.map_get(paths, retries=2)], paths)
+            self.assertEqual(dict((path, len(server.received('GET', path))) for path in paths),
+                             {'/2/503': 3, '/1/500': 2, '/2/drop': 3, '/0/503': 1})
+            # client errors are not retried
+            self.assertRaises(requests.HTTPError, list, binding.map_get(['/1/404'], retries=2))
+            self.assertEqual(len(server.received('GET', '/1/404')), 1)
+            self.assertRaises(requests.HTTPError, list, binding.map_get(['/3/503'], retries=2))
+            self.assertRaises(requests.ConnectionError, list, binding.map_get(['/1/drop']))
+
+    def test_return_exceptions(self):
+        with LocalServer(self._handler) as server:
+            results = list(self._binding(server).map_get(['/0/0', '/1/404', '/2/drop', '/1/503'], retries=1,
+                                                         return_exceptions=True))
+        self.assertEqual(results[0][1].text, '/0/0')
+        self.assertIsInstance(results[1][1], requests.HTTPError)
+        self.assertEqual(results[1][1].response.status_code, 404)
+        self.assertIsInstance(results[2][1], requests.ConnectionError)
+        self.assertEqual(results[3][1].text, '/1/503')
+
+
+class SingleFlightTest (unittest.TestCase):
+
+    THREADS = 8
+
+    def setUp(self):
+        self.release = threading.Event()
+
+    def _handler(self, request):
+        # hold the requests until released, so that concurrent requests overlap
+        self.release.wait(5)
+        if request.path == '/missing':
+            return 404, b'not found', {}
+        return 200, json.dumps([request.path, request.headers.get('cookie')]).encode('utf-8'), \
+            {'Content-Type': 'application/json'}
+
+    def _concurrently(self, server, calls):
+        """Runs the calls in threads, releasing the requests once they are all in flight, and returns the results."""
+        results = [None] * len(calls)
+
+        def run(i):
+            try:
+                results[i] = calls[i]()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(calls))]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while not server.received() and time.time() < deadline:
+            time.sleep(0.01)
+        # the coalesced calls only wait for the first one
+        time.sleep(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _binding(self, server):
+        return DerivaBinding('http', server.host, caching=False, session_config=NO_RETRY_SESSION_CONFIG)
+
+    def test_identical_requests_are_sent_once(self):
+        with LocalServer(self._handler) as server:
+            binding = self._binding(server)
+            responses = self._concurrently(server, [lambda: binding.get('/x')] * self.THREADS)
+            self.assertEqual(len(server.received('GET', '/x')), 1)
+            self.assertEqual(responses[0].json(), ['/x', None])
+            for response in responses:
+                self.assertIs(response, responses[0])
+
+    def test_errors_are_shared(self):
+        with LocalServer(self._handler) as server:
+            binding = self._binding(server)
+            errors = self._concurrently(server, [lambda: binding.get('/missing')] * self.THREADS)
+            self.assertEqual(len(server.received('GET', '/missing')), 1)
+            self.assertIsInstance(errors[0], requests.HTTPError)
+            for error in errors:
+                self.assertIs(error, errors[0])
+            # the failed request is not remembered
+            self.assertEqual(binding.get('/x').status_code, 200)
+
+    def test_streamed_requests_are_not_coalesced(self):
+        with LocalServer(self._handler) as server:
+            binding = self._binding(server)
+            responses = self._concurrently(server, [lambda: binding.get('/x', stream=True)] * 4)
+            self.assertEqual(len(server.received('GET', '/x')), 4)
+            self.assertEqual(len(set(id(r) for r in responses)), 4)
+            self.assertEqual([r.json() for r in responses], [['/x', None]] * 4)
+
+    def test_requests_with_other_headers_are_not_coalesced(self):
+        with LocalServer(self._handler) as server:
+            binding = self._binding(server)
+            calls = [lambda i=i: binding.get('/x', headers={'X-Test': str(i % 2)}) for i in range(self.THREADS)]
+            responses = self._concurrently(server, calls)
+            self.assertEqual(sorted(r.headers['x-test'] for r in server.received('GET', '/x')), ['0', '1'])
+            self.assertIs(responses[0], responses[2])
+            self.assertIsNot(responses[0], responses[1])
+
+    def test_requests_with_other_credentials_are_not_coalesced(self):
+        with LocalServer(self._handler) as server:
+            binding = self._binding(server)
+            first = threading.Thread(target=lambda: binding.get('/x'))
+            first.start()
+            deadline = time.time() + 5
+            while not server.received() and time.time() < deadline:
+                time.sleep(0.01)
+            # the first request is in flight with the previous credentials
+            binding.set_credentials({'cookie': 'webauthn=other'}, '127.0.0.1')
+            responses = self._concurrently(server, [lambda: binding.get('/x')] * 4)
+            first.join()
+            self.assertEqual(len(server.received('GET', '/x')), 2)
+            self.assertEqual(responses[0].json(), ['/x', 'webauthn=other'])
+            self.assertEqual(len(set(id(r) for r in responses)), 1)
+
+
+class _Credentialed (object):
+    """Handler of catalog tables whose content depends on the webauthn cookie of the request.
+
+       The ETag of a table depends on its version only, as with a
+       service whose representation varies with the client but whose
+       ETag does not, so a response cached for one client revalidates
+       for another.
+    """
+
+    def __init__(self):
+        self.versions = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        table = request.path.rsplit(':', 1)[-1]
+        with self._lock:
+            if request.method == 'PUT':
+                self.versions[table] = self.versions.get(table, 0) + 1
+                return 200, b'[]', {'Content-Type': 'application/json'}
+            version = self.versions.get(table, 0)
+        etag = '"%d"' % version
+        if request.path.endswith('/schema'):
+            doc = {'schemas': {'s': {'tables': dict(('t%d' % i, {'column_definitions': [{'name': 'RID'}]})
+                                                    for i in range(4))}}}
+        elif request.headers.get('if-none-match') == etag:
+            return 304, b'', {'ETag': etag}
+        else:
+            cookie = request.headers.get('cookie', '')
+            doc = {'user': cookie.partition('webauthn=')[2].split(';')[0], 'table': table, 'version': version}
+        return 200, json.dumps(doc).encode('utf-8'), {'Content-Type': 'application/json', 'ETag': etag}
+
+
+class ConcurrentCredentialsTest (unittest.TestCase):
+
+    def test_responses_are_never_shared_across_credentials(self):
+        users = ['u0', 'u1', 'u2']
+        # odd while the credentials are changing, else twice the number of changes
+        epoch = [0]
+        errors = []
+        done = threading.Event()
+        with LocalServer(_Credentialed()) as server:
+            catalog = ErmrestCatalog('http', server.host, '1', session_config=NO_RETRY_SESSION_CONFIG)
+            # the domain of the cookie is the host without the port of the server
+            catalog.set_credentials({'cookie': 'webauthn=u0'}, '127.0.0.1')
+
+            def switch():
+                i = 0
+                while not done.is_set():
+                    i += 1
+                    epoch[0] += 1
+                    catalog.set_credentials({'cookie': 'webauthn=%s' % users[i % len(users)]}, '127.0.0.1')
+                    epoch[0] += 1
+                    time.sleep(0.001)
+
+            def work(n):
+                rnd = random.Random(n)
+                try:
+                    for i in range(OPERATIONS):
+                        table = 's:t%d' % rnd.randrange(4)
+                        op = rnd.random()
+                        if op < 0.1:
+                            catalog.put('/entity/%s' % table, json=[])
+                        elif op < 0.2:
+                            catalog.getTableColumns(table)
+                        else:
+                            before = epoch[0]
+                            doc = catalog.get('/entity/%s' % table).json()
+                            if before == epoch[0] and before % 2 == 0:
+                                # the credentials did not change during the request
+                                user = users[(before // 2) % len(users)]
+                                if doc['user'] != user:
+                                    errors.append("%s got the content of %s" % (user, doc['user']))
+                except Exception as e:
+                    errors.append(repr(e))
+
+            switcher = threading.Thread(target=switch)
+            workers = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+            switcher.start()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            done.set()
+            switcher.join()
+        self.assertEqual(errors, [])
+        self.assertGreater(epoch[0], 10)
+        self.assertGreater(len(server.received('PUT')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import time
+import tempfile
+import threading
+import unittest
+
+try:
+    from deriva.transfer.download.processors import BaseDownloadProcessor
+except ImportError:
+    BaseDownloadProcessor = None
+
+from deriva.core import ErmrestCatalog
+from tests.local_server import LocalServer, NO_RETRY_SESSION_CONFIG
+
+
+def _login_handler(request):
+    time.sleep(0.1)
+    return 200, b'{}', {'Set-Cookie': 'session=abc; Path=/'}
+
+
+@unittest.skipIf(BaseDownloadProcessor is None, "The 'bdbag' package is not installed.")
+class ExternalSessionTest (unittest.TestCase):
+
+    def test_concurrent_lookups_log_in_once(self):
+        with LocalServer(_login_handler) as server:
+            processor = BaseDownloadProcessor(
+                catalog=ErmrestCatalog('http', server.host, '1', session_config=NO_RETRY_SESSION_CONFIG),
+                store=None,
+                query='/entity/s:t',
+                base_path=tempfile.gettempdir(),
+                session_config=NO_RETRY_SESSION_CONFIG,
+                auth_params={'auth_url': 'http://%s/login' % server.host, 'login_params': {'u': 'p'}})
+            sessions = []
+            threads = [threading.Thread(target=lambda: sessions.append(processor.getExternalSession('example.org')))
+                       for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(server.received('POST', '/login')), 1)
+            self.assertEqual(len(sessions), 8)
+            self.assertEqual(len(set(id(session) for session in sessions)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
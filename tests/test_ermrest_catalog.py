@@ -0,0 +1,240 @@
+import json
+import threading
+import unittest
+
+import requests
+
+from deriva.core import ErmrestCatalog, ErmrestSnapshot, ermrest_catalog
+from deriva.core.json_codec import response_json
+from tests.local_server import LocalServer, NO_RETRY_SESSION_CONFIG
+
+CATALOG_PATH = '/ermrest/catalog/1'
+
+
+class _Catalog (object):
+    """Handler of a minimal ERMrest catalog, whose version advances with every change.
+
+       The schema of version n has the single table s:t<n>. Tables s:x<i>
+       are missing from the schema, but their definitions are served
+       individually, and the first failures[name] requests for the
+       definition of table s:<name> fail with a 500 status. If set, the
+       during_change function is called while a change is in progress,
+       before it is applied.
+    """
+
+    def __init__(self):
+        self.version = 1
+        self.during_change = None
+        self.failures = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        path = request.path[len(CATALOG_PATH):]
+        if path.startswith('@'):
+            # a snapshot, which is served from the current version
+            path = path[path.index('/'):]
+        if request.method == 'GET' and path == '/':
+            return self._json({'id': '1', 'snaptime': 'S%d' % self.version})
+        if request.method == 'GET' and path == '/schema':
+            table = {'column_definitions': [{'name': 'RID'}, {'name': 'v%d' % self.version}]}
+            return self._json({'schemas': {'s': {'tables': {'t%d' % self.version: table}}}})
+        if request.method == 'GET' and path.startswith('/schema/s/table/'):
+            name = path[len('/schema/s/table/'):]
+            if self.failures.get(name):
+                self.failures[name] -= 1
+                return 500, b'', {}
+            if not name.startswith('x'):
+                return 404, b'', {}
+            if request.headers.get('if-none-match') == '"%d"' % self.version:
+                return 304, b'', {'ETag': '"%d"' % self.version}
+            return self._json({'table_name': name, 'column_definitions': [{'name': 'v%d' % self.version}]})
+        if request.method == 'GET' and path.startswith('/entity/'):
+            return self._json([{'RID': '1', 'version': self.version, 'path': path}])
+        if request.method in ('POST', 'PUT', 'DELETE'):
+            if self.during_change is not None:
+                self.during_change()
+            with self._lock:
+                self.version += 1
+            return self._json([])
+        return 404, b'', {}
+
+    def _json(self, doc):
+        return 200, json.dumps(doc).encode('utf-8'), {'Content-Type': 'application/json', 'ETag': '"%d"' % self.version}
+
+
+def _catalog(server, **config):
+    return ErmrestCatalog('http', server.host, '1', caching=False,
+                          session_config=dict(NO_RETRY_SESSION_CONFIG, **config))
+
+
+class SchemaCacheTest (unittest.TestCase):
+
+    def test_schema_change_discards_memoized_schema(self):
+        handler = _Catalog()
+        with LocalServer(handler) as server:
+            catalog = _catalog(server, schema_revalidate_interval=None)
+            self.assertEqual(catalog.getTableSchema('s:t1')['column_definitions'][1]['name'], 'v1')
+            catalog.post('/schema/s/table', json={})
+            self.assertIn('s:t2', catalog._get_schema().tables)
+            self.assertEqual(len(server.received('GET', CATALOG_PATH + '/schema')), 2)
+
+    def test_schema_read_during_change_is_discarded(self):
+        handler = _Catalog()
+        with LocalServer(handler) as server:
+            catalog = _catalog(server, schema_revalidate_interval=None)
+            # a concurrent reader memoizes the schema while the change is in progress
+            handler.during_change = lambda: catalog.getTableSchema('s:t1')
+            catalog.post('/schema/s/table', json={})
+            handler.during_change = None
+            self.assertIn('s:t2', catalog._get_schema().tables)
+
+    def test_data_change_keeps_memoized_schema(self):
+        handler = _Catalog()
+        with LocalServer(handler) as server:
+            catalog = _catalog(server, schema_revalidate_interval=None)
+            catalog.getTableSchema('s:t1')
+            catalog.post('/entity/s:t1', json=[{}])
+            self.assertIn('s:t1', catalog._get_schema().tables)
+            self.assertEqual(len(server.received('GET', CATALOG_PATH + '/schema')), 1)
+
+
+class TableSchemaCacheTest (unittest.TestCase):
+
+    def _fetches(self, server, table):
+        return len(server.received('GET', CATALOG_PATH + '/schema/s/table/' + table))
+
+    def test_least_recently_used_table_is_evicted(self):
+        size = ermrest_catalog.TABLE_SCHEMA_CACHE_SIZE
+        ermrest_catalog.TABLE_SCHEMA_CACHE_SIZE = 2
+        try:
+            with LocalServer(_Catalog()) as server:
+                catalog = _catalog(server, schema_revalidate_interval=None)
+                for table in ['x1', 'x2', 'x1', 'x3', 'x1', 't1']:
+                    self.assertEqual(catalog.getTableSchema('s:%s' % table)['column_definitions'][-1]['name'], 'v1')
+                self.assertEqual([self._fetches(server, table) for table in ['x1', 'x2', 'x3', 't1']], [1, 1, 1, 0])
+                self.assertEqual(catalog.getTableColumns('s:x2'), frozenset(['v1']))
+                self.assertEqual([self._fetches(server, table) for table in ['x1', 'x2', 'x3']], [1, 2, 1])
+                # x3 was the least recently used
+                catalog.getTableSchema('s:x1')
+                catalog.getTableSchema('s:x3')
+                self.assertEqual([self._fetches(server, table) for table in ['x1', 'x2', 'x3']], [1, 2, 2])
+        finally:
+            ermrest_catalog.TABLE_SCHEMA_CACHE_SIZE = size
+
+    def test_table_is_revalidated_with_etag(self):
+        handler = _Catalog()
+        with LocalServer(handler) as server:
+            catalog = _catalog(server, schema_revalidate_interval=0)
+            first = catalog.getTableSchema('s:x1')
+            self.assertIs(catalog.getTableSchema('s:x1'), first)
+            requests_ = server.received('GET', CATALOG_PATH + '/schema/s/table/x1')
+            self.assertEqual([r.headers.get('if-none-match') for r in requests_], [None, '"1"'])
+            # a data change advances the version, and with it the ETag of the definition
+            catalog.post('/entity/s:x1', json=[{}])
+            self.assertEqual(catalog.getTableSchema('s:x1')['column_definitions'][0]['name'], 'v2')
+            self.assertEqual(self._fetches(server, 'x1'), 3)
+
+    def test_failed_fetch_is_not_cached(self):
+        handler = _Catalog()
+        handler.failures['x1'] = 1
+        with LocalServer(handler) as server:
+            catalog = _catalog(server, schema_revalidate_interval=None)
+            self.assertRaises(requests.HTTPError, catalog.getTableSchema, 's:x1')
+            self.assertEqual(catalog.getTableSchema('s:x1')['table_name'], 'x1')
+            catalog.getTableSchema('s:x1')
+            self.assertEqual(self._fetches(server, 'x1'), 2)
+            # a definition which fails to be revalidated is discarded
+            catalog._schema_revalidate_interval = 0
+            handler.failures['x1'] = 1
+            self.assertRaises(requests.HTTPError, catalog.getTableColumns, 's:x1')
+            self.assertNotIn(catalog._server_uri + '/schema/s/table/x1', catalog._table_schemas)
+
+    def test_unknown_table_raises_key_error(self):
+        with LocalServer(_Catalog()) as server:
+            catalog = _catalog(server, schema_revalidate_interval=None)
+            self.assertRaises(KeyError, catalog.getTableSchema, 's:unknown')
+            self.assertRaises(KeyError, catalog.getTableColumns, 's:unknown')
+            self.assertEqual(self._fetches(server, 'unknown'), 2)
+
+
+class ResultCacheTest (unittest.TestCase):
+
+    def _read(self, catalog, table):
+        path = '/entity/s:%s' % table
+        return catalog._cached_result(path, lambda: response_json(catalog.get(path)))
+
+    def _fetches(self, server, table=None):
+        return len(server.received('GET', CATALOG_PATH + '/entity/' + ('s:%s' % table if table else '')))
+
+    def test_cache_hit_returns_copies(self):
+        with LocalServer(_Catalog()) as server:
+            catalog = _catalog(server, result_cache_size=4)
+            rows = self._read(catalog, 'a')
+            rows[0]['version'] = None
+            self.assertEqual(self._read(catalog, 'a')[0]['version'], 1)
+            self.assertEqual(self._fetches(server), 1)
+            # the snaptime validating the cached result was fetched once
+            self.assertEqual(len([r for r in server.received('GET') if r.path == CATALOG_PATH + '/']), 1)
+
+    def test_cache_disabled_by_default(self):
+        with LocalServer(_Catalog()) as server:
+            catalog = _catalog(server)
+            self._read(catalog, 'a')
+            self._read(catalog, 'a')
+            self.assertEqual(self._fetches(server), 2)
+
+    def test_least_recently_used_result_is_evicted(self):
+        with LocalServer(_Catalog()) as server:
+            catalog = _catalog(server, result_cache_size=2)
+            for table in ['a', 'b', 'a', 'c']:
+                self._read(catalog, table)
+            self.assertEqual(self._fetches(server), 3)
+            self._read(catalog, 'a')
+            self.assertEqual(self._fetches(server, 'a'), 1)
+            self._read(catalog, 'b')
+            self.assertEqual(self._fetches(server, 'b'), 2)
+
+    def test_change_invalidates_results(self):
+        with LocalServer(_Catalog()) as server:
+            catalog = _catalog(server, result_cache_size=4)
+            self._read(catalog, 'a')
+            catalog.post('/entity/s:a', json=[{}])
+            self.assertEqual(self._read(catalog, 'a')[0]['version'], 2)
+            self.assertEqual(self._fetches(server), 2)
+
+    def test_result_read_during_change_is_discarded(self):
+        handler = _Catalog()
+        with LocalServer(handler) as server:
+            catalog = _catalog(server, result_cache_size=4, snaptime_revalidate_interval=None)
+            self._read(catalog, 'b')
+            # a concurrent reader caches a result while the change is in progress
+            handler.during_change = lambda: self._read(catalog, 'a')
+            catalog.post('/entity/s:a', json=[{}])
+            handler.during_change = None
+            self.assertEqual(self._read(catalog, 'a')[0]['version'], 2)
+            self.assertEqual(self._read(catalog, 'b')[0]['version'], 2)
+
+    def test_change_by_another_client_invalidates_results(self):
+        handler = _Catalog()
+        with LocalServer(handler) as server:
+            catalog = _catalog(server, result_cache_size=4, snaptime_revalidate_interval=0)
+            self._read(catalog, 'a')
+            self._read(catalog, 'a')
+            self.assertEqual(self._fetches(server), 1)
+            handler.version += 1
+            self.assertEqual(self._read(catalog, 'a')[0]['version'], 2)
+
+    def test_snapshot_results_survive_clearing(self):
+        with LocalServer(_Catalog()) as server:
+            config = dict(NO_RETRY_SESSION_CONFIG, result_cache_size=4)
+            snapshot = ErmrestSnapshot('http', server.host, '1', 'S1', caching=False, session_config=config)
+            self._read(snapshot, 'a')
+            snapshot.clearResultCache()
+            self._read(snapshot, 'a')
+            self._read(snapshot, 'a')
+            self.assertEqual(len(server.received('GET', CATALOG_PATH + '@S1/entity/')), 2)
+            self.assertEqual(len(server.received('GET')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
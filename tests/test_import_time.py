@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import subprocess
+import unittest
+
+ENTRY_POINTS = [
+    'deriva.transfer.upload.__main__',
+    'deriva.transfer.download.__main__',
+    'deriva.core.hatrac_cli',
+    'deriva.config.acl_config',
+    'deriva.config.annotation_config',
+    'deriva.config.dump_catalog_annotations',
+]
+
+HEAVY_MODULES = ['requests', 'deriva.core.deriva_binding', 'deriva.core.datapath', 'bdbag', 'pika', 'pandas']
+
+BASELINE = {
+    'deriva.core': 0.300,
+    'deriva.transfer.upload.__main__': 0.324,
+    'deriva.transfer.download.__main__': 0.323,
+    'deriva.core.hatrac_cli': 0.303,
+    'deriva.config.acl_config': 0.306,
+    'deriva.config.annotation_config': 0.305,
+    'deriva.config.dump_catalog_annotations': 0.303,
+}
+"""Seconds to import each entry point before imports were made lazy, the best of three runs on the machine on which
+the budgets were measured"""
+
+BUDGET = 0.15
+"""Seconds within which each entry point must import, half its baseline and about three times the 55 ms measured
+on the same machine, most of which is the pkg_resources namespace declaration of the deriva package"""
+
+_SCRIPT = """
+import os, sys, json, time, importlib
+start = time.time()
+module = importlib.import_module(sys.argv[1])
+elapsed = time.time() - start
+if sys.argv[2] == 'help':
+    sys.argv = [sys.argv[0], '--help']
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        module.main()
+    except SystemExit:
+        pass
+    sys.stdout = sys.__stdout__
+print(json.dumps({'seconds': elapsed, 'modules': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _import(module, mode='import'):
+    """Imports module in a fresh interpreter, returning the import time and the heavy modules loaded."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd()] + sys.path))
+    output = subprocess.check_output([sys.executable, '-c', _SCRIPT, module, mode], env=env)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def _import_time(module, repeat=3):
+    """Returns the best time of several imports of module in fresh interpreters."""
+    return min(_import(module)['seconds'] for i in range(repeat))
+
+
+class EntryPointImportTest (unittest.TestCase):
+
+    def test_entry_points_import_lazily(self):
+        for module in ENTRY_POINTS:
+            result = _import(module)
+            self.assertEqual(result['modules'], [], module)
+
+    def test_command_line_help_imports_lazily(self):
+        # the upload CLI needs its uploader class, and so the upload stack, for its version
+        for module in ENTRY_POINTS[1:]:
+            result = _import(module, 'help')
+            self.assertEqual(result['modules'], [], module)
+
+    def test_core_imports_lazily(self):
+        result = _import('deriva.core')
+        self.assertEqual(result['modules'], [])
+
+    def test_entry_points_import_within_budget(self):
+        for module in ['deriva.core'] + ENTRY_POINTS:
+            self.assertLess(_import_time(module), BUDGET, module)
+
+
+if __name__ == '__main__':
+    print("%-45s %9s %9s %9s" % ('module', 'import', 'baseline', 'budget'))
+    for name in ['deriva.core'] + ENTRY_POINTS:
+        print("%-45s %6.1f ms %6.1f ms %6.1f ms" % (name, _import_time(name) * 1000, BASELINE[name] * 1000,
+                                                     BUDGET * 1000))
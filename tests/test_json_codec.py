@@ -0,0 +1,99 @@
+import uuid
+import datetime
+import unittest
+
+from deriva.core import json_codec
+from deriva.core.json_codec import get_json_codec_names, _make_json_codec, JSONCodec
+
+DOCUMENT = b'[{"RID": "1-ABCD", "int8": 9223372036854775807, "uint": 18446744073709551615, ' \
+           b'"numeric": 123456789012345678901234567890, "negative": -9223372036854775809, ' \
+           b'"float": 0.1, "text": "\\u00e4 \\/ 1234567890123456789012", "null": null}]'
+
+
+class _Recording (object):
+    """Records the values encoded by a backend module."""
+
+    def __init__(self, module):
+        self.module = module
+        self.encoded = []
+
+    def __getattr__(self, name):
+        return getattr(self.module, name)
+
+    def dumps(self, obj, *args, **kwargs):
+        self.encoded.append(obj)
+        return self.module.dumps(obj, *args, **kwargs)
+
+
+class JSONCodecTest (unittest.TestCase):
+
+    def setUp(self):
+        self.stdlib = JSONCodec()
+        self.codecs = [_make_json_codec(name) for name in get_json_codec_names()]
+
+    def test_decoded_values_match_stdlib(self):
+        expected = self.stdlib.loads(DOCUMENT)
+        self.assertEqual(expected[0]['numeric'], 123456789012345678901234567890)
+        for codec in self.codecs:
+            for document in (DOCUMENT, DOCUMENT.decode('utf-8'), bytearray(DOCUMENT)):
+                decoded = codec.loads(document)
+                self.assertEqual(decoded, expected, codec.name)
+                self.assertEqual([type(v) for v in decoded[0].values()], [type(v) for v in expected[0].values()],
+                                 codec.name)
+
+    def test_small_documents_use_fast_path(self):
+        for codec in self.codecs:
+            self.assertEqual(codec.loads(b'[1, 2.5, "x"]'), [1, 2.5, 'x'], codec.name)
+
+    def test_encoding_matches_stdlib(self):
+        rows = self.stdlib.loads(DOCUMENT)
+        for codec in self.codecs:
+            self.assertEqual(self.stdlib.loads(codec.dumps(rows)), rows, codec.name)
+            self.assertEqual(self.stdlib.loads(codec.dumps_bytes(rows)), rows, codec.name)
+            self.assertEqual(self.stdlib.loads(codec.dumps(rows, indent=2)), rows, codec.name)
+
+    def test_encoded_bytes_are_identical(self):
+        values = [
+            self.stdlib.loads(DOCUMENT),
+            {'text': u'\u00e4 / \u20ac \U0001f600 "quoted" \\ \n\t\x1f\x7f', 'nested': [[], {}, [{'a': (1, 2)}]]},
+            [0.0, -0.0, 0.1, 1e-4, 123.456, 1e15, -2.5e-5, 1e16, 1.2345678901234568e+17, 5e-324, 1e300],
+            {1: 'int key', 'big': 2 ** 64, 'bool': True, 'none': None},
+            'scalar', 42, None,
+        ]
+        for value in values:
+            expected = self.stdlib.dumps_bytes(value)
+            for codec in self.codecs:
+                self.assertEqual(codec.dumps_bytes(value), expected, codec.name)
+                self.assertEqual(codec.dumps(value), expected.decode('utf-8'), codec.name)
+                self.assertEqual(codec.dumps(value, indent=2), self.stdlib.dumps(value, indent=2), codec.name)
+                self.assertEqual(codec.dumps(value, indent=4), self.stdlib.dumps(value, indent=4), codec.name)
+
+    def test_plain_values_are_encoded_by_fast_backend(self):
+        plain = [{'RID': '1-%04d' % i, 'v': i, 'f': i / 4.0, 'k': [u'\u00e4', None, True]} for i in range(100)]
+        for codec in self.codecs:
+            if codec.name == 'json':
+                continue
+            backend = _Recording(getattr(json_codec, codec.name))
+            setattr(json_codec, codec.name, backend)
+            try:
+                self.assertEqual(codec.dumps_bytes(plain), self.stdlib.dumps_bytes(plain), codec.name)
+                self.assertEqual(codec.dumps_bytes([plain, {'f': 1e-7}]), self.stdlib.dumps_bytes([plain, {'f': 1e-7}]))
+                self.assertRaises(ValueError, codec.dumps_bytes, [plain, [float('nan')]])
+                self.assertRaises(TypeError, codec.dumps_bytes, [plain, (uuid.uuid4(),)])
+            finally:
+                setattr(json_codec, codec.name, backend.module)
+            self.assertEqual(len(backend.encoded), 1, codec.name)
+            self.assertIs(backend.encoded[0], plain, codec.name)
+
+    def test_encoding_rejects_what_stdlib_rejects(self):
+        for codec in self.codecs:
+            self.assertRaises(ValueError, codec.dumps, [float('nan')])
+            self.assertRaises(ValueError, codec.dumps_bytes, {'x': float('inf')})
+            self.assertRaises(TypeError, codec.dumps, [datetime.date(2020, 1, 1)])
+            self.assertRaises(TypeError, codec.dumps_bytes, {'id': uuid.uuid4()})
+            self.assertRaises(ValueError, codec.dumps_bytes, [{'x': [1.5, float('-inf')]}])
+            self.assertRaises(TypeError, codec.dumps, {'x': [{'y': set()}]}, indent=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
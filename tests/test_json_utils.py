@@ -0,0 +1,80 @@
+import json
+import unittest
+
+from deriva.core.utils.json_utils import iter_json_array, iter_json_lines
+
+ROWS = [
+    {'RID': '1-0001', 'text': u'café € \U0001f600', 'escaped': u'"quoted" \\ \n\t ä \U0001f600 /'},
+    {'n': 12345678901234567890, 'f': -1.25e-3, 'b': [True, False, None], 'empty': {}},
+    [], u'ää', 0, -7.5, True, None, 'x',
+]
+
+
+def _split(document, size):
+    return [document[i:i + size] for i in range(0, len(document), size)]
+
+
+class IterJSONArrayTest (unittest.TestCase):
+
+    def setUp(self):
+        # the first row with escapes only, and the others with multibyte characters written as UTF-8
+        first, others = json.dumps(ROWS[0]), json.dumps(ROWS[1:], ensure_ascii=False)[1:-1]
+        self.document = (u' [ %s ,\n %s ] \n' % (first, others)).encode('utf-8')
+
+    def test_values_split_at_every_position(self):
+        self.assertEqual(json.loads(self.document.decode('utf-8')), ROWS)
+        for i in range(len(self.document) + 1):
+            self.assertEqual(list(iter_json_array([self.document[:i], self.document[i:]])), ROWS, i)
+
+    def test_single_byte_chunks(self):
+        self.assertEqual(list(iter_json_array(_split(self.document, 1))), ROWS)
+
+    def test_values_are_yielded_once_complete(self):
+        read = []
+
+        def chunks():
+            for chunk in (b'[{"a": 1}, 12', b'3, "x', b'"]'):
+                read.append(chunk)
+                yield chunk
+
+        rows = iter_json_array(chunks())
+        self.assertEqual(next(rows), {'a': 1})
+        self.assertEqual(len(read), 1)
+        # the number may continue in the next chunk
+        self.assertEqual(next(rows), 123)
+        self.assertEqual(len(read), 2)
+        self.assertEqual(list(rows), ['x'])
+
+    def test_empty_arrays(self):
+        for document in (b'[]', b' [ \n ] '):
+            self.assertEqual(list(iter_json_array(_split(document, 1))), [])
+
+    def test_malformed_documents(self):
+        for document in (b'', b'{"a": 1}', b'[1, 2', b'[1 2]', b'[1,, 2]', b'[1] x', b'["a', b'[tru]', b'[1,]'):
+            self.assertRaises(ValueError, list, iter_json_array(_split(document, 2)))
+
+
+class IterJSONLinesTest (unittest.TestCase):
+
+    def setUp(self):
+        lines = [json.dumps(row, ensure_ascii=i % 2 == 0) for i, row in enumerate(ROWS)]
+        self.document = (u'\n'.join(lines[:3]) + u'\n\n  \r\n' + u'\r\n'.join(lines[3:])).encode('utf-8')
+
+    def test_values_split_at_every_position(self):
+        for i in range(len(self.document) + 1):
+            self.assertEqual(list(iter_json_lines([self.document[:i], self.document[i:]])), ROWS, i)
+
+    def test_single_byte_chunks(self):
+        self.assertEqual(list(iter_json_lines(_split(self.document, 1))), ROWS)
+        self.assertEqual(list(iter_json_lines(_split(self.document + b'\n', 3))), ROWS)
+
+    def test_empty_documents(self):
+        for document in (b'', b'\n', b' \n\r\n'):
+            self.assertEqual(list(iter_json_lines([document])), [])
+
+    def test_malformed_lines(self):
+        self.assertRaises(ValueError, list, iter_json_lines([b'{"a": 1}\n{"a"', b'\n']))
+
+
+if __name__ == '__main__':
+    unittest.main()
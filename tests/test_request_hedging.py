@@ -0,0 +1,124 @@
+import time
+import threading
+import unittest
+
+from deriva.core import ErmrestCatalog
+from deriva.core.request_hedging import HedgingPolicy
+from tests.local_server import LocalServer, NO_RETRY_SESSION_CONFIG
+
+
+class _Response (object):
+
+    def __init__(self, name):
+        self.name = name
+        self.thread = threading.current_thread()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _sender(*calls):
+    """Returns a send function whose n-th call waits, calls started, then waits and returns or raises per calls[n]."""
+    responses = []
+    lock = threading.Lock()
+
+    def send(started):
+        with lock:
+            n = len(responses)
+            responses.append(None)
+        before, after, error = calls[n]
+        time.sleep(before)
+        started()
+        time.sleep(after)
+        if error:
+            raise error
+        responses[n] = _Response(n)
+        return responses[n]
+
+    return send, responses
+
+
+class HedgingPolicyTest (unittest.TestCase):
+
+    def setUp(self):
+        self.policy = HedgingPolicy(budget=1.0)
+
+    def tearDown(self):
+        self.policy.shutdown()
+
+    def test_fast_request_runs_on_calling_thread(self):
+        send, responses = _sender((0, 0, None))
+        r = self.policy.send(send, 0.2)
+        self.assertIs(r.thread, threading.current_thread())
+        self.assertEqual(len(responses), 1)
+        self.assertIsNone(self.policy._executor)
+        self.assertEqual(self.policy.stats()['hedged'], 0)
+
+    def test_delay_is_measured_from_start_of_sending(self):
+        # e.g. waiting for a concurrency governor before sending
+        send, responses = _sender((0.4, 0.1, None))
+        r = self.policy.send(send, 0.2)
+        self.assertEqual(r.name, 0)
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(self.policy.stats()['hedged'], 0)
+
+    def test_hedge_answering_first_wins(self):
+        send, responses = _sender((0, 0.6, None), (0, 0, None))
+        r = self.policy.send(send, 0.1)
+        self.assertEqual(r.name, 1)
+        self.assertIsNot(r.thread, threading.current_thread())
+        self.assertTrue(responses[0].closed)
+        self.assertEqual(self.policy.stats()['hedge_wins'], 1)
+
+    def test_losing_hedge_is_closed(self):
+        send, responses = _sender((0, 0.2, None), (0, 0.4, None))
+        r = self.policy.send(send, 0.1)
+        self.assertEqual(r.name, 0)
+        self.policy.shutdown()
+        self.assertTrue(responses[1].closed)
+        self.assertEqual(self.policy.stats()['hedged'], 1)
+        self.assertEqual(self.policy.stats()['hedge_wins'], 0)
+
+    def test_hedge_replaces_failed_request(self):
+        send, responses = _sender((0, 0.3, IOError('reset')), (0, 0.3, None))
+        self.assertEqual(self.policy.send(send, 0.1).name, 1)
+        send, responses = _sender((0, 0.3, IOError('reset')), (0, 0, ValueError('reset')))
+        self.assertRaises(IOError, self.policy.send, send, 0.1)
+
+    def test_budget_limits_hedges(self):
+        policy = HedgingPolicy(budget=0.0)
+        try:
+            send, responses = _sender((0, 0.3, None), (0, 0, None))
+            self.assertEqual(policy.send(send, 0.1).name, 0)
+            self.assertEqual(len(responses), 1)
+        finally:
+            policy.shutdown()
+
+
+class HedgedBindingTest (unittest.TestCase):
+
+    def test_stalled_request_is_hedged(self):
+        stall = []
+
+        def handler(request):
+            if stall and stall.pop():
+                time.sleep(0.5)
+            return 200, b'[]', {'Content-Type': 'application/json'}
+
+        config = dict(NO_RETRY_SESSION_CONFIG, hedging={'min_samples': 3, 'budget': 1.0, 'max_delay': 0.1})
+        with LocalServer(handler) as server:
+            catalog = ErmrestCatalog('http', server.host, '1', caching=False, session_config=config)
+            for i in range(3):
+                catalog.get('/entity/s:t')
+            stall.append(True)
+            self.assertEqual(catalog.get('/entity/s:t').json(), [])
+            self.assertEqual(len(server.received('GET')), 5)
+            stats = catalog.stats()['hedging']
+            self.assertEqual(stats['hedged'], 1)
+            self.assertEqual(stats['hedge_wins'], 1)
+            catalog.hedging.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from deriva.core.response_cache import CachedResponse, MemoryResponseCache, SqliteResponseCache
+
+THREADS = 16
+OPERATIONS = 400
+KEYS = 64
+
+
+def _entry(key, version):
+    content = ('%s@%d;' % (key, version) * (1 + version % 7)).encode('utf-8')
+    return CachedResponse('http://example.org/%s' % key, '"%d"' % version, 200, {'ETag': '"%d"' % version}, content)
+
+
+def _stress(caches, operations=OPERATIONS):
+    """Runs concurrent writers and readers over the caches, returning the errors and inconsistent lookups."""
+    errors = []
+    barrier = threading.Barrier(THREADS) if hasattr(threading, 'Barrier') else None
+
+    def worker(n):
+        rnd = random.Random(n)
+        cache = caches[n % len(caches)]
+        try:
+            if barrier is not None:
+                barrier.wait()
+            for i in range(operations):
+                key = 'k%d' % rnd.randrange(KEYS)
+                op = rnd.random()
+                if op < 0.5:
+                    cache.store(key, _entry(key, rnd.randrange(100)))
+                elif op < 0.9:
+                    entry = cache.lookup(key)
+                    if entry is not None:
+                        version = int(entry.etag.strip('"'))
+                        if entry.content != _entry(key, version).content or entry.url.split('/')[-1] != key:
+                            errors.append("Inconsistent entry for %s" % key)
+                else:
+                    cache.discard(key)
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class MemoryResponseCacheStressTest (unittest.TestCase):
+
+    def test_concurrent_writers_keep_byte_accounting(self):
+        cache = MemoryResponseCache(max_bytes=1500, stripes=4)
+        self.assertEqual(_stress([cache]), [])
+        stats = cache.stats()
+        actual = sum(entry.size for stripe in cache._stripes for entry in stripe.entries.values())
+        self.assertEqual(stats['bytes'], actual)
+        self.assertLessEqual(stats['bytes'], cache.max_bytes)
+        self.assertEqual(stats['entries'], sum(len(stripe.entries) for stripe in cache._stripes))
+        self.assertGreater(stats['evictions'], 0)
+
+    def test_eviction_is_least_recently_used_across_stripes(self):
+        cache = MemoryResponseCache(max_bytes=10 ** 6, stripes=4)
+        for i in range(8):
+            cache.store('k%d' % i, _entry('k%d' % i, 1))
+        cache.lookup('k0')
+        size = _entry('k0', 1).size
+        cache.max_bytes = 8 * size
+        cache.store('k8', _entry('k8', 1))
+        self.assertIsNotNone(cache.lookup('k0'))
+        self.assertIsNone(cache.lookup('k1'))
+
+
+class SqliteResponseCacheStressTest (unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_concurrent_writers_share_one_instance(self):
+        cache = SqliteResponseCache(self.path, max_bytes=1500)
+        self.assertEqual(_stress([cache], OPERATIONS // 4), [])
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], cache.max_bytes)
+        self.assertGreater(stats['evictions'], 0)
+
+    def test_concurrent_writers_share_one_file(self):
+        # separate instances stand in for separate processes sharing the database file
+        caches = [SqliteResponseCache(self.path, max_bytes=1500) for i in range(4)]
+        self.assertEqual(_stress(caches, OPERATIONS // 4), [])
+        self.assertLessEqual(caches[0].stats()['bytes'], 1500)
+
+    def test_connections_are_per_thread(self):
+        cache = SqliteResponseCache(self.path)
+        connections = []
+
+        def worker():
+            connections.append(cache._connect())
+            connections.append(cache._connect())
+
+        threads = [threading.Thread(target=worker) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(id(conn) for conn in connections)), 4)
+        self.assertNotIn(cache._connect(), connections)
+
+
+if __name__ == '__main__':
+    unittest.main()